@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from datetime import timedelta
 from pathlib import Path   
 import os
+import tempfile
 import dj_database_url
 from dotenv import load_dotenv
 
@@ -90,6 +91,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'colorfield',
     'django_filters',
     'drf_yasg',
@@ -222,6 +224,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Django REST Framework settings
 REST_FRAMEWORK = {
+    # رندرر JSON با orjson (در نبود orjson همان JSONRenderer پیش‌فرض)
+    'DEFAULT_RENDERER_CLASSES': [
+        'store.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
@@ -239,6 +246,29 @@ REST_FRAMEWORK = {
              }
 }
 
+# ----------------------
+# ✅ Cache
+# ----------------------
+# کش کاتالوگ (facetها و ...) نسخه‌دار است؛ داده‌ها می‌توانند در کش هر پروسه باشند
+# ولی نسخه‌ها در کش مشترک store-versions نگهداری می‌شوند.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'iro-cache'),
+    },
+    # نسخه‌های کش کاتالوگ و شمارنده‌های ETag (store.cache / store.changes)؛ باید بین
+    # پروسه وب و دستورات مدیریتی مشترک باشد. پیش‌فرض کش فایلی روی همان سرور است و
+    # با چند سرور باید Redis یا Memcached تنظیم شود. MAX_ENTRIES بالا از حذف شمارنده‌ها
+    # (cull) جلوگیری می‌کند.
+    'store-versions': {
+        'BACKEND': os.getenv('STORE_VERSION_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('STORE_VERSION_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'iro-store-versions')),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 1_000_000},
+    },
+}
+STORE_VERSION_CACHE = 'store-versions'
+
 # ----------------------
 # ✅ JWT - توکن امن
 # ----------------------
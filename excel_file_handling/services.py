@@ -1,14 +1,17 @@
 import pandas as pd
 import openpyxl
 from django.utils import timezone
-from django.db import transaction
+from django.db import DatabaseError, transaction
 from django.core.exceptions import ValidationError
 from .models import ExcelFile, ExcelImportLog
 from store.models import (
-    Product, Category, Brand, Specification, ProductSpecification, 
+    Product, Category, Brand, Specification, ProductSpecification, SpecificationValue,
     Color, Warranty, Tag, SpecificationGroup, ProductOption,
     Article, ArticleCategory
 )
+from store.facets import invalidate_category_facets
+from store.search import refresh_search_documents
+from store.changes import schedule_bump_changes
 from django.utils.text import slugify
 import logging
 
@@ -574,81 +577,169 @@ class ExcelImportService:
         return processed, errors
     
     def import_product_specifications(self, df):
-        """Import کردن مقادیر مشخصات محصول"""
+        """
+        Import کردن مقادیر مشخصات محصول
+
+        ردیف‌ها ابتدا اعتبارسنجی و سپس با bulk_create (همراه با مقادیر نوع‌دار
+        numeric_value / bool_value / str_value و مقدار یکتای دیکشنری) یک‌جا ذخیره می‌شوند.
+        """
         processed = 0
         errors = 0
+        products_by_title = {}
+        specifications_by_name = {}
+        rows = []
+        value_max_length = ProductSpecification._meta.get_field('specification_value').max_length
         
         for index, row in df.iterrows():
             try:
-                with transaction.atomic():
-                    product_title = str(row.get('product', '')).strip()
-                    if not product_title:
-                        self.log_message('warning', f'ردیف {index + 2}: نام محصول خالی است', index + 2)
-                        errors += 1
-                        continue
-                    
-                    spec_name = str(row.get('specification', '')).strip()
-                    if not spec_name:
-                        self.log_message('warning', f'ردیف {index + 2}: نام مشخصه خالی است', index + 2)
-                        errors += 1
-                        continue
-                    
-                    # پیدا کردن محصول
-                    try:
-                        products = Product.objects.filter(title=product_title)
-                        if products.count() > 1:
+                product_title = str(row.get('product', '')).strip()
+                if not product_title:
+                    self.log_message('warning', f'ردیف {index + 2}: نام محصول خالی است', index + 2)
+                    errors += 1
+                    continue
+                
+                spec_name = str(row.get('specification', '')).strip()
+                if not spec_name:
+                    self.log_message('warning', f'ردیف {index + 2}: نام مشخصه خالی است', index + 2)
+                    errors += 1
+                    continue
+                
+                # پیدا کردن محصول (هر عنوان فقط یک بار جستجو می‌شود)
+                try:
+                    if product_title not in products_by_title:
+                        products = list(Product.objects.filter(title=product_title)[:2])
+                        if len(products) > 1:
                             self.log_message('warning', f'چندین محصول با عنوان "{product_title}" یافت شد. اولین مورد انتخاب می‌شود.', index + 2)
-                        product = products.first()
-                        if not product:
-                            self.log_message('warning', f'محصول "{product_title}" یافت نشد', index + 2)
-                            errors += 1
-                            continue
-                    except Exception as e:
-                        self.log_message('error', f'خطا در پیدا کردن محصول "{product_title}": {str(e)}', index + 2)
+                        products_by_title[product_title] = products[0] if products else None
+                    product = products_by_title[product_title]
+                    if not product:
+                        self.log_message('warning', f'محصول "{product_title}" یافت نشد', index + 2)
                         errors += 1
                         continue
-                    
-                    # پیدا کردن مشخصه
-                    try:
-                        specifications = Specification.objects.filter(name=spec_name)
-                        if specifications.count() > 1:
+                except Exception as e:
+                    self.log_message('error', f'خطا در پیدا کردن محصول "{product_title}": {str(e)}', index + 2)
+                    errors += 1
+                    continue
+                
+                # پیدا کردن مشخصه (هر نام فقط یک بار جستجو می‌شود)
+                try:
+                    if spec_name not in specifications_by_name:
+                        specifications = list(Specification.objects.filter(name=spec_name)[:2])
+                        if len(specifications) > 1:
                             self.log_message('warning', f'چندین مشخصه با نام "{spec_name}" یافت شد. اولین مورد انتخاب می‌شود.', index + 2)
-                        specification = specifications.first()
-                        if not specification:
-                            self.log_message('warning', f'مشخصه "{spec_name}" یافت نشد', index + 2)
-                            errors += 1
-                            continue
-                    except Exception as e:
-                        self.log_message('error', f'خطا در پیدا کردن مشخصه "{spec_name}": {str(e)}', index + 2)
+                        specifications_by_name[spec_name] = specifications[0] if specifications else None
+                    specification = specifications_by_name[spec_name]
+                    if not specification:
+                        self.log_message('warning', f'مشخصه "{spec_name}" یافت نشد', index + 2)
                         errors += 1
                         continue
-                    
-                    # مقدار مشخصه
-                    specification_value = str(row.get('specification_value', '')).strip() if row.get('specification_value') else None
-                    is_main = bool(row.get('is_main', False))
-                    
-                    product_spec, created = ProductSpecification.objects.get_or_create(
-                        product=product,
-                        specification=specification,
-                        defaults={
-                            'specification_value': specification_value,
-                            'is_main': is_main
-                        }
-                    )
-                    
-                    if created:
-                        self.log_message('success', f'مقدار مشخصه برای "{product_title}" - "{spec_name}" ایجاد شد', index + 2)
-                    else:
-                        self.log_message('info', f'مقدار مشخصه برای "{product_title}" - "{spec_name}" قبلاً وجود دارد', index + 2)
-                    
-                    processed += 1
-                    
+                except Exception as e:
+                    self.log_message('error', f'خطا در پیدا کردن مشخصه "{spec_name}": {str(e)}', index + 2)
+                    errors += 1
+                    continue
+                
+                # مقدار مشخصه
+                specification_value = str(row.get('specification_value', '')).strip() if row.get('specification_value') else None
+                if specification_value and len(specification_value) > value_max_length:
+                    self.log_message('warning', f'ردیف {index + 2}: مقدار مشخصه بیشتر از {value_max_length} کاراکتر است', index + 2)
+                    errors += 1
+                    continue
+                is_main = bool(row.get('is_main', False))
+                rows.append((index, product, specification, specification_value, is_main))
+                
             except Exception as e:
                 self.log_message('error', f'خطا در ردیف {index + 2}: {str(e)}', index + 2)
                 errors += 1
         
+        if not rows:
+            return processed, errors
+        
+        existing = set(ProductSpecification.objects.filter(
+            product__in={product.id for _, product, _, _, _ in rows},
+        ).values_list('product_id', 'specification_id'))
+        to_create = []
+        created_rows = []
+        for index, product, specification, specification_value, is_main in rows:
+            product_title, spec_name = product.title, specification.name
+            if (product.id, specification.id) in existing:
+                self.log_message('info', f'مقدار مشخصه برای "{product_title}" - "{spec_name}" قبلاً وجود دارد', index + 2)
+                processed += 1
+                continue
+            existing.add((product.id, specification.id))
+            product_spec = ProductSpecification(
+                product=product,
+                specification=specification,
+                specification_value=specification_value,
+                is_main=is_main,
+            )
+            product_spec.fill_typed_values(specification.data_type)
+            to_create.append(product_spec)
+            created_rows.append((index, product_title, spec_name))
+        
+        if to_create:
+            try:
+                with transaction.atomic():
+                    SpecificationValue.assign(to_create)
+                    created = self._create_product_specifications(to_create)
+            except Exception as e:
+                for index, product_title, spec_name in created_rows:
+                    self.log_message('error', f'خطا در ردیف {index + 2}: {str(e)}', index + 2)
+                return processed, errors + len(created_rows)
+            # bulk_create سیگنال ندارد؛ ایندکس‌ها و شمارنده‌های ETag وابسته دستی بروزرسانی می‌شوند
+            saved = [product_spec for product_spec in to_create if product_spec.pk is not None]
+            invalidate_category_facets()
+            product_ids = {product_spec.product_id for product_spec in saved}
+            refresh_search_documents(product_ids)
+            schedule_bump_changes(ProductSpecification, [product_spec.pk for product_spec in saved])
+            schedule_bump_changes(Product, product_ids)
+            for (index, product_title, spec_name), result in zip(created_rows, created):
+                if isinstance(result, Exception):
+                    self.log_message('error', f'خطا در ردیف {index + 2}: {str(result)}', index + 2)
+                    errors += 1
+                    continue
+                if result:
+                    self.log_message('success', f'مقدار مشخصه برای "{product_title}" - "{spec_name}" ایجاد شد', index + 2)
+                else:
+                    self.log_message('info', f'مقدار مشخصه برای "{product_title}" - "{spec_name}" قبلاً وجود دارد', index + 2)
+                processed += 1
+        
         return processed, errors
     
+    @staticmethod
+    def _create_product_specifications(product_specs):
+        """
+        ذخیره گروهی مقادیر مشخصات؛ برای هر ورودی (هم‌ترتیب) True (ساخته شد)، False
+        (قبلاً وجود داشت) یا خطای دیتابیس همان ردیف برمی‌گرداند.
+        اگر ذخیره گروهی خطا بدهد (مثلاً ردیفی که بین بررسی ردیف‌های موجود و ذخیره توسط
+        پروسه دیگری ساخته شده یا مقدار نامعتبر یک ردیف)، ردیف‌ها مثل get_or_create
+        تک‌تک و هر کدام در savepoint خودش ذخیره می‌شوند تا فقط ردیف‌های خراب گزارش شوند.
+        """
+        try:
+            with transaction.atomic():
+                ProductSpecification.objects.bulk_create(product_specs, batch_size=500)
+            return [True] * len(product_specs)
+        except DatabaseError:
+            for product_spec in product_specs:
+                product_spec.pk = None
+        results = []
+        for product_spec in product_specs:
+            try:
+                with transaction.atomic():
+                    saved, was_created = ProductSpecification.objects.get_or_create(
+                        product_id=product_spec.product_id,
+                        specification_id=product_spec.specification_id,
+                        defaults={
+                            field: getattr(product_spec, field)
+                            for field in ['specification_value', 'is_main', *ProductSpecification.TYPED_FIELDS]
+                        },
+                    )
+            except DatabaseError as exc:
+                results.append(exc)
+                continue
+            product_spec.pk = saved.pk
+            results.append(was_created)
+        return results
+    
     def process_file(self):
         """پردازش فایل Excel بر اساس نوع آن"""
         try:
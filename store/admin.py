@@ -285,6 +285,18 @@ class ProductSpecificationAdmin(admin.ModelAdmin):
         return obj.specification.unit if obj.specification.unit else '-'
     get_unit.short_description = 'واحد'
 
+@admin.register(SpecificationValue)
+class SpecificationValueAdmin(admin.ModelAdmin):
+    list_display = ['specification', 'value', 'key', 'get_usage_count']
+    list_filter = ['specification__data_type']
+    search_fields = ['value', 'key', 'specification__name']
+    autocomplete_fields = ['specification']
+    list_select_related = ['specification']
+
+    def get_usage_count(self, obj):
+        return obj.product_values.count()
+    get_usage_count.short_description = 'تعداد استفاده'
+
 
 @admin.register(Warranty)
 class WarrantyAdmin(admin.ModelAdmin):
@@ -298,3 +310,21 @@ class TagAdmin(admin.ModelAdmin):
     search_fields = ['name']
     prepopulated_fields = {'slug': ('name',)}
 
+
+
+@admin.register(ImageUpload)
+class ImageUploadAdmin(admin.ModelAdmin):
+    list_display = ['model_label', 'object_id', 'field_name', 'key', 'status', 'attempts', 'updated_at']
+    list_filter = ['status', 'model_label']
+    search_fields = ['key', 'last_error']
+    readonly_fields = [field.name for field in ImageUpload._meta.fields]
+    actions = ['retry_uploads']
+
+    def retry_uploads(self, request, queryset):
+        from .uploads import submit
+        upload_ids = list(queryset.exclude(status=ImageUpload.STATUS_DONE).values_list('id', flat=True))
+        queryset.filter(id__in=upload_ids).update(status=ImageUpload.STATUS_PENDING, attempts=0)
+        for upload_id in upload_ids:
+            submit(upload_id)
+        messages.success(request, f'{len(upload_ids)} آپلود دوباره در صف قرار گرفت')
+    retry_uploads.short_description = 'تلاش دوباره آپلود'
@@ -0,0 +1,114 @@
+"""
+کش نسخه‌دار برای داده‌های کاتالوگ.
+
+هر namespace یک شماره نسخه در کش دارد؛ کلیدها شامل نسخه هستند و با
+``bump_version`` همه کلیدهای قبلی آن namespace بی‌اعتبار می‌شوند (بدون حذف
+تک‌تک کلیدها و بدون نیاز به پشتیبانی backend از حذف با الگو).
+
+نسخه‌ها (و شمارنده‌های ETag در store.changes) در کش ``STORE_VERSION_CACHE``
+(پیش‌فرض ``store-versions``) نگهداری می‌شوند که باید بین پروسه‌ها مشترک باشد
+(file، database، Redis یا Memcached)؛ تغییرات دستورات مدیریتی (changes،
+sweep_discount_windows، import اکسل) در پروسه جدا اجرا می‌شوند و در LocMemCache به
+سرور نمی‌رسند. نسخه‌ها عدد صحیح بر پایه ``time.time_ns()`` هستند و هر bump مقدار
+جدیدی می‌گذارد، پس اگر کلید نسخه از کش بیرون رانده شود (cull) مقدار قبلی تکرار
+نمی‌شود و فقط کلیدهای همان namespace یک بار دوباره ساخته می‌شوند.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+KEY_PREFIX = 'store'
+DEFAULT_TIMEOUT = 60 * 60
+DEFAULT_VERSION_CACHE = 'store-versions'
+# backendهایی که داده را بین پروسه‌ها به اشتراک نمی‌گذارند
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+_lock = threading.Lock()
+_state = {'last_version': 0}
+
+
+def get_version_cache_alias():
+    alias = getattr(settings, 'STORE_VERSION_CACHE', DEFAULT_VERSION_CACHE)
+    # بدون تعریف جداگانه، کش پیش‌فرض استفاده می‌شود
+    return alias if alias in settings.CACHES else 'default'
+
+
+def version_cache():
+    return caches[get_version_cache_alias()]
+
+
+def is_shared_cache(backend):
+    return not isinstance(backend, PROCESS_LOCAL_BACKENDS)
+
+
+def versions_are_shared():
+    """True اگر نسخه‌ها بین پروسه‌ها (وب و دستورات مدیریتی) مشترک باشند"""
+    return is_shared_cache(version_cache())
+
+
+def new_version():
+    """مقدار نسخه‌ای که تکرار نمی‌شود: زمان فعلی (نانوثانیه)، اکیداً صعودی در هر پروسه"""
+    with _lock:
+        version = max(time.time_ns(), _state['last_version'] + 1)
+        _state['last_version'] = version
+    return version
+
+
+def _version_key(namespace):
+    return f'{KEY_PREFIX}:version:{namespace}'
+
+
+def get_version(namespace):
+    key = _version_key(namespace)
+    backend = version_cache()
+    version = backend.get(key)
+    if version is None:
+        backend.add(key, new_version(), timeout=None)
+        # DummyCache چیزی نگه نمی‌دارد؛ نسخه یک‌بار مصرف هیچ کلید کش شده‌ای را پیدا نمی‌کند
+        version = backend.get(key) or new_version()
+    return version
+
+
+def bump_version(namespace):
+    # مقدار جدید به جای incr: روی backendهای بدون incr اتمی (file، database) دو bump
+    # هم‌زمان یکدیگر را خنثی نمی‌کنند و کلید بیرون رانده شده هم مقدار قدیمی نمی‌گیرد
+    version = new_version()
+    version_cache().set(_version_key(namespace), version, timeout=None)
+    return version
+
+
+def get_versions(namespaces, extra_keys=()):
+    """
+    نسخه چند namespace با یک درخواست به کش نسخه‌ها (get_many)؛ برای namespaceهایی
+    که هنوز نسخه ندارند یک نسخه جدید با ``cache.add`` ثبت می‌شود. مقدار کلیدهای
+    extra_keys (در همان کش) هم در همان درخواست خوانده می‌شود.
+    """
+    backend = version_cache()
+    keys = [_version_key(namespace) for namespace in namespaces]
+    found = backend.get_many(keys + list(extra_keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            backend.add(key, new_version(), timeout=None)
+        found.update(backend.get_many(missing))
+    versions = [found.get(key) or new_version() for key in keys]
+    return versions, {key: found[key] for key in extra_keys if key in found}
+
+
+def versioned_key(namespace, *parts):
+    suffix = ':'.join(str(part) for part in parts)
+    return f'{KEY_PREFIX}:{namespace}:v{get_version(namespace)}:{suffix}'
+
+
+def get_or_build(namespace, parts, builder, timeout=DEFAULT_TIMEOUT):
+    """مقدار کش شده را برمی‌گرداند یا با builder می‌سازد و ذخیره می‌کند."""
+    key = versioned_key(namespace, *parts)
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, timeout)
+    return value
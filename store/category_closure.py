@@ -0,0 +1,89 @@
+"""
+بستار (closure) دسته‌بندی‌ها بر اساس MPTT.
+
+هر دسته‌بندی با زیرمجموعه‌هایش معادل بازه ``(tree_id, lft, rght)`` است؛ آیدی‌ها و
+slugها از یک نقشه کش شده نسخه‌دار به بازه تبدیل می‌شوند (بدون کوئری جداگانه برای
+هر دسته‌بندی و بدون ساختن لیست آیدی زیرمجموعه‌ها) و فیلتر با شرط Exists روی جدول
+واسط و شرط بازه‌ای انجام می‌شود تا نیازی به distinct نباشد.
+
+نقشه با تغییر دسته‌بندی‌ها (سیگنال‌ها) بی‌اعتبار می‌شود؛ بعد از
+``Category.objects.rebuild()`` باید ``invalidate_category_closure`` صدا زده شود.
+"""
+import threading
+
+from django.db.models import Exists, OuterRef, Q
+
+from .cache import bump_version, get_or_build, get_version
+from .models import Category, Product, Specification
+
+CLOSURE_NAMESPACE = 'category-closure'
+
+_lock = threading.Lock()
+_state = {'version': None, 'map': None}
+
+
+def build_category_map():
+    """``{'ids': {id: (tree_id, lft, rght)}, 'slugs': {slug: id}}`` با یک کوئری"""
+    ids, slugs = {}, {}
+    for category_id, slug, tree_id, lft, rght in Category.objects.values_list('id', 'slug', 'tree_id', 'lft', 'rght'):
+        ids[category_id] = (tree_id, lft, rght)
+        if slug:
+            slugs[slug] = category_id
+    return {'ids': ids, 'slugs': slugs}
+
+
+def get_category_map():
+    """نقشه دسته‌بندی‌ها؛ در حافظه پروسه تا زمان تغییر نسخه نگه داشته می‌شود."""
+    version = get_version(CLOSURE_NAMESPACE)
+    if _state['version'] != version:
+        with _lock:
+            if _state['version'] != version:
+                _state['map'] = get_or_build(CLOSURE_NAMESPACE, ['map'], build_category_map)
+                _state['version'] = version
+    return _state['map']
+
+
+def invalidate_category_closure():
+    bump_version(CLOSURE_NAMESPACE)
+
+
+def resolve_category_ranges(ids=(), slugs=()):
+    """
+    بازه‌های MPTT دسته‌بندی‌های داده شده (آیدی یا slug)؛ بازه‌هایی که داخل بازه
+    دیگری هستند حذف می‌شوند. دسته‌بندی‌های ناموجود نادیده گرفته می‌شوند.
+    """
+    category_map = get_category_map()
+    ranges = [category_map['ids'][category_id] for category_id in ids if category_id in category_map['ids']]
+    ranges += [category_map['ids'][category_map['slugs'][slug]] for slug in slugs if slug in category_map['slugs']]
+    merged = []
+    for tree_id, lft, rght in sorted(set(ranges)):
+        if merged and merged[-1][0] == tree_id and merged[-1][2] >= rght:
+            continue
+        merged.append((tree_id, lft, rght))
+    return merged
+
+
+def ranges_q(ranges, prefix='category__'):
+    condition = Q()
+    for tree_id, lft, rght in ranges:
+        condition |= Q(**{f'{prefix}tree_id': tree_id, f'{prefix}lft__gte': lft, f'{prefix}rght__lte': rght})
+    return condition
+
+
+def in_category_ranges(ranges, through=Product.categories.through, owner_field='product_id'):
+    """شرط Exists روی جدول واسط many-to-many با دسته‌بندی برای بازه‌های داده شده."""
+    return Exists(through.objects.filter(ranges_q(ranges), **{owner_field: OuterRef('pk')}))
+
+
+def filter_products_by_categories(queryset, ids=(), slugs=()):
+    ranges = resolve_category_ranges(ids, slugs)
+    if not ranges:
+        return queryset.none()
+    return queryset.filter(in_category_ranges(ranges))
+
+
+def filter_specifications_by_categories(queryset, ids=(), slugs=()):
+    ranges = resolve_category_ranges(ids, slugs)
+    if not ranges:
+        return queryset.none()
+    return queryset.filter(in_category_ranges(ranges, Specification.categories.through, 'specification_id'))
@@ -0,0 +1,83 @@
+"""
+ساخت درخت دسته‌بندی‌ها با یک کوئری.
+
+همه نودهای لازم با یک کوئری بازه‌ای MPTT (``tree_id``/``lft``/``rght``/``level``)
+به ترتیب درخت خوانده می‌شوند و ``mptt.utils.get_cached_trees`` فرزندان را در
+``_cached_children`` قرار می‌دهد؛ ``get_children()`` در django-mptt از همین کش
+استفاده می‌کند و کوئری جدیدی نمی‌زند.
+
+تعداد محصولات فعال هر دسته‌بندی (با زیرمجموعه‌ها) هم یک‌جا محاسبه و در کش
+نسخه‌دار نگهداری می‌شود.
+"""
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from mptt.utils import get_cached_trees
+
+from .cache import bump_version, get_or_build
+from .category_closure import in_category_ranges
+from .models import Category, Product
+
+
+def load_category_tree(root=None, max_depth=None, queryset=None):
+    """
+    ریشه‌های درخت (یا زیردرخت ``root``) تا عمق ``max_depth`` با فرزندان کش شده.
+    max_depth=1 فقط خود ریشه‌ها را برمی‌گرداند.
+    """
+    queryset = Category.objects.all() if queryset is None else queryset
+    base_level = 0
+    if root is not None:
+        queryset = queryset.filter(tree_id=root.tree_id, lft__gte=root.lft, rght__lte=root.rght)
+        base_level = root.level
+    if max_depth is not None:
+        queryset = queryset.filter(level__lt=base_level + max_depth)
+    return get_cached_trees(queryset.order_by('tree_id', 'lft'))
+
+
+# --- تعداد محصولات هر دسته‌بندی ---
+
+PRODUCT_COUNTS_NAMESPACE = 'category-product-counts'
+
+
+def in_category_subtree(category):
+    """شرط Exists برای محصولاتی که در category یا یکی از زیرمجموعه‌های آن هستند."""
+    return in_category_ranges([(category.tree_id, category.lft, category.rght)])
+
+
+def category_products(queryset, category_range):
+    """
+    محصولات یک دسته‌بندی: محصولات فعال خود آن و زیرمجموعه‌هایش (بازه MPTT
+    ``(tree_id, lft, rght)``). ``product_count``، ``?expand=products`` و
+    ``/categories/{id}/products/`` همه همین قاعده را دارند.
+    """
+    return queryset.filter(in_category_ranges([category_range]), is_active=True)
+
+
+def build_category_product_counts():
+    """
+    ``{category_id: تعداد محصولات فعال دسته‌بندی و زیرمجموعه‌هایش}`` با یک کوئری
+    (همان قاعده category_products)
+    """
+    products = (
+        Product.objects.filter(
+            is_active=True,
+            categories__tree_id=OuterRef('tree_id'),
+            categories__lft__gte=OuterRef('lft'),
+            categories__rght__lte=OuterRef('rght'),
+        )
+        .order_by()
+        .values('is_active')
+        .annotate(count=Count('id', distinct=True))
+        .values('count')
+    )
+    rows = Category.objects.annotate(
+        product_count=Coalesce(Subquery(products), 0),
+    ).values_list('id', 'product_count')
+    return dict(rows)
+
+
+def get_category_product_counts():
+    return get_or_build(PRODUCT_COUNTS_NAMESPACE, ['all'], build_category_product_counts)
+
+
+def invalidate_category_product_counts():
+    bump_version(PRODUCT_COUNTS_NAMESPACE)
@@ -0,0 +1,64 @@
+"""
+شمارنده‌های تغییر برای درخواست‌های شرطی (ETag / Last-Modified).
+
+هر مدل کاتالوگ یک شمارنده در سطح مدل (``changes:product``) و در صورت نیاز یک
+شمارنده برای هر شیء (``changes:product:12``) دارد که بعد از commit تغییرات
+(سیگنال‌های store.signals) بالا می‌رود؛ زمان آخرین تغییر هم برای Last-Modified
+نگهداری می‌شود. ETag هر پاسخ از آدرس درخواست و نسخه وابستگی‌های آن ساخته می‌شود،
+پس بررسی ``If-None-Match`` فقط یک درخواست ``get_many`` به کش است.
+
+شمارنده‌ها و زمان‌های تغییر در کش نسخه‌ها (store.cache، ``STORE_VERSION_CACHE``)
+هستند که باید بین پروسه وب و دستورات مدیریتی مشترک و بدون حذف زودهنگام باشد؛
+در غیر این صورت تغییرات دستورات مدیریتی به ETag سرور نمی‌رسد.
+"""
+import hashlib
+import time
+
+from django.db import transaction
+
+from .cache import KEY_PREFIX, bump_version, get_versions, version_cache
+
+CHANGES_PREFIX = 'changes'
+
+
+def model_label(model):
+    return model if isinstance(model, str) else model._meta.model_name
+
+
+def change_namespace(model, pk=None):
+    label = model_label(model)
+    return f'{CHANGES_PREFIX}:{label}' if pk is None else f'{CHANGES_PREFIX}:{label}:{pk}'
+
+
+def _modified_key(namespace):
+    return f'{KEY_PREFIX}:modified:{namespace}'
+
+
+def bump_changes(model, object_ids=()):
+    """شمارنده مدل و اشیای داده شده را بالا می‌برد (فوری؛ معمولاً از on_commit صدا زده می‌شود)."""
+    now = time.time()
+    namespaces = [change_namespace(model)] + [change_namespace(model, pk) for pk in set(object_ids) if pk is not None]
+    for namespace in namespaces:
+        bump_version(namespace)
+    version_cache().set_many({_modified_key(namespace): now for namespace in namespaces}, timeout=None)
+
+
+def schedule_bump_changes(model, object_ids=()):
+    """بعد از commit تراکنش جاری شمارنده‌ها را بالا می‌برد تا ETag جدید با داده قدیمی ساخته نشود."""
+    label = model_label(model)
+    object_ids = list(object_ids)
+    transaction.on_commit(lambda: bump_changes(label, object_ids))
+
+
+def get_validators(namespaces, fingerprint=''):
+    """
+    ``(etag, last_modified)`` برای مجموعه namespaceها؛ last_modified زمان (ثانیه epoch)
+    آخرین تغییر یا None است.
+    """
+    namespaces = sorted(set(namespaces))
+    modified_keys = [_modified_key(namespace) for namespace in namespaces]
+    versions, modified = get_versions(namespaces, modified_keys)
+    token = '|'.join(f'{namespace}={version}' for namespace, version in zip(namespaces, versions))
+    digest = hashlib.sha1(f'{fingerprint}|{token}'.encode()).hexdigest()[:32]
+    last_modified = max(modified.values()) if modified else None
+    return f'"{digest}"', last_modified
@@ -0,0 +1,19 @@
+from django.core import checks
+
+from .cache import get_version_cache_alias, versions_are_shared
+
+
+@checks.register(checks.Tags.caches)
+def check_version_cache(app_configs, **kwargs):
+    """نسخه‌های کش و شمارنده‌های ETag باید بین پروسه‌ها مشترک باشند (store.cache)"""
+    if versions_are_shared():
+        return []
+    return [checks.Warning(
+        f'Cache "{get_version_cache_alias()}" used for catalog cache versions and ETag counters is process-local.',
+        hint=(
+            'Changes made by management commands will not invalidate cached data or ETags of the web process, '
+            'and the anonymous response cache is disabled. '
+            'Point STORE_VERSION_CACHE at a file, database, Redis or Memcached cache.'
+        ),
+        id='store.W001',
+    )]
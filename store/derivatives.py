@@ -0,0 +1,197 @@
+"""
+نسخه‌های کوچک و WebP تصاویر (برای ``srcset`` در صفحات لیست).
+
+بعد از ذخیره تصویر جدید (ArvanImageUploadMixin) ساخت نسخه‌ها بعد از commit در
+همان workerهای صف آپلود (store.uploads) اجرا می‌شود: برای هر عرض ثابت کوچک‌تر از
+تصویر اصلی یک نسخه WebP و یک نسخه JPEG/PNG (برای مرورگرهای بدون WebP) و یک WebP
+هم‌اندازه اصلی ساخته، در storage ذخیره و در فضای ابری آپلود می‌شود. نام فایل‌ها در
+فیلد ``image_variants`` مدل (به تفکیک فیلد تصویر) ثبت می‌شود::
+
+    {'image': {'source': 'products/a.jpg', 'webp': {'160': ..., '1200': ...},
+               'fallback': {'160': ..., '1200': 'products/a.jpg'}}}
+
+تا وقتی نسخه‌ها برای فایل فعلی فیلد ساخته نشده‌اند ``build_srcset`` مقدار None
+برمی‌گرداند و کلاینت از تصویر اصلی استفاده می‌کند.
+
+تنظیمات:
+- ``STORE_IMAGE_WIDTHS``: عرض نسخه‌های کوچک (پیش‌فرض ۱۶۰، ۳۲۰ و ۶۴۰)
+- ``STORE_IMAGE_WEBP_QUALITY`` و ``STORE_IMAGE_JPEG_QUALITY``: کیفیت فشرده‌سازی
+"""
+import io
+import logging
+import posixpath
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models, transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+from . import uploads
+from .media_urls import build_url
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_FIELD = 'image_variants'
+DEFAULT_WIDTHS = (160, 320, 640)
+DEFAULT_WEBP_QUALITY = 80
+DEFAULT_JPEG_QUALITY = 85
+CONTENT_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+
+# بعد از ثبت نسخه‌ها ارسال می‌شود (sender: کلاس مدل، instance) تا کش‌ها و ETagها به‌روز شوند
+derivatives_generated = Signal()
+
+
+def get_widths():
+    return sorted(getattr(settings, 'STORE_IMAGE_WIDTHS', DEFAULT_WIDTHS))
+
+
+def get_webp_quality():
+    return getattr(settings, 'STORE_IMAGE_WEBP_QUALITY', DEFAULT_WEBP_QUALITY)
+
+
+def get_jpeg_quality():
+    return getattr(settings, 'STORE_IMAGE_JPEG_QUALITY', DEFAULT_JPEG_QUALITY)
+
+
+def has_variants(model):
+    return any(field.name == VARIANTS_FIELD for field in model._meta.concrete_fields)
+
+
+def image_fields(model):
+    return [field.name for field in model._meta.concrete_fields if isinstance(field, models.ImageField)]
+
+
+def is_current(instance, field_name):
+    field_file = getattr(instance, field_name)
+    variants = (getattr(instance, VARIANTS_FIELD, None) or {}).get(field_name)
+    return bool(field_file) and bool(variants) and variants.get('source') == field_file.name
+
+
+def derivative_name(source_name, width, extension):
+    # پسوند اصلی در نام می‌ماند تا a.jpg و a.png نسخه‌های یکدیگر را بازنویسی نکنند
+    directory, filename = posixpath.split(source_name)
+    return posixpath.join(directory, 'derivatives', f'{filename}-{width}.{extension}')
+
+
+def enqueue_derivatives(instance, field_name):
+    """ساخت نسخه‌های فیلد را بعد از commit در صف می‌گذارد، مگر اینکه برای همین فایل ساخته شده باشند."""
+    if not has_variants(type(instance)) or not getattr(instance, field_name) or is_current(instance, field_name):
+        return False
+    label, object_id = instance._meta.label_lower, instance.pk
+    transaction.on_commit(lambda: uploads.run_in_background(generate_derivatives, label, object_id, field_name))
+    return True
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def _encode(image, image_format):
+    buffer = io.BytesIO()
+    if image_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=get_webp_quality(), method=4)
+    elif image_format == 'PNG':
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        image.convert('RGB').save(buffer, 'JPEG', quality=get_jpeg_quality(), optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def render_derivatives(source):
+    """
+    نسخه‌های یک تصویر باز شده: لیست ``(width, extension, image_format, data)`` و عرض
+    تصویر اصلی. نسخه fallback هم‌اندازه اصلی ساخته نمی‌شود (خود فایل اصلی است).
+    """
+    with Image.open(source) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+    if _has_alpha(image):
+        image = image.convert('RGBA')
+        fallback_format, fallback_extension = 'PNG', 'png'
+    else:
+        image = image.convert('RGB')
+        fallback_format, fallback_extension = 'JPEG', 'jpg'
+
+    rendered = []
+    for width in [width for width in get_widths() if width < image.width]:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        rendered.append((width, 'webp', 'WEBP', _encode(resized, 'WEBP')))
+        rendered.append((width, fallback_extension, fallback_format, _encode(resized, fallback_format)))
+    rendered.append((image.width, 'webp', 'WEBP', _encode(image, 'WEBP')))
+    return rendered, image.width
+
+
+def _store(storage, name, data, image_format):
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(data))
+    bucket = uploads.get_bucket()
+    if not bucket:
+        return
+    for attempt in range(1, uploads.get_max_attempts() + 1):
+        try:
+            uploads.get_client().upload_fileobj(
+                io.BytesIO(data), bucket, name,
+                ExtraArgs={'ACL': 'public-read', 'ContentType': CONTENT_TYPES[image_format]},
+            )
+            return
+        except Exception:
+            if attempt >= uploads.get_max_attempts():
+                raise
+            time.sleep(uploads.RETRY_DELAY * 2 ** (attempt - 1))
+
+
+def generate_derivatives(model_label, object_id, field_name):
+    """
+    نسخه‌های فیلد تصویر را می‌سازد و در ``image_variants`` ثبت می‌کند؛ دیکشنری نسخه‌ها
+    یا None (اگر شیء یا تصویر دیگر وجود نداشته باشد) را برمی‌گرداند.
+    """
+    model = apps.get_model(model_label)
+    instance = model._default_manager.filter(pk=object_id).first()
+    field_file = getattr(instance, field_name, None) if instance is not None else None
+    if not field_file:
+        return None
+    source_name, storage = field_file.name, field_file.storage
+    try:
+        with storage.open(source_name, 'rb') as source:
+            rendered, width = render_derivatives(source)
+        variants = {'source': source_name, 'width': width, 'webp': {}, 'fallback': {str(width): source_name}}
+        for derivative_width, extension, image_format, data in rendered:
+            name = derivative_name(source_name, derivative_width, extension)
+            _store(storage, name, data, image_format)
+            variants['webp' if image_format == 'WEBP' else 'fallback'][str(derivative_width)] = name
+    except Exception as exc:
+        # تصویر خراب یا خطای فضای ابری؛ با ذخیره بعدی یا backfill_image_derivatives دوباره ساخته می‌شود
+        logger.warning('Image derivatives of %s %s.%s failed: %s', model_label, object_id, field_name, exc)
+        return None
+
+    with transaction.atomic():
+        # فیلدهای دیگر همین شیء (مثلاً icon دسته‌بندی) ممکن است هم‌زمان در worker دیگری باشند
+        locked = model._default_manager.select_for_update().filter(pk=object_id)
+        row = locked.values(VARIANTS_FIELD, field_name).first()
+        if row is None or row[field_name] != source_name:
+            return None
+        all_variants = dict(row[VARIANTS_FIELD] or {}, **{field_name: variants})
+        model._default_manager.filter(pk=object_id).update(**{VARIANTS_FIELD: all_variants})
+        setattr(instance, VARIANTS_FIELD, all_variants)
+        derivatives_generated.send(sender=model, instance=instance)
+    return variants
+
+
+def build_srcset(instance, field_name):
+    """
+    نقشه srcset فیلد تصویر: ``{'webp': {'160w': url, ...}, 'fallback': {...}}`` به
+    ترتیب عرض، یا None اگر نسخه‌ها برای فایل فعلی فیلد هنوز ساخته نشده‌اند.
+    """
+    if not is_current(instance, field_name):
+        return None
+    variants = getattr(instance, VARIANTS_FIELD)[field_name]
+    storage = getattr(instance, field_name).storage
+    return {
+        kind: {f'{width}w': build_url(variants[kind][width], storage) for width in sorted(variants[kind], key=int)}
+        for kind in ('webp', 'fallback')
+    }
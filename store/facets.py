@@ -0,0 +1,288 @@
+"""
+ایندکس facet دسته‌بندی‌ها و شمارش facetهای جستجوی محصولات.
+
+برای هر دسته‌بندی، مشخصات فنی آن به همراه مقادیر یکتا و تعداد محصولات هر مقدار
+(شامل محصولات زیرمجموعه‌ها در درخت MPTT) با یک کوئری گروه‌بندی شده ساخته و در
+کش نسخه‌دار نگهداری می‌شود. هر تغییر در ProductSpecification، دسته‌بندی محصولات
+یا تعریف مشخصات، نسخه را بالا می‌برد.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Case, CharField, Count, F, Value, When
+from django.db.models.functions import Cast
+
+from .cache import bump_version, get_or_build
+from .models import Category, ProductSpecification, Specification, SpecificationValue
+
+FACETS_NAMESPACE = 'category-facets'
+
+
+def invalidate_category_facets():
+    bump_version(FACETS_NAMESPACE)
+
+
+def build_category_facets(category):
+    """
+    لیست مشخصات دسته‌بندی با مقادیر:
+    ``[{'id', 'name', 'data_type', 'unit', 'value': [{'id', 'value', 'count'}]}]``
+    که id هر مقدار آیدی SpecificationValue (مقدار یکتای مشخصه) است.
+    """
+    specs = list(category.spec_definitions.order_by('id'))
+    if not specs:
+        return []
+    values = defaultdict(list)
+    rows = (
+        ProductSpecification.objects.filter(
+            specification__in=specs,
+            product__is_active=True,
+            product__categories__tree_id=category.tree_id,
+            product__categories__lft__gte=category.lft,
+            product__categories__rght__lte=category.rght,
+        )
+        .exclude(canonical_value__isnull=True)
+        .values('specification_id', 'canonical_value_id', 'canonical_value__value')
+        .annotate(count=Count('product', distinct=True))
+        .order_by('specification_id', 'canonical_value__value')
+    )
+    for row in rows:
+        values[row['specification_id']].append({
+            'id': row['canonical_value_id'],
+            'value': row['canonical_value__value'],
+            'count': row['count'],
+        })
+    return [
+        {
+            'id': spec.id,
+            'name': spec.name,
+            'data_type': spec.data_type,
+            'unit': spec.unit,
+            'value': values.get(spec.id, []),
+        }
+        for spec in specs
+    ]
+
+
+def get_category_facets(category):
+    """facetهای کش شده یک دسته‌بندی (نمونه مدل یا آیدی)."""
+    if isinstance(category, Category):
+        category_id = category.pk
+    else:
+        try:
+            category_id = int(category)
+        except (TypeError, ValueError):
+            return []
+
+    def build():
+        instance = category if isinstance(category, Category) else (
+            Category.objects.filter(pk=category_id).first()
+        )
+        if instance is None:
+            return []
+        return build_category_facets(instance)
+
+    return get_or_build(FACETS_NAMESPACE, [category_id], build)
+
+
+def get_category_facet_values(category):
+    """``{specification_id: [{'id', 'value', 'count'}, ...]}`` برای یک دسته‌بندی."""
+    return {spec['id']: spec['value'] for spec in get_category_facets(category)}
+
+
+# --- facetهای جستجوی محصولات ---
+
+# بازه‌های قیمت (تومان) برای facet قیمت؛ با STORE_PRICE_FACET_BUCKETS قابل تغییر است
+DEFAULT_PRICE_BUCKETS = [5_000_000, 10_000_000, 20_000_000, 50_000_000, 100_000_000]
+
+# پارامترهایی که انتخاب مقدار (یا وجود) یک مشخصه مشخص هستند؛ هر مشخصه در facet
+# ``spec`` فقط انتخاب‌های خودش را نادیده می‌گیرد (spec_groups برای همه اعمال می‌شود)
+SPEC_SELECTION_PARAMS = {
+    'specification': 'name', 'spec_value': 'name',
+    'spec_by_id': 'value_ids', 'spec_value_ids': 'value_ids', 'spec_ids': 'spec_ids',
+}
+
+
+def get_price_buckets():
+    return getattr(settings, 'STORE_PRICE_FACET_BUCKETS', DEFAULT_PRICE_BUCKETS)
+
+
+def price_bucket_expression(field='summary__min_final_price'):
+    """برچسب بازه قیمت هر محصول، مثل ``"5000000-10000000"`` یا ``"100000000-"``"""
+    bounds = get_price_buckets()
+    whens = []
+    lower = 0
+    for upper in bounds:
+        whens.append(When(**{f'{field}__lt': upper}, then=Value(f'{lower}-{upper}')))
+        lower = upper
+    return Case(
+        When(**{f'{field}__isnull': True}, then=Value(None)),
+        *whens,
+        default=Value(f'{lower}-'),
+        output_field=CharField(),
+    )
+
+
+def _as_text(expression):
+    return Cast(expression, output_field=CharField())
+
+
+def _no_group():
+    return Value(None, output_field=CharField())
+
+
+# نام facet -> (پارامترهای فیلتر همین facet، عبارت کلید، عبارت برچسب، عبارت گروه)
+PRODUCT_FACETS = {
+    'brand': (['brands'], lambda: _as_text(F('brand_id')), lambda: F('brand__name'), _no_group),
+    'color': (['colors'], lambda: _as_text(F('options__color_id')), lambda: F('options__color__name'), _no_group),
+    'warranty': (
+        ['warranties', 'has_warranty'],
+        lambda: _as_text(F('options__warranty_id')), lambda: F('options__warranty__name'), _no_group,
+    ),
+    'tag': (['tags'], lambda: _as_text(F('tags__id')), lambda: F('tags__name'), _no_group),
+    # فیلترهای facet مشخصات به تفکیک مشخصه کنار گذاشته می‌شوند (compute_product_facets)
+    'spec': (
+        [],
+        lambda: _as_text(F('spec_values__canonical_value_id')),
+        lambda: F('spec_values__canonical_value__value'),
+        lambda: _as_text(F('spec_values__specification_id')),
+    ),
+    'price': (['price_range_min', 'price_range_max'], price_bucket_expression, price_bucket_expression, _no_group),
+}
+
+
+def _split_items(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def spec_selections(data):
+    """
+    انتخاب‌های فیلتر مشخصات در ``data`` به تفکیک پارامتر:
+    ``{param: [(مقدار خام، مجموعه آیدی مشخصه‌ها یا None)]}``. مقدار خام برای
+    specification و spec_value کل عبارت ``نام:...`` و برای بقیه یک آیتم لیست
+    ویرگولی است؛ آیتم نامعتبر (None) برای همه مشخصه‌ها اعمال می‌ماند.
+    """
+    raw = {}
+    for param, kind in SPEC_SELECTION_PARAMS.items():
+        values = [value for value in data.getlist(param) if value]
+        if kind != 'name':
+            values = [item for value in values for item in _split_items(value)]
+        if values:
+            raw[param] = values
+
+    names, value_ids = set(), set()
+    for param, values in raw.items():
+        for value in values:
+            if SPEC_SELECTION_PARAMS[param] == 'name':
+                names.add(value.split(':')[0].lower())
+            elif SPEC_SELECTION_PARAMS[param] == 'value_ids':
+                spec_id, _, value_id = value.rpartition(':')
+                if not spec_id and value_id.isdigit():
+                    value_ids.add(int(value_id))
+    specs_by_name = defaultdict(set)
+    if names:
+        for spec_id, name in Specification.objects.values_list('id', 'name'):
+            if name.lower() in names:
+                specs_by_name[name.lower()].add(spec_id)
+    spec_of_value = dict(
+        SpecificationValue.objects.filter(id__in=value_ids).values_list('id', 'specification_id')
+    ) if value_ids else {}
+
+    selections = {}
+    for param, values in raw.items():
+        kind = SPEC_SELECTION_PARAMS[param]
+        items = []
+        for value in values:
+            if kind == 'name':
+                specs = specs_by_name.get(value.split(':')[0].lower()) or None
+            elif kind == 'spec_ids':
+                specs = {int(value)} if value.isdigit() else None
+            else:
+                spec_id, _, value_id = value.rpartition(':')
+                if spec_id:
+                    specs = {int(spec_id)} if spec_id.isdigit() and value_id.isdigit() else None
+                else:
+                    specs = {spec_of_value[int(value_id)]} if value_id.isdigit() and int(value_id) in spec_of_value else None
+            items.append((value, specs))
+        selections[param] = items
+    return selections
+
+
+def without_spec_selection(data, selections, spec_ids):
+    """کپی ``data`` بدون انتخاب‌هایی که به مشخصه‌های ``spec_ids`` مربوط‌اند"""
+    data = data.copy()
+    for param, items in selections.items():
+        kept = [value for value, specs in items if not specs or not specs & spec_ids]
+        if SPEC_SELECTION_PARAMS[param] == 'name':
+            data.setlist(param, kept)
+        elif kept:
+            data.setlist(param, [','.join(kept)])
+        else:
+            data.pop(param, None)
+    return data
+
+
+def _facet_part(filterset_class, facet_data, queryset, request, name, facet):
+    key_expression, label_expression, group_expression = facet
+    facet_qs = filterset_class(facet_data, queryset=queryset, request=request).qs
+    return (
+        facet_qs.order_by()
+        .annotate(
+            facet=Value(name, output_field=CharField()),
+            key=key_expression(),
+            label=_as_text(label_expression()),
+            group=group_expression(),
+        )
+        .filter(key__isnull=False)
+    )
+
+
+def _count(part):
+    return part.values('facet', 'key', 'label', 'group').annotate(count=Count('id', distinct=True))
+
+
+def compute_product_facets(filterset_class, data, queryset, request=None):
+    """
+    شمارش facetها برای وضعیت فعلی فیلترها با معنای disjunctive: شمارش هر facet
+    با همه فیلترها به جز فیلترهای خود آن facet انجام می‌شود. در facet ``spec`` این
+    قاعده برای هر مشخصه جداگانه است: مقادیر مشخصه انتخاب شده بدون انتخاب خودش و با
+    فیلتر بقیه مشخصه‌ها، و مقادیر مشخصه‌های انتخاب نشده با همه فیلترها شمرده می‌شوند.
+    همه facetها با یک کوئری UNION ALL گروه‌بندی شده محاسبه می‌شوند.
+
+    خروجی: ``{'brand': [{'key', 'label', 'count'}], ..., 'spec': [{'key', 'label', 'count', 'specification'}]}``
+    که در facet ``spec`` کلید آیدی مقدار یکتا (SpecificationValue، قابل استفاده در
+    ``spec_value_ids``) و ``specification`` آیدی مشخصه است.
+    """
+    parts = []
+    for name, (params, *facet) in PRODUCT_FACETS.items():
+        if name == 'spec':
+            continue
+        facet_data = data.copy()
+        for param in params:
+            facet_data.pop(param, None)
+        parts.append(_count(_facet_part(filterset_class, facet_data, queryset, request, name, facet)))
+
+    _, *spec_facet = PRODUCT_FACETS['spec']
+    selections = spec_selections(data)
+    selected = set()
+    for items in selections.values():
+        for _, specs in items:
+            selected |= specs or set()
+    for spec_id in sorted(selected):
+        facet_data = without_spec_selection(data, selections, {spec_id})
+        part = _facet_part(filterset_class, facet_data, queryset, request, 'spec', spec_facet)
+        parts.append(_count(part.filter(group=str(spec_id))))
+    part = _facet_part(filterset_class, data, queryset, request, 'spec', spec_facet)
+    parts.append(_count(part.exclude(group__in=[str(spec_id) for spec_id in selected])))
+
+    facets = {name: [] for name in PRODUCT_FACETS}
+    for row in parts[0].union(*parts[1:], all=True):
+        item = {'key': row['key'], 'label': row['label'], 'count': row['count']}
+        if row['facet'] == 'spec':
+            item['specification'] = int(row['group'])
+        facets[row['facet']].append(item)
+    for name, items in facets.items():
+        if name == 'price':
+            items.sort(key=lambda item: int(item['key'].split('-')[0]))
+        else:
+            items.sort(key=lambda item: (-item['count'], item['label'] or ''))
+    return facets
@@ -0,0 +1,44 @@
+"""
+متادیتای فیلترها (بلوک ``filters`` پاسخ لیست‌ها).
+
+بخش ثابت (label، help_text و choices هر فیلتر) به درخواست وابسته نیست و برای
+هر کلاس FilterSet یک بار در هر پروسه ساخته می‌شود. بخش داینامیک (مثل
+``spec_value_choices`` در CategoryFilter) از متد ``get_dynamic_metadata(request)``
+کلاس فیلتر خوانده می‌شود که خودش از کش نسخه‌دار استفاده می‌کند.
+"""
+import threading
+
+_lock = threading.Lock()
+_static_schemas = {}
+
+
+def build_static_schema(filterset_class):
+    # FilterSet برچسب فیلترهای خودکار را هنگام ساخت نمونه از مدل می‌سازد
+    filterset = filterset_class(queryset=filterset_class._meta.model._default_manager.none())
+    return {
+        name: {
+            'label': getattr(f, 'label', name),
+            'help_text': getattr(f, 'help_text', ''),
+            'choices': getattr(f, 'choices', None),
+        }
+        for name, f in filterset.filters.items()
+    }
+
+
+def get_static_schema(filterset_class):
+    schema = _static_schemas.get(filterset_class)
+    if schema is None:
+        with _lock:
+            schema = _static_schemas.get(filterset_class)
+            if schema is None:
+                schema = _static_schemas[filterset_class] = build_static_schema(filterset_class)
+    return schema
+
+
+def get_filter_schema(filterset_class, request=None):
+    """بلوک filters پاسخ: متادیتای ثابت کش شده به همراه choices داینامیک"""
+    schema = dict(get_static_schema(filterset_class))
+    get_dynamic_metadata = getattr(filterset_class, 'get_dynamic_metadata', None)
+    if get_dynamic_metadata is not None:
+        schema.update(get_dynamic_metadata(request))
+    return schema
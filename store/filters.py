@@ -1,10 +1,58 @@
 from django_filters import FilterSet, RangeFilter, CharFilter, BooleanFilter, ChoiceFilter, NumberFilter, Filter
-from django.db.models import Q
+from decimal import Decimal, InvalidOperation
+from django.db.models import Exists, OuterRef, Q
+from rest_framework.filters import OrderingFilter
 from .models import Category, Product, Brand, Color, Specification, Tag, SpecificationGroup, Warranty, ProductOption
+from .models import ProductSpecification
+from .models import SPEC_FALSE_VALUES, SPEC_TRUE_VALUES
+from .text import normalize_persian
+from .search import search_products
+from .category_closure import filter_products_by_categories, filter_specifications_by_categories
+
+def _parse_number(value):
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        return None
+    return number if number.is_finite() else None
+
+
+def related_exists(model, *conditions, owner='product', **lookups):
+    """
+    شرط EXISTS همبسته روی مدل مرتبط (گزینه‌ها، مقادیر مشخصات، جدول واسط تگ‌ها)؛
+    برخلاف join روی رابطه چندتایی ردیف تکراری نمی‌سازد و نیازی به distinct ندارد.
+    """
+    return Exists(model.objects.filter(*conditions, **{owner: OuterRef('pk')}, **lookups))
+
+
+def spec_value_ids_q(value, prefix):
+    """
+    شرط OR روی آیدی مقادیر یکتای مشخصات؛ هر آیتم "value_id" یا "spec_id:value_id" است.
+    برای ورودی نامعتبر None برمی‌گرداند.
+    """
+    if isinstance(value, str):
+        value = value.split(',')
+    condition = Q()
+    try:
+        for item in value:
+            item = str(item).strip()
+            if not item:
+                continue
+            spec_id, _, value_id = item.rpartition(':')
+            item_q = Q(**{f'{prefix}canonical_value_id': int(value_id)})
+            if spec_id:
+                item_q &= Q(**{f'{prefix}specification_id': int(spec_id)})
+            condition |= item_q
+    except (TypeError, ValueError):
+        return None
+    return condition
+
 
 class CommaSeparatedModelMultipleChoiceFilter(Filter):
     def __init__(self, *args, **kwargs):
         self.queryset = kwargs.pop('queryset', None)
+        # (مدل مرتبط، فیلد مالک): field_name روی مدل مرتبط و شرط به صورت EXISTS
+        self.related = kwargs.pop('related', None)
         self.field_name = kwargs.get('field_name')
         super().__init__(*args, **kwargs)
 
@@ -23,8 +71,35 @@ class CommaSeparatedModelMultipleChoiceFilter(Filter):
             value = [int(v) for v in value]
         except Exception:
             return qs.none()
+        if self.related:
+            model, owner = self.related
+            return qs.filter(related_exists(model, owner=owner, **{f"{self.field_name}__in": value}))
         return qs.filter(**{f"{self.field_name}__in": value})
 
+class StableOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter که همیشه id را به عنوان کلید آخر اضافه می‌کند تا ترتیب
+    بین صفحه‌ها پایدار بماند (برای صفحه‌بندی offset و cursor).
+    """
+    tiebreaker = '-id'
+
+    def get_default_ordering(self, view):
+        ordering = super().get_default_ordering(view)
+        # نتایج جستجو به ترتیب امتیاز مرتبط بودن (اگر ترتیب دیگری خواسته نشده باشد)
+        if self.has_search_rank:
+            return ['-search_rank']
+        return ordering
+
+    def get_ordering(self, request, queryset, view):
+        self.has_search_rank = 'search_rank' in queryset.query.annotations
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        ordering = list(ordering)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append(self.tiebreaker)
+        return ordering
+
 # --- SpecificationFilter ---
 class SpecificationFilter(FilterSet):
     """
@@ -35,7 +110,7 @@ class SpecificationFilter(FilterSet):
         field_name='categories',
         queryset=Category.objects.all(),
         label='دسته‌بندی‌ها',
-        method='filter_categories_with_children',
+        method='filter_categories',
     )
     group = CommaSeparatedModelMultipleChoiceFilter(
         field_name='group',
@@ -55,11 +130,13 @@ class SpecificationFilter(FilterSet):
     def filter_categories(self, queryset, name, value):
         if not value:
             return queryset
-        all_ids = set()
-        for cat in value:
-            all_ids.add(cat.id)
-            all_ids.update(cat.get_descendants().values_list('id', flat=True))
-        return queryset.filter(categories__in=all_ids).distinct()
+        if isinstance(value, str):
+            value = [v.strip() for v in value.split(',') if v.strip()]
+        try:
+            ids = [v.id if isinstance(v, Category) else int(v) for v in value]
+        except (TypeError, ValueError):
+            return queryset.none()
+        return filter_specifications_by_categories(queryset, ids=ids)
 
     class Meta:
         model = Specification
@@ -143,6 +220,7 @@ class ProductOptionFilter(FilterSet):
     """
     search = CharFilter(method='filter_search', label='جستجو')
     price_range = RangeFilter(field_name='option_price', label='محدوده قیمت')
+    final_price_range = RangeFilter(field_name='effective_price', label='محدوده قیمت نهایی')
     discount_range = RangeFilter(field_name='discount', label='محدوده تخفیف')
     has_warranty = BooleanFilter(method='filter_has_warranty', label='دارای گارانتی')
     has_discount = BooleanFilter(method='filter_has_discount', label='دارای تخفیف')
@@ -187,11 +265,12 @@ class ProductOptionFilter(FilterSet):
 class ProductFilter(FilterSet):
     search = CharFilter(method='filter_search', label='جستجو')
     in_stock = BooleanFilter(method='filter_in_stock', label='موجودی')
-    price_range = RangeFilter(field_name='options__option_price', label='محدوده قیمت')
+    price_range = RangeFilter(field_name='summary__min_final_price', label='محدوده قیمت')
     has_discount = BooleanFilter(method='filter_has_discount', label='دارای تخفیف')
     has_warranty = BooleanFilter(method='filter_has_warranty', label='دارای گارانتی')
     tags = CommaSeparatedModelMultipleChoiceFilter(
-        field_name='tags',
+        field_name='tag',
+        related=(Product.tags.through, 'product'),
         queryset=Tag.objects.all(),
         label='تگ‌ها',
     )
@@ -201,19 +280,22 @@ class ProductFilter(FilterSet):
         label='برندها',
     )
     colors = CommaSeparatedModelMultipleChoiceFilter(
-        field_name='options__color',
+        field_name='color',
+        related=(ProductOption, 'product'),
         queryset=Color.objects.all(),
         label='رنگ‌ها',
     )
     categories = CharFilter(method='filter_categories_with_children', label='دسته‌بندی‌ها')
     category_title = CharFilter(method='filter_categories_by_slug', label='دسته‌بندی‌ها (با slug)')
     warranties = CommaSeparatedModelMultipleChoiceFilter(
-        field_name='options__warranty',
+        field_name='warranty',
+        related=(ProductOption, 'product'),
         queryset=Warranty.objects.all(),
         label='گارانتی‌ها',
     )
     spec_groups = CommaSeparatedModelMultipleChoiceFilter(
-        field_name='spec_values__specification__group',
+        field_name='specification__group',
+        related=(ProductSpecification, 'product'),
         queryset=SpecificationGroup.objects.all(),
         label='گروه‌های مشخصات',
     )
@@ -221,7 +303,8 @@ class ProductFilter(FilterSet):
     spec_value = CharFilter(method='filter_specification', label='مقدار مشخصه (نام:مقدار)')
     spec_by_id = CharFilter(method='filter_specification_by_id', label='مشخصات فنی (آیدی مقدار)')
     spec_ids = CommaSeparatedModelMultipleChoiceFilter(
-        field_name='spec_values__specification',
+        field_name='specification',
+        related=(ProductSpecification, 'product'),
         queryset=Specification.objects.all(),
         label='مشخصات فنی (آیدی)',
     )
@@ -234,42 +317,31 @@ class ProductFilter(FilterSet):
     
 
     def filter_search(self, queryset, name, value):
+        # جستجوی متن کامل روی سند جستجوی نرمال شده محصول (store.search)
         if not value:
             return queryset
-        return queryset.filter(
-            Q(title__icontains=value) |
-            Q(description__icontains=value) |
-            Q(brand__name__icontains=value) |
-            Q(categories__name__icontains=value) |
-            Q(spec_values__specification__name__icontains=value)
-        ).distinct()
+        return search_products(queryset, value)
     
     def filter_in_stock(self, queryset, name, value):
+        # از ProductSummary استفاده می‌شود (موجودی کل ویژگی‌های فعال)
         if value is None:
             return queryset
         if value:
-            return queryset.filter(options__quantity__gt=0, options__is_active=True).distinct()
-        return queryset.filter(options__quantity=0).distinct()
+            return queryset.filter(summary__total_quantity__gt=0)
+        return queryset.filter(Q(summary__total_quantity=0) | Q(summary__isnull=True))
     
     def filter_has_discount(self, queryset, name, value):
         if value is None:
             return queryset
         if value:
-            return queryset.filter(
-                options__is_active_discount=True,
-                options__discount__gt=0
-            ).distinct()
-        return queryset.filter(
-            Q(options__is_active_discount=False) |
-            Q(options__discount=0)
-        ).distinct()
+            return queryset.filter(summary__has_active_discount=True)
+        return queryset.filter(Q(summary__has_active_discount=False) | Q(summary__isnull=True))
     
     def filter_has_warranty(self, queryset, name, value):
         if value is None:
             return queryset
-        if value:
-            return queryset.filter(options__warranty__isnull=False).distinct()
-        return queryset.filter(options__warranty__isnull=True).distinct()
+        has_warranty = related_exists(ProductOption, warranty__isnull=False)
+        return queryset.filter(has_warranty if value else ~has_warranty)
 
     def filter_categories_with_children(self, queryset, name, value):
         if not value:
@@ -281,16 +353,8 @@ class ProductFilter(FilterSet):
                 value = [int(v) for v in value]
             except Exception:
                 return queryset.none()
-        all_category_ids = set()
-        for category_id in value:
-            try:
-                category = Category.objects.get(id=category_id)
-                all_category_ids.add(category.id)
-                descendants = category.get_descendants()
-                all_category_ids.update(descendants.values_list('id', flat=True))
-            except Category.DoesNotExist:
-                continue
-        return queryset.filter(categories__id__in=all_category_ids).distinct()
+        # دسته‌بندی‌ها و زیرمجموعه‌هایشان به صورت بازه MPTT (store.category_closure)
+        return filter_products_by_categories(queryset, ids=value)
 
     def filter_categories_by_slug(self, queryset, name, value):
         """
@@ -307,20 +371,7 @@ class ProductFilter(FilterSet):
         else:
             slugs = value
         
-        # پیدا کردن دسته‌بندی‌ها بر اساس slug
-        categories = Category.objects.filter(slug__in=slugs)
-        if not categories.exists():
-            return queryset.none()
-        
-        # جمع‌آوری همه آیدی‌های دسته‌بندی و زیرمجموعه‌های آن‌ها
-        all_category_ids = set()
-        for category in categories:
-            all_category_ids.add(category.id)
-            # اضافه کردن زیرمجموعه‌ها (descendants)
-            descendants = category.get_descendants()
-            all_category_ids.update(descendants.values_list('id', flat=True))
-        
-        return queryset.filter(categories__id__in=all_category_ids).distinct()
+        return filter_products_by_categories(queryset, slugs=slugs)
 
     def filter_specification(self, queryset, name, value):
         """
@@ -342,81 +393,72 @@ class ProductFilter(FilterSet):
             return self._filter_spec_values(queryset, spec_name, values)
         elif len(parts) == 3:
             # Handle range filter
-            try:
-                min_val = float(parts[1]) if parts[1] else None
-                max_val = float(parts[2]) if parts[2] else None
-                return self._filter_spec_range(queryset, spec_name, min_val, max_val)
-            except ValueError:
+            min_val = _parse_number(normalize_persian(parts[1])) if parts[1] else None
+            max_val = _parse_number(normalize_persian(parts[2])) if parts[2] else None
+            if (parts[1] and min_val is None) or (parts[2] and max_val is None):
                 # Invalid range values
                 return queryset
+            return self._filter_spec_range(queryset, spec_name, min_val, max_val)
         # Invalid format
         return queryset
 
     def _filter_spec_values(self, queryset, name, values):
-        """Filters queryset for a specification by a list of exact values (OR logic)."""
+        """Filters queryset for a specification by a list of exact values (OR logic) using the typed columns."""
         if not values:
             return queryset
 
-        spec_q = Q(spec_values__specification__name__iexact=name)
+        spec_q = Q(specification__name__iexact=name)
         value_q = Q()
 
         for value in values:
-            value = value.strip()
-            try:
-                # Try filtering as number (int or decimal)
-                num_val = float(value)
-                value_q |= (Q(spec_values__int_value=num_val) | Q(spec_values__decimal_value=num_val))
-            except ValueError:
-                # Try filtering as boolean
-                if value.lower() in ['true', 'false']:
-                    value_q |= Q(spec_values__bool_value=(value.lower() == 'true'))
-                else:
-                    # Filter as string (case-insensitive contains)
-                    value_q |= Q(spec_values__str_value__icontains=value)
-
-        return queryset.filter(spec_q & value_q).distinct()
+            value = normalize_persian(value)
+            if not value:
+                continue
+            number = _parse_number(value)
+            if number is not None:
+                # Filter as number (int or decimal) or the same literal text
+                value_q |= Q(numeric_value=number) | Q(str_value=value)
+                continue
+            # Try filtering as boolean
+            if value in SPEC_TRUE_VALUES | SPEC_FALSE_VALUES:
+                value_q |= Q(bool_value=(value in SPEC_TRUE_VALUES))
+            # Filter as normalized string (case-insensitive contains)
+            value_q |= Q(str_value__icontains=value)
+
+        return queryset.filter(related_exists(ProductSpecification, spec_q & value_q))
 
     def _filter_spec_range(self, queryset, name, min_val, max_val):
-        """Filters queryset for a specification by a numeric range."""
-        q = Q(spec_values__specification__name__iexact=name)
+        """Filters queryset for a specification by a numeric range (index range scan on numeric_value)."""
+        q = Q(specification__name__iexact=name)
         if min_val is not None:
-            q &= Q(spec_values__int_value__gte=min_val) | Q(spec_values__decimal_value__gte=min_val)
+            q &= Q(numeric_value__gte=min_val)
         if max_val is not None:
-            q &= Q(spec_values__int_value__lte=max_val) | Q(spec_values__decimal_value__lte=max_val)
-        return queryset.filter(q).distinct()
+            q &= Q(numeric_value__lte=max_val)
+        return queryset.filter(related_exists(ProductSpecification, q))
     
     def filter_specification_by_id(self, queryset, name, value):
         """
-        فیلتر محصولات بر اساس آیدی مقدار مشخصات فنی (ProductSpecification)
-        فرمت ورودی: "128" یا "128,512,700"
+        فیلتر محصولات بر اساس آیدی مقدار یکتای مشخصات فنی (SpecificationValue)
+        فرمت ورودی: "128" یا "128,512,700" یا "spec_id:value_id,..."
         مثال: "128,512"
         همه value idها با ویرگول جدا می‌شوند و فیلتر OR است.
         """
         if not value:
             return queryset
-        value_ids = [v.strip() for v in value.split(',') if v.strip()]
-        try:
-            value_ids = [int(v) for v in value_ids]
-        except Exception:
+        condition = spec_value_ids_q(value, prefix='')
+        if condition is None:
             return queryset.none()
-        return queryset.filter(spec_values__id__in=value_ids).distinct()
+        return queryset.filter(related_exists(ProductSpecification, condition))
 
     def filter_spec_value_ids(self, queryset, field_name, value):
-        """فیلتر کردن محصولات بر اساس آیدی مقادیر مشخصات فنی"""
+        """فیلتر کردن محصولات بر اساس آیدی مقادیر یکتای مشخصات فنی"""
         if not value:
             return queryset
-        
-        # تبدیل رشته به لیست آیدی‌ها
-        if isinstance(value, str):
-            value = [v.strip() for v in value.split(',') if v.strip()]
-        
-        try:
-            value_ids = [int(v) for v in value]
-        except (ValueError, TypeError):
+        condition = spec_value_ids_q(value, prefix='')
+        if condition is None:
             return queryset.none()
-        
         # فیلتر کردن محصولاتی که دارای این مقادیر مشخصات فنی هستند
-        return queryset.filter(spec_values__id__in=value_ids).distinct()
+        return queryset.filter(related_exists(ProductSpecification, condition))
 
     class Meta:
         model = Product
@@ -447,28 +489,30 @@ class CategoryFilter(FilterSet):
     )
     spec_names = CharFilter(field_name='spec_definitions__name', lookup_expr='icontains', label='مشخصات فنی (نام)')
     
-    # فیلترهای مقادیر مشخصات فنی
+    # فیلترهای مقادیر مشخصات فنی (ستون‌های نوع‌دار ProductSpecification)
     spec_int_value = NumberFilter(
-        field_name='products__spec_values__int_value',
+        field_name='products__spec_values__numeric_value',
         lookup_expr='exact',
-        label='مقدار عددی مشخصه'
+        label='مقدار عددی مشخصه',
+        distinct=True,
     )
     
     spec_decimal_value = NumberFilter(
-        field_name='products__spec_values__decimal_value',
+        field_name='products__spec_values__numeric_value',
         lookup_expr='exact',
-        label='مقدار اعشاری مشخصه'
+        label='مقدار اعشاری مشخصه',
+        distinct=True,
     )
     
     spec_str_value = CharFilter(
-        field_name='products__spec_values__str_value',
-        lookup_expr='icontains',
+        method='filter_spec_str_value',
         label='مقدار متنی مشخصه'
     )
     
     spec_bool_value = BooleanFilter(
         field_name='products__spec_values__bool_value',
-        label='مقدار بله/خیر مشخصه'
+        label='مقدار بله/خیر مشخصه',
+        distinct=True,
     )
     
     # فیلتر ترکیبی برای مقدار مشخصه فقط با آیدی مشخصه و مقدار هم آیدی مقدار مشخصه محصول (پشتیبانی از چند کلید و چند مقدار با جداکننده _)
@@ -484,6 +528,12 @@ class CategoryFilter(FilterSet):
             Q(spec_definitions__name__icontains=value)
         ).distinct()
 
+    def filter_spec_str_value(self, queryset, name, value):
+        value = normalize_persian(value)
+        if not value:
+            return queryset
+        return queryset.filter(products__spec_values__str_value__icontains=value).distinct()
+
     def filter_has_products(self, queryset, name, value):
         if value is None:
             return queryset
@@ -500,21 +550,19 @@ class CategoryFilter(FilterSet):
 
     def filter_spec_value(self, queryset, name, value):
         """
-        فیلتر بر اساس مقدار مشخصه فنی فقط با آیدی مقدار مشخصه محصول (ProductSpecification)
+        فیلتر بر اساس آیدی مقدار یکتای مشخصه فنی (SpecificationValue)
         فرمت:
         - "151"
         - "151,152,153"
-        مثال: "151,152,153"
+        - "spec_id:value_id" مثل "12:151,12:152"
         همه value idها با ویرگول جدا می‌شوند و فیلتر OR است.
         """
         if not value:
             return queryset
-        value_ids = [v.strip() for v in value.split(',') if v.strip()]
-        try:
-            value_ids = [int(v) for v in value_ids]
-        except Exception:
+        condition = spec_value_ids_q(value, prefix='products__spec_values__')
+        if condition is None:
             return queryset.none()
-        return queryset.filter(products__spec_values__id__in=value_ids).distinct()
+        return queryset.filter(condition).distinct()
 
     class Meta:
         model = Category
@@ -524,22 +572,24 @@ class CategoryFilter(FilterSet):
             'brand': ['exact'],
         }
 
-    @property
-    def spec_value_choices(self):
+    @staticmethod
+    def get_spec_value_choices(request):
         # فرض: category_id از context یا request گرفته می‌شود
-        from .models import Category
-        from .serializers import CategorySpecificationWithValuesSerializer
-        request = getattr(self, 'request', None)
+        from .facets import get_category_facets
         category_id = None
         if request:
             category_id = request.query_params.get('id') or request.query_params.get('category')
         if not category_id:
             return []
-        try:
-            category = Category.objects.get(id=category_id)
-        except Category.DoesNotExist:
-            return []
-        serializer = CategorySpecificationWithValuesSerializer(category)
-        return serializer.data.get('specifications', [])
+        return get_category_facets(category_id)
+
+    @property
+    def spec_value_choices(self):
+        return self.get_spec_value_choices(getattr(self, 'request', None))
+
+    @classmethod
+    def get_dynamic_metadata(cls, request):
+        """بخش داینامیک بلوک filters (store.filter_schema)"""
+        return {'spec_value_choices': cls.get_spec_value_choices(request)}
 
 
@@ -0,0 +1,38 @@
+"""
+تبدیل آیدی یا slug آدرس به pk قبل از اجرای کوئری اصلی.
+
+نمایش جزئیات با آدرس ``/products/<id یا slug>/`` پشتیبانی می‌شود؛ slug با یک
+کوئری سبک (فقط ستون pk) به pk تبدیل و در کش نسخه‌دار نگهداری می‌شود تا کوئری
+سنگین (با prefetchها) فقط یک بار و با pk اجرا شود. نسخه هر مدل با ذخیره یا حذف
+اشیای آن (سیگنال‌ها) بالا می‌رود، پس تغییر slug بلافاصله دیده می‌شود. slugهای
+ناموجود هم کش می‌شوند تا آدرس‌های اشتباه هر بار به دیتابیس نرسند.
+"""
+import hashlib
+
+from django.core.cache import cache
+
+from .cache import DEFAULT_TIMEOUT, bump_version, versioned_key
+
+SLUG_NAMESPACE = 'slugs'
+# نشانه slug ناموجود در کش (None یعنی کلید در کش نیست)
+_MISSING = 0
+
+
+def slug_namespace(model):
+    return f'{SLUG_NAMESPACE}:{model._meta.label_lower}'
+
+
+def resolve_slug(model, slug):
+    """pk شیء با این slug یا None"""
+    # slugها فارسی هستند؛ کلید کش باید برای همه backendها معتبر باشد
+    digest = hashlib.md5(slug.encode()).hexdigest()
+    key = versioned_key(slug_namespace(model), digest)
+    pk = cache.get(key)
+    if pk is None:
+        pk = model._default_manager.filter(slug=slug).values_list('pk', flat=True).first() or _MISSING
+        cache.set(key, pk, DEFAULT_TIMEOUT)
+    return pk or None
+
+
+def invalidate_slugs(model):
+    bump_version(slug_namespace(model))
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from store.derivatives import VARIANTS_FIELD, generate_derivatives, image_fields, is_current
+from store.uploads import get_workers
+
+MODELS = ('store.product', 'store.gallery', 'store.category', 'store.brand')
+
+
+def _generate(job):
+    # هر thread اتصال دیتابیس خودش را دارد
+    close_old_connections()
+    try:
+        return generate_derivatives(*job)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnail and WebP derivatives for existing images in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', choices=MODELS, help='Only these models (repeatable)')
+        parser.add_argument('--workers', type=int, default=None, help='Parallel workers (default STORE_UPLOAD_WORKERS)')
+        parser.add_argument('--force', action='store_true', help='Regenerate derivatives that already exist')
+
+    def handle(self, *args, **options):
+        jobs = []
+        for label in options['model'] or MODELS:
+            model = apps.get_model(label)
+            for field_name in image_fields(model):
+                queryset = (
+                    model._default_manager.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+                    .only('pk', field_name, VARIANTS_FIELD).order_by('pk')
+                )
+                jobs.extend(
+                    (label, instance.pk, field_name) for instance in queryset.iterator()
+                    if options['force'] or not is_current(instance, field_name)
+                )
+
+        workers = options['workers'] or get_workers()
+        if workers == 1:
+            results = [generate_derivatives(*job) for job in jobs]
+        else:
+            # Pillow هنگام resize و encode قفل GIL را آزاد می‌کند
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_generate, jobs))
+        done = sum(result is not None for result in results)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated derivatives for {done} of {len(jobs)} images ({len(jobs) - done} skipped or failed)'
+        ))
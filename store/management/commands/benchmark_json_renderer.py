@@ -0,0 +1,92 @@
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from store.models import Product
+from store.renderers import FastJSONRenderer, orjson
+from store.serializers import ProductListItemSerializer
+from store.views import ProductViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compare the default JSONRenderer with FastJSONRenderer on a large product list page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=500, help='Number of products on the page')
+        parser.add_argument('--repeat', type=int, default=20, help='Number of renders per renderer')
+        parser.add_argument(
+            '--expand',
+            default='options,spec_groups,tags,description',
+            help='Comma separated ?expand= fields of the product list',
+        )
+        parser.add_argument('--chunk-size', type=int, default=None, help='Items per streamed chunk')
+
+    def handle(self, *args, **options):
+        size, repeat = options['size'], options['repeat']
+        data = self._build_page(size, options['expand'])
+        default_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+
+        expected = default_renderer.render(data)
+        if json.loads(fast_renderer.render(data)) != json.loads(expected):
+            raise CommandError('FastJSONRenderer output differs from JSONRenderer')
+
+        self.stdout.write(
+            f'{len(data["results"])} products, {len(expected) / 1024:.0f} KiB, '
+            f'orjson {"available" if orjson is not None else "not installed (fallback)"}'
+        )
+        rows = [
+            ('JSONRenderer', lambda: default_renderer.render(data)),
+            ('FastJSONRenderer', lambda: fast_renderer.render(data)),
+            ('FastJSONRenderer streamed', lambda: self._consume(fast_renderer.iter_render(data, options['chunk_size']))),
+        ]
+        baseline = None
+        for label, render in rows:
+            elapsed = self._time(render, repeat)
+            peak = self._peak_memory(render)
+            baseline = baseline or elapsed
+            self.stdout.write(
+                f'{label:<28}{elapsed * 1000:9.2f} ms/render  x{baseline / elapsed:5.1f}  '
+                f'peak {peak / 1024:8.0f} KiB'
+            )
+
+    def _build_page(self, size, expand):
+        fields = ProductListItemSerializer.resolve_fields({'expand': expand})
+        lookups = []
+        for name in fields:
+            lookups += ProductViewSet.field_prefetches.get(name, [])
+        products = list(
+            ProductViewSet.queryset.prefetch_related(*dict.fromkeys(lookups)).order_by('-id')[:size]
+        )
+        if not products:
+            raise CommandError('No products found; run generate_fakedata first')
+        results = list(ProductListItemSerializer(products, many=True, fields=fields).data)
+        if len(results) < size:
+            self.stdout.write(f'Only {len(results)} products in the database; repeating them to {size}')
+            results = (results * (size // len(results) + 1))[:size]
+        return {'count': Product.objects.count(), 'next': None, 'previous': None, 'results': results, 'status': 'success'}
+
+    @staticmethod
+    def _consume(chunks):
+        total = 0
+        for chunk in chunks:
+            total += len(chunk)
+        return total
+
+    @staticmethod
+    def _time(render, repeat):
+        render()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            render()
+        return (time.perf_counter() - started) / repeat
+
+    @staticmethod
+    def _peak_memory(render):
+        tracemalloc.start()
+        try:
+            render()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
@@ -0,0 +1,125 @@
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from rest_framework import serializers
+from store import media_urls
+from store.derivatives import build_srcset, derivative_name
+from store.models import Gallery, Product, ProductOption
+from store.serializers import MediaImageField
+
+WIDTHS = (160, 320, 640)
+
+
+def storage_srcset(instance, field_name):
+    """build_srcset قبلی: storage.url برای هر نسخه"""
+    variants = instance.image_variants[field_name]
+    url = getattr(instance, field_name).storage.url
+    return {
+        kind: {f'{width}w': url(variants[kind][width]) for width in sorted(variants[kind], key=int)}
+        for kind in ('webp', 'fallback')
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-item cost of image URLs on a product page (product image, srcset and option galleries): '
+        'storage.url() for every file vs the memoized store.media_urls builder'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000, help='Products on the page')
+        parser.add_argument('--options', type=int, default=2, help='Options per product')
+        parser.add_argument('--gallery', type=int, default=3, help='Gallery images per option')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per variant')
+
+    def handle(self, *args, **options):
+        from storages.backends.s3 import S3Storage
+
+        storages = [
+            ('default storage', default_storage),
+            ('S3 + custom domain', S3Storage(
+                bucket_name='benchmark', custom_domain=settings.AWS_S3_CUSTOM_DOMAIN or 'cdn.example.com',
+                querystring_auth=False,
+            )),
+        ]
+        for label, storage in storages:
+            page = self._build_page(storage, options)
+            urls = len(self._render(page, self._storage_urls))
+            before = self._best(page, self._storage_urls, options['repeat'])
+            media_urls.reset()
+            started = time.perf_counter()
+            self._render(page, self._media_urls)
+            cold = time.perf_counter() - started
+            after = self._best(page, self._media_urls, options['repeat'])
+            per_item = 1e6 / options['products']
+            self.stdout.write(self.style.SUCCESS(
+                f'{label}: {options["products"]} products, {urls} URLs per page | '
+                f'storage.url {before * per_item:.1f} us/product, '
+                f'media_urls cold {cold * per_item:.1f} us/product, warm {after * per_item:.1f} us/product '
+                f'({before / after:.1f}x)'
+            ))
+
+    @staticmethod
+    def _variants(name):
+        webp = {str(width): derivative_name(name, width, 'webp') for width in WIDTHS}
+        fallback = {str(width): derivative_name(name, width, 'jpg') for width in WIDTHS}
+        webp['1200'], fallback['1200'] = derivative_name(name, 1200, 'webp'), name
+        return {'image': {'source': name, 'width': 1200, 'webp': webp, 'fallback': fallback}}
+
+    def _build_page(self, storage, options):
+        page = []
+        for i in range(options['products']):
+            name = f'products/product-{i}.jpg'
+            product = Product(pk=i + 1, title=f'product {i}', image=name, image_variants=self._variants(name))
+            product.image.storage = storage
+            product.page_options = []
+            for j in range(options['options']):
+                option = ProductOption(pk=i * options['options'] + j + 1, product=product)
+                option.page_gallery = []
+                for k in range(options['gallery']):
+                    image = f'product_gallery/{i}-{j}-{k}.jpg'
+                    gallery = Gallery(pk=len(option.page_gallery) + 1, image=image, image_variants=self._variants(image))
+                    gallery.image.storage = storage
+                    option.page_gallery.append(gallery)
+                product.page_options.append(option)
+            page.append(product)
+        return page
+
+    @staticmethod
+    def _storage_urls(product, image_field):
+        return [image_field.to_representation(product.image), storage_srcset(product, 'image')] + [
+            {'image': image.image.url, 'image_srcset': storage_srcset(image, 'image')}
+            for option in product.page_options for image in option.page_gallery
+        ]
+
+    @staticmethod
+    def _media_urls(product, image_field):
+        return [image_field.to_representation(product.image), build_srcset(product, 'image')] + [
+            {'image': media_urls.media_url(image.image), 'image_srcset': build_srcset(image, 'image')}
+            for option in product.page_options for image in option.page_gallery
+        ]
+
+    @staticmethod
+    def _render(page, build):
+        image_field = serializers.ImageField() if build is Command._storage_urls else MediaImageField()
+        urls = []
+        for product in page:
+            for item in build(product, image_field):
+                if isinstance(item, dict) and 'image' in item:
+                    urls.append(item['image'])
+                    item = item['image_srcset']
+                if isinstance(item, dict):
+                    urls.extend(url for kind in item.values() for url in kind.values())
+                else:
+                    urls.append(item)
+        return urls
+
+    def _best(self, page, build, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            self._render(page, build)
+            timings.append(time.perf_counter() - started)
+        return min(timings)
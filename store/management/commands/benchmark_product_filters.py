@@ -0,0 +1,119 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import QueryDict
+from store.filters import ProductFilter
+from store.models import (
+    Color, Product, ProductOption, ProductSpecification, Specification, SpecificationValue, Tag, Warranty,
+)
+
+PAGE_SIZE = 24
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare join + DISTINCT product filtering with the EXISTS-based ProductFilter '
+        'on a synthetic catalog (rolled back afterwards unless --keep)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20000, help='Number of synthetic products')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed of the synthetic catalog')
+        parser.add_argument('--no-explain', action='store_true', help='Do not print query plans')
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic catalog in the database')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            started = time.perf_counter()
+            params = self._build_catalog(options['products'], random.Random(options['seed']))
+            self.stdout.write(
+                f'Synthetic catalog of {options["products"]} products built in {time.perf_counter() - started:.1f}s'
+            )
+            self.stdout.write(f'Filters: {params.urlencode()}')
+            queries = [
+                ('join + DISTINCT', self._legacy_queryset(params)),
+                ('EXISTS (ProductFilter)', ProductFilter(params, queryset=Product.objects.all()).qs),
+            ]
+            for label, queryset in queries:
+                self._report(label, queryset, options)
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def _build_catalog(self, count, rng):
+        colors = [Color.objects.create(name=f'bench-color-{i}', hex_code='#000000') for i in range(8)]
+        warranties = [Warranty.objects.create(name=f'bench-warranty-{i}', duration=12) for i in range(4)]
+        tags = Tag.objects.bulk_create([Tag(name=f'bench-tag-{i}', slug=f'bench-tag-{i}') for i in range(30)])
+        specs, values = [], []
+        for i in range(5):
+            spec = Specification.objects.create(name=f'bench-spec-{i}', data_type='str')
+            specs.append(spec)
+            values.append(SpecificationValue.objects.bulk_create([
+                SpecificationValue(specification=spec, key=f'v{j}', value=f'v{j}') for j in range(10)
+            ]))
+
+        products = Product.objects.bulk_create(
+            [Product(title=f'bench product {i}', slug=f'bench-product-{i}') for i in range(count)],
+            batch_size=2000,
+        )
+        options, spec_values, product_tags = [], [], []
+        for product in products:
+            for _ in range(3):
+                options.append(ProductOption(
+                    product=product, color=rng.choice(colors), option_price=rng.randint(1, 1000) * 1000,
+                    warranty=rng.choice(warranties + [None]),
+                ))
+            for spec, choices in zip(specs, values):
+                value = rng.choice(choices)
+                spec_values.append(ProductSpecification(
+                    product=product, specification=spec, specification_value=value.value,
+                    str_value=value.key, canonical_value=value,
+                ))
+            for tag in rng.sample(tags, 3):
+                product_tags.append(Product.tags.through(product_id=product.pk, tag_id=tag.pk))
+        ProductOption.objects.bulk_create(options, batch_size=5000)
+        ProductSpecification.objects.bulk_create(spec_values, batch_size=5000)
+        Product.tags.through.objects.bulk_create(product_tags, batch_size=5000)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for model in (Product, ProductOption, ProductSpecification, Product.tags.through):
+                    cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+        params = QueryDict(mutable=True)
+        params['colors'] = f'{colors[0].pk},{colors[1].pk}'
+        params['warranties'] = f'{warranties[0].pk},{warranties[1].pk}'
+        params['tags'] = ','.join(str(tag.pk) for tag in tags[:6])
+        params['spec_value_ids'] = ','.join(str(value.pk) for value in values[0][:4])
+        params['has_warranty'] = 'true'
+        return params
+
+    @staticmethod
+    def _legacy_queryset(params):
+        """فیلترهای قبلی: هر فیلتر یک join روی رابطه چندتایی و در پایان distinct"""
+        ids = {name: [int(pk) for pk in params[name].split(',')] for name in ('colors', 'warranties', 'tags', 'spec_value_ids')}
+        return (
+            Product.objects.filter(options__color__in=ids['colors'])
+            .filter(options__warranty__in=ids['warranties'])
+            .filter(tags__in=ids['tags'])
+            .filter(spec_values__canonical_value_id__in=ids['spec_value_ids'])
+            .filter(options__warranty__isnull=False)
+            .distinct()
+        )
+
+    def _report(self, label, queryset, options):
+        page = queryset.order_by('-id')[:PAGE_SIZE]
+        count = queryset.count()
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            list(page.values_list('id', flat=True))
+            queryset.count()
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}: {count} products, page + count {min(timings) * 1000:.1f} ms (best of {options["repeat"]})'
+        ))
+        if not options['no_explain']:
+            analyze = {'analyze': True} if connection.vendor == 'postgresql' else {}
+            self.stdout.write(page.explain(**analyze))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from store.models import Product
+from store.search import refresh_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search documents of all products'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of products indexed per batch',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+        total = 0
+        for start in range(0, len(product_ids), batch_size):
+            total += refresh_search_documents(product_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} products'))
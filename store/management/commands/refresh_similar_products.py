@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from store.models import Product
+from store.similar_products import refresh_similar_products
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed similar-products table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of products processed per batch',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+        total = 0
+        for start in range(0, len(product_ids), batch_size):
+            total += refresh_similar_products(product_ids[start:start + batch_size])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt similar products for {len(product_ids)} products ({total} entries)'
+            )
+        )
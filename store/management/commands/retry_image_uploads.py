@@ -0,0 +1,34 @@
+from concurrent.futures import wait
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from store.models import ImageUpload
+from store.uploads import submit
+
+
+class Command(BaseCommand):
+    help = 'Queue failed and stale image uploads again and wait for them to finish'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-minutes',
+            type=int,
+            default=10,
+            help='Pending/uploading rows older than this are considered lost (e.g. after a restart)',
+        )
+
+    def handle(self, *args, **options):
+        stale_before = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        uploads = ImageUpload.objects.filter(
+            Q(status=ImageUpload.STATUS_FAILED) |
+            Q(status__in=[ImageUpload.STATUS_PENDING, ImageUpload.STATUS_UPLOADING], updated_at__lt=stale_before)
+        )
+        upload_ids = list(uploads.values_list('id', flat=True))
+        ImageUpload.objects.filter(id__in=upload_ids).update(status=ImageUpload.STATUS_PENDING, attempts=0)
+        futures = [submit(upload_id) for upload_id in upload_ids]
+        wait([future for future in futures if hasattr(future, 'result')])
+        statuses = ImageUpload.objects.filter(id__in=upload_ids).values_list('status', flat=True)
+        done = sum(status == ImageUpload.STATUS_DONE for status in statuses)
+        self.stdout.write(self.style.SUCCESS(f'Retried {len(upload_ids)} uploads: {done} done, {len(upload_ids) - done} failed'))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from store.models import Product, ProductOption
+from store.changes import schedule_bump_changes
+from store.product_summary import refresh_product_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        'Sync stored effective prices with discount windows that started or ended, '
+        'and refresh the affected product summaries'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many options and products would change without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        stale_options = ProductOption.objects.stale_effective_price(now)
+        option_ids = set(stale_options.values_list('id', flat=True))
+
+        refreshed_at = F('summary__refreshed_at')
+        crossed = (
+            Q(options__discount_start_date__gt=refreshed_at, options__discount_start_date__lte=now) |
+            Q(options__discount_end_date__gt=refreshed_at, options__discount_end_date__lte=now)
+        )
+        product_ids = set(
+            Product.objects.filter(
+                crossed | Q(summary__isnull=True) | Q(options__id__in=option_ids)
+            ).values_list('id', flat=True)
+        )
+
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'{len(option_ids)} option prices and {len(product_ids)} products would be refreshed'
+                )
+            )
+            return
+
+        with transaction.atomic():
+            ProductOption.objects.filter(id__in=option_ids).sync_effective_price(now)
+            refreshed = refresh_product_summaries(product_ids, now=now)
+            # قیمت نهایی در پاسخ‌ها عوض شده است؛ ETagهای قبلی نامعتبر می‌شوند
+            schedule_bump_changes(ProductOption, option_ids)
+            schedule_bump_changes(Product, product_ids)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Updated {len(option_ids)} option prices and refreshed {refreshed} product summaries'
+            )
+        )
@@ -0,0 +1,93 @@
+"""
+ساخت آدرس فایل‌های media بدون فراخوانی backend ذخیره‌سازی.
+
+وقتی آدرس فایل فقط به نام آن بستگی دارد (S3 با ``AWS_S3_CUSTOM_DOMAIN`` یا
+FileSystemStorage با ``MEDIA_URL``) آدرس پایه storage یک بار ساخته و آدرس هر نام
+فایل در حافظه پروسه نگهداری می‌شود؛ ``storage.url()`` (نرمال‌سازی نام، ساخت کلاینت
+S3 و ...) برای هر تصویر هر پاسخ اجرا نمی‌شود. برای S3 بدون دامنه سفارشی (آدرس
+امضا شده و دارای انقضا) همان ``storage.url()`` بدون کش استفاده می‌شود.
+
+تنظیمات:
+- ``STORE_MEDIA_URL_CACHE_SIZE``: حداکثر تعداد آدرس‌های نگهداری شده برای هر storage
+  (پیش‌فرض ۲۰۰۰۰۰؛ یک صفحه ۱۰۰۰ محصولی با srcset حدود ۶۰۰۰۰ آدرس دارد)
+"""
+import threading
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.encoding import filepath_to_uri
+
+DEFAULT_CACHE_SIZE = 200000
+# تغییر این تنظیمات (مثلاً در تست‌ها) آدرس‌های ساخته شده را بی‌اعتبار می‌کند
+URL_SETTINGS = {'MEDIA_URL', 'STORAGES', 'AWS_S3_CUSTOM_DOMAIN', 'AWS_LOCATION', 'AWS_S3_URL_PROTOCOL'}
+
+_lock = threading.Lock()
+# id(storage) -> (storage, base_url, {name: url}, max_size)؛ نگه داشتن خود storage
+# مانع استفاده دوباره id آن می‌شود
+_state = {'storages': {}}
+
+
+def get_cache_size():
+    return getattr(settings, 'STORE_MEDIA_URL_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+
+
+def reset():
+    with _lock:
+        _state['storages'] = {}
+
+
+@receiver(setting_changed)
+def media_settings_changed(setting, **kwargs):
+    if setting in URL_SETTINGS:
+        reset()
+
+
+def build_base_url(storage):
+    """آدرس پایه storage یا None اگر آدرس فایل‌ها فقط تابع نامشان نباشد"""
+    custom_domain = getattr(storage, 'custom_domain', None)
+    if custom_domain:
+        location = filepath_to_uri(getattr(storage, 'location', '') or '').strip('/')
+        base = f'{getattr(storage, "url_protocol", "https:")}//{custom_domain}/'
+        return f'{base}{location}/' if location else base
+    if hasattr(storage, 'bucket_name'):
+        return None
+    base_url = getattr(storage, 'base_url', None)
+    if base_url is not None and not base_url.endswith('/'):
+        base_url += '/'
+    return base_url
+
+
+def _storage_entry(storage):
+    entry = _state['storages'].get(id(storage))
+    if entry is None:
+        with _lock:
+            entry = _state['storages'].get(id(storage))
+            if entry is None:
+                entry = _state['storages'][id(storage)] = (storage, build_base_url(storage), {}, get_cache_size())
+    return entry
+
+
+def build_url(name, storage=None):
+    """آدرس فایل ``name`` در storage (پیش‌فرض default_storage)؛ None برای نام خالی"""
+    if not name:
+        return None
+    storage = default_storage if storage is None else storage
+    _, base, urls, max_size = _storage_entry(storage)
+    url = urls.get(name)
+    if url is None:
+        if base is None:
+            return storage.url(name)
+        url = base + filepath_to_uri(name).lstrip('/')
+        if len(urls) >= max_size:
+            urls.clear()
+        urls[name] = url
+    return url
+
+
+def media_url(field_file):
+    """آدرس FieldFile (مثل ``field_file.url``) یا None اگر فایلی نداشته باشد"""
+    if not field_file:
+        return None
+    return build_url(field_file.name, field_file.storage)
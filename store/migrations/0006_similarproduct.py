@@ -0,0 +1,70 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0005_alter_article_content_alter_brand_description_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimilarProduct",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField(default=0, verbose_name="امتیاز شباهت")),
+                (
+                    "rank",
+                    models.PositiveSmallIntegerField(default=0, verbose_name="رتبه"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="تاریخ بروزرسانی"),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similar_entries",
+                        to="store.product",
+                        verbose_name="محصول",
+                    ),
+                ),
+                (
+                    "similar",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="store.product",
+                        verbose_name="محصول مشابه",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "محصول مشابه",
+                "verbose_name_plural": "محصولات مشابه",
+                "ordering": ["product", "rank"],
+                "indexes": [
+                    models.Index(
+                        fields=["product", "rank"],
+                        name="store_simil_product_5471de_idx",
+                    ),
+                    models.Index(
+                        fields=["similar"], name="store_simil_similar_cc5f5f_idx"
+                    ),
+                ],
+                "unique_together": {("product", "similar")},
+            },
+        ),
+    ]
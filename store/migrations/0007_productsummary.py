@@ -0,0 +1,117 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_summaries(apps, schema_editor):
+    Product = apps.get_model("store", "Product")
+    ProductOption = apps.get_model("store", "ProductOption")
+    ProductSummary = apps.get_model("store", "ProductSummary")
+    now = django.utils.timezone.now()
+
+    def final_price(option):
+        active = option.is_active_discount and option.discount
+        if active and option.discount_start_date and option.discount_end_date:
+            active = option.discount_start_date <= now <= option.discount_end_date
+        if not active:
+            return option.option_price, False
+        return option.option_price - int(option.option_price * (option.discount / 100)), True
+
+    summaries = {
+        product_id: ProductSummary(product_id=product_id, refreshed_at=now)
+        for product_id in Product.objects.values_list("id", flat=True)
+    }
+    for option in ProductOption.objects.filter(is_active=True).order_by("id"):
+        summary = summaries[option.product_id]
+        price, discounted = final_price(option)
+        summary.total_quantity += option.quantity
+        summary.has_active_discount = summary.has_active_discount or discounted
+        if summary.max_final_price is None or price > summary.max_final_price:
+            summary.max_final_price = price
+        if summary.min_final_price is None or price < summary.min_final_price:
+            summary.min_final_price = price
+            summary.cheapest_option_id = option.id
+    ProductSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0006_similarproduct"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSummary",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="store.product",
+                        verbose_name="محصول",
+                    ),
+                ),
+                (
+                    "min_final_price",
+                    models.PositiveIntegerField(
+                        blank=True, null=True, verbose_name="کمترین قیمت نهایی"
+                    ),
+                ),
+                (
+                    "max_final_price",
+                    models.PositiveIntegerField(
+                        blank=True, null=True, verbose_name="بیشترین قیمت نهایی"
+                    ),
+                ),
+                (
+                    "total_quantity",
+                    models.PositiveIntegerField(default=0, verbose_name="موجودی کل"),
+                ),
+                (
+                    "has_active_discount",
+                    models.BooleanField(default=False, verbose_name="تخفیف فعال دارد"),
+                ),
+                (
+                    "refreshed_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="زمان بروزرسانی"
+                    ),
+                ),
+                (
+                    "cheapest_option",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="store.productoption",
+                        verbose_name="ارزان\u200cترین ویژگی",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "خلاصه محصول",
+                "verbose_name_plural": "خلاصه محصولات",
+                "indexes": [
+                    models.Index(
+                        fields=["min_final_price"],
+                        name="store_produ_min_fin_e5423e_idx",
+                    ),
+                    models.Index(
+                        fields=["total_quantity"], name="store_produ_total_q_764706_idx"
+                    ),
+                    models.Index(
+                        fields=["has_active_discount"],
+                        name="store_produ_has_act_23be74_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
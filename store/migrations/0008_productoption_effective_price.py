@@ -0,0 +1,44 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:39
+
+from django.db import migrations, models
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+
+def backfill_effective_price(apps, schema_editor):
+    ProductOption = apps.get_model("store", "ProductOption")
+    now = timezone.now()
+    active = Q(is_active_discount=True, discount__gt=0) & (
+        Q(discount_start_date__isnull=True)
+        | Q(discount_end_date__isnull=True)
+        | Q(discount_start_date__lte=now, discount_end_date__gte=now)
+    )
+    ProductOption.objects.update(
+        effective_price=Case(
+            When(active, then=F("option_price") - F("option_price") * F("discount") / 100),
+            default=F("option_price"),
+            output_field=models.PositiveIntegerField(),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0007_productsummary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productoption",
+            name="effective_price",
+            field=models.PositiveIntegerField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                null=True,
+                verbose_name="قیمت نهایی",
+            ),
+        ),
+        migrations.RunPython(backfill_effective_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,186 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:43
+
+import re
+from html import unescape
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+# نسخه ثابت نرمال‌سازی store.text در زمان این migration (کد برنامه ممکن است تغییر کند)
+ZWNJ = "\u200c"
+
+_CHAR_MAP = {
+    "ي": "ی",
+    "ى": "ی",
+    "ئ": "ی",
+    "ك": "ک",
+    "ة": "ه",
+    "ۀ": "ه",
+    "أ": "ا",
+    "إ": "ا",
+    "ٱ": "ا",
+    "آ": "ا",
+    "ؤ": "و",
+    "\u0640": "",
+    "\u200e": "",
+    "\u200f": "",
+    "\ufeff": "",
+    "\xa0": " ",
+}
+_CHAR_MAP.update({chr(0x06F0 + i): str(i) for i in range(10)})
+_CHAR_MAP.update({chr(0x0660 + i): str(i) for i in range(10)})
+_TRANSLATION = str.maketrans(_CHAR_MAP)
+
+_DIACRITICS = re.compile("[\u064b-\u065f\u0670]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_persian(text, zwnj=" "):
+    if not text:
+        return ""
+    text = _DIACRITICS.sub("", str(text).translate(_TRANSLATION))
+    text = text.replace(ZWNJ, zwnj).lower()
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def strip_html(text):
+    if not text:
+        return ""
+    return unescape(strip_tags(str(text)))
+
+
+def search_variants(text):
+    normalized = normalize_persian(text)
+    if ZWNJ not in str(text or ""):
+        return normalized
+    joined = {
+        word for word in normalize_persian(text, zwnj=ZWNJ).split() if ZWNJ in word
+    }
+    return " ".join([normalized] + sorted(word.replace(ZWNJ, "") for word in joined))
+
+
+TRIGRAM_SQL = """
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'pg_trgm is not available, trigram search indexes are skipped';
+END $$;
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS store_search_title_trgm
+            ON store_productsearchdocument USING gin (title_text gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS store_search_keywords_trgm
+            ON store_productsearchdocument USING gin (keywords_text gin_trgm_ops);
+    END IF;
+END $$;
+"""
+
+REVERSE_TRIGRAM_SQL = """
+DROP INDEX IF EXISTS store_search_title_trgm;
+DROP INDEX IF EXISTS store_search_keywords_trgm;
+"""
+
+
+def backfill_search_documents(apps, schema_editor):
+    Product = apps.get_model("store", "Product")
+    ProductSearchDocument = apps.get_model("store", "ProductSearchDocument")
+    products = Product.objects.select_related("brand").prefetch_related(
+        "categories", "tags", "spec_values__specification"
+    )
+    documents = []
+    for product in products.iterator(chunk_size=500):
+        keywords = [product.brand.name if product.brand else ""]
+        keywords += [category.name for category in product.categories.all()]
+        keywords += [tag.name for tag in product.tags.all()]
+        for spec_value in product.spec_values.all():
+            keywords += [
+                spec_value.specification.name,
+                spec_value.specification_value or "",
+            ]
+        documents.append(
+            ProductSearchDocument(
+                product_id=product.pk,
+                title_text=search_variants(
+                    " ".join(filter(None, [product.title, product.title_farsi]))
+                ),
+                keywords_text=search_variants(" ".join(filter(None, keywords))),
+                body_text=normalize_persian(strip_html(product.description)),
+            )
+        )
+    ProductSearchDocument.objects.bulk_create(documents, batch_size=1000)
+    ProductSearchDocument.objects.update(
+        search_vector=SearchVector("title_text", weight="A", config="simple")
+        + SearchVector("keywords_text", weight="B", config="simple")
+        + SearchVector("body_text", weight="D", config="simple")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0008_productoption_effective_price"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSearchDocument",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="store.product",
+                        verbose_name="محصول",
+                    ),
+                ),
+                (
+                    "title_text",
+                    models.TextField(
+                        blank=True, default="", verbose_name="عنوان نرمال شده"
+                    ),
+                ),
+                (
+                    "keywords_text",
+                    models.TextField(
+                        blank=True, default="", verbose_name="کلمات کلیدی نرمال شده"
+                    ),
+                ),
+                (
+                    "body_text",
+                    models.TextField(
+                        blank=True, default="", verbose_name="توضیحات نرمال شده"
+                    ),
+                ),
+                (
+                    "search_vector",
+                    django.contrib.postgres.search.SearchVectorField(
+                        editable=False, null=True
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="تاریخ بروزرسانی"),
+                ),
+            ],
+            options={
+                "verbose_name": "سند جستجوی محصول",
+                "verbose_name_plural": "اسناد جستجوی محصولات",
+                "indexes": [
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=["search_vector"], name="store_search_vector_gin"
+                    )
+                ],
+            },
+        ),
+        migrations.RunSQL(TRIGRAM_SQL, REVERSE_TRIGRAM_SQL),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,149 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:51
+
+import re
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# نسخه ثابت store.text.normalize_persian و store.models.parse_spec_value در زمان
+# این migration (کد برنامه ممکن است تغییر کند)
+_CHAR_MAP = {
+    "ي": "ی",
+    "ى": "ی",
+    "ئ": "ی",
+    "ك": "ک",
+    "ة": "ه",
+    "ۀ": "ه",
+    "أ": "ا",
+    "إ": "ا",
+    "ٱ": "ا",
+    "آ": "ا",
+    "ؤ": "و",
+    "\u0640": "",
+    "\u200e": "",
+    "\u200f": "",
+    "\ufeff": "",
+    "\xa0": " ",
+}
+_CHAR_MAP.update({chr(0x06F0 + i): str(i) for i in range(10)})
+_CHAR_MAP.update({chr(0x0660 + i): str(i) for i in range(10)})
+_TRANSLATION = str.maketrans(_CHAR_MAP)
+
+_DIACRITICS = re.compile("[\u064b-\u065f\u0670]")
+_WHITESPACE = re.compile(r"\s+")
+_SPEC_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+SPEC_TRUE_VALUES = {"true", "1", "yes", "بله", "دارد", "هست", "✓"}
+SPEC_FALSE_VALUES = {"false", "0", "no", "خیر", "ندارد", "نیست", "✗"}
+SPEC_NUMERIC_LIMIT = Decimal(10) ** 16
+
+
+def normalize_persian(text):
+    if not text:
+        return ""
+    text = _DIACRITICS.sub("", str(text).translate(_TRANSLATION))
+    text = text.replace("\u200c", " ").lower()
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def parse_spec_value(data_type, raw):
+    text = normalize_persian(raw)
+    if not text:
+        return None, None, None
+    numeric_value = bool_value = None
+    if data_type in ("int", "decimal"):
+        match = _SPEC_NUMBER.search(re.sub(r"(?<=\d)[,\u066c](?=\d{3})", "", text))
+        if match:
+            numeric_value = Decimal(match.group())
+            if data_type == "int":
+                numeric_value = numeric_value.to_integral_value()
+            if abs(numeric_value) >= SPEC_NUMERIC_LIMIT:
+                numeric_value = None
+    elif data_type == "bool":
+        if text in SPEC_TRUE_VALUES:
+            bool_value = True
+        elif text in SPEC_FALSE_VALUES:
+            bool_value = False
+    return numeric_value, bool_value, text[:255]
+
+
+def backfill_typed_values(apps, schema_editor):
+    ProductSpecification = apps.get_model("store", "ProductSpecification")
+    batch = []
+    for item in ProductSpecification.objects.select_related("specification").iterator(
+        chunk_size=2000
+    ):
+        item.numeric_value, item.bool_value, item.str_value = parse_spec_value(
+            item.specification.data_type, item.specification_value
+        )
+        batch.append(item)
+        if len(batch) >= 2000:
+            ProductSpecification.objects.bulk_update(
+                batch, ["numeric_value", "bool_value", "str_value"]
+            )
+            batch = []
+    if batch:
+        ProductSpecification.objects.bulk_update(
+            batch, ["numeric_value", "bool_value", "str_value"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0009_productsearchdocument"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productspecification",
+            name="bool_value",
+            field=models.BooleanField(
+                blank=True, editable=False, null=True, verbose_name="مقدار بله/خیر"
+            ),
+        ),
+        migrations.AddField(
+            model_name="productspecification",
+            name="numeric_value",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=4,
+                editable=False,
+                max_digits=20,
+                null=True,
+                verbose_name="مقدار عددی",
+            ),
+        ),
+        migrations.AddField(
+            model_name="productspecification",
+            name="str_value",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=255,
+                null=True,
+                verbose_name="مقدار متنی نرمال شده",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productspecification",
+            index=models.Index(
+                fields=["specification", "numeric_value"],
+                name="store_produ_specifi_b4dfaa_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productspecification",
+            index=models.Index(
+                fields=["specification", "bool_value"],
+                name="store_produ_specifi_738a25_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productspecification",
+            index=models.Index(
+                fields=["specification", "str_value"],
+                name="store_produ_specifi_a75d74_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_typed_values, migrations.RunPython.noop),
+    ]
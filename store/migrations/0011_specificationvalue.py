@@ -0,0 +1,123 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:53
+
+import re
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def canonical_spec_key(numeric_value, bool_value, str_value):
+    # نسخه ثابت store.models.canonical_spec_key در زمان این migration
+    if numeric_value is not None:
+        return format(Decimal(numeric_value).normalize(), "f")
+    if bool_value is not None:
+        return "true" if bool_value else "false"
+    if str_value:
+        return re.sub(r"(?<=\d) (?=[^\d\s])", "", str_value)
+    return None
+
+
+def backfill_canonical_values(apps, schema_editor):
+    SpecificationValue = apps.get_model("store", "SpecificationValue")
+    ProductSpecification = apps.get_model("store", "ProductSpecification")
+    ids = {}
+    batch = []
+    for item in ProductSpecification.objects.order_by("id").iterator(chunk_size=2000):
+        key = canonical_spec_key(item.numeric_value, item.bool_value, item.str_value)
+        if key is None:
+            continue
+        pair = (item.specification_id, key)
+        if pair not in ids:
+            ids[pair] = SpecificationValue.objects.create(
+                specification_id=item.specification_id,
+                key=key,
+                value=(item.specification_value or key).strip()[:255],
+                numeric_value=item.numeric_value,
+                bool_value=item.bool_value,
+            ).id
+        item.canonical_value_id = ids[pair]
+        batch.append(item)
+        if len(batch) >= 2000:
+            ProductSpecification.objects.bulk_update(batch, ["canonical_value"])
+            batch = []
+    if batch:
+        ProductSpecification.objects.bulk_update(batch, ["canonical_value"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0010_productspecification_typed_values"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SpecificationValue",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "key",
+                    models.CharField(max_length=255, verbose_name="کلید نرمال شده"),
+                ),
+                ("value", models.CharField(max_length=255, verbose_name="مقدار")),
+                (
+                    "numeric_value",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=4,
+                        max_digits=20,
+                        null=True,
+                        verbose_name="مقدار عددی",
+                    ),
+                ),
+                (
+                    "bool_value",
+                    models.BooleanField(
+                        blank=True, null=True, verbose_name="مقدار بله/خیر"
+                    ),
+                ),
+                (
+                    "specification",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="value_choices",
+                        to="store.specification",
+                        verbose_name="مشخصه",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "مقدار یکتای مشخصه",
+                "verbose_name_plural": "مقادیر یکتای مشخصات",
+            },
+        ),
+        migrations.AddField(
+            model_name="productspecification",
+            name="canonical_value",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="product_values",
+                to="store.specificationvalue",
+                verbose_name="مقدار یکتا",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="specificationvalue",
+            constraint=models.UniqueConstraint(
+                fields=("specification", "key"), name="unique_specification_value_key"
+            ),
+        ),
+        migrations.RunPython(backfill_canonical_values, migrations.RunPython.noop),
+    ]
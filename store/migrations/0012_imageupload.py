@@ -0,0 +1,74 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0011_specificationvalue"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageUpload",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model_label", models.CharField(max_length=100, verbose_name="مدل")),
+                ("object_id", models.PositiveBigIntegerField(verbose_name="آیدی شیء")),
+                ("field_name", models.CharField(max_length=50, verbose_name="فیلد")),
+                (
+                    "key",
+                    models.CharField(max_length=500, verbose_name="کلید در فضای ابری"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "در صف"),
+                            ("uploading", "در حال آپلود"),
+                            ("done", "آپلود شده"),
+                            ("failed", "ناموفق"),
+                        ],
+                        db_index=True,
+                        default="pending",
+                        max_length=20,
+                        verbose_name="وضعیت",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="تعداد تلاش"
+                    ),
+                ),
+                ("last_error", models.TextField(blank=True, verbose_name="آخرین خطا")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="تاریخ ایجاد"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="تاریخ بروزرسانی"),
+                ),
+            ],
+            options={
+                "verbose_name": "آپلود تصویر",
+                "verbose_name_plural": "آپلود تصاویر",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("model_label", "object_id", "field_name"),
+                        name="unique_image_upload_field",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0012_imageupload"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="imageupload",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, max_length=64, verbose_name="hash محتوا (sha256)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="imageupload",
+            name="source_name",
+            field=models.CharField(
+                blank=True, max_length=500, verbose_name="نام فایل آپلود شده"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="imageupload",
+            name="key",
+            field=models.CharField(
+                db_index=True, max_length=500, verbose_name="کلید در فضای ابری"
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0013_imageupload_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="brand",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                verbose_name="نسخه\u200cهای کوچک و WebP تصویر",
+            ),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                verbose_name="نسخه\u200cهای کوچک و WebP تصویر",
+            ),
+        ),
+        migrations.AddField(
+            model_name="gallery",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                verbose_name="نسخه\u200cهای کوچک و WebP تصویر",
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                verbose_name="نسخه\u200cهای کوچک و WebP تصویر",
+            ),
+        ),
+    ]
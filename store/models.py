@@ -1,6 +1,10 @@
 import boto3
 import os
+import re
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Case, F, Q, Value, When
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
@@ -14,6 +18,8 @@ from jalali_date import datetime2jalali
 from dotenv import load_dotenv
 from store.utils import ArvanImageUploadMixin
 from ckeditor.fields import RichTextField
+from .text import normalize_persian
+from .changes import schedule_bump_changes
 
 load_dotenv()  # اگر مطمئن نیستی که قبلاً لود شده، این خط را بگذار
 
@@ -59,6 +65,7 @@ class Brand(models.Model, ArvanImageUploadMixin):
     name = models.CharField(max_length=100)
     description = RichTextField(blank=True, null=True)
     logo = models.ImageField(upload_to='brands/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='نسخه‌های کوچک و WebP تصویر')
     slug = models.SlugField(max_length=255, unique=True, allow_unicode=True, blank=True, null=True)
 
     class Meta:
@@ -87,6 +94,7 @@ class Category(MPTTModel, ArvanImageUploadMixin):
     slug = models.SlugField(max_length=255, unique=True, allow_unicode=True, blank=True, null=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
     icon = models.ImageField(upload_to='categories/icons/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='نسخه‌های کوچک و WebP تصویر')
     class MPTTMeta:
         order_insertion_by = ["parent", "name"]
 
@@ -122,6 +130,7 @@ class Product(models.Model, ArvanImageUploadMixin):
     brand = models.ForeignKey('Brand', on_delete=models.CASCADE, null=True, blank=True, related_name='products')
     description = RichTextField(blank=True, null=True)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='نسخه‌های کوچک و WebP تصویر')
     is_active = models.BooleanField(default=True)
 
     class Meta:
@@ -173,22 +182,250 @@ class Specification(models.Model):
         return f"{categories_names} - {self.name} "
 
 #product__________________________________________ ------product specification------ _______________________________________
+_SPEC_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+SPEC_TRUE_VALUES = {'true', '1', 'yes', 'بله', 'دارد', 'هست', '✓'}
+SPEC_FALSE_VALUES = {'false', '0', 'no', 'خیر', 'ندارد', 'نیست', '✗'}
+# حد numeric_value (max_digits=20, decimal_places=4)
+SPEC_NUMERIC_LIMIT = Decimal(10) ** 16
+
+
+def parse_spec_value(data_type, raw):
+    """
+    مقادیر نوع‌دار ``(numeric_value, bool_value, str_value)`` از مقدار متنی مشخصه بر
+    اساس data_type مشخصه؛ مثلاً «۸ گیگابایت» برای int مقدار عددی 8 دارد.
+    """
+    text = normalize_persian(raw)
+    if not text:
+        return None, None, None
+    numeric_value = bool_value = None
+    if data_type in ('int', 'decimal'):
+        # جداکننده هزارگان (4,000 یا ۴٬۰۰۰) حذف می‌شود
+        match = _SPEC_NUMBER.search(re.sub(r'(?<=\d)[,\u066c](?=\d{3})', '', text))
+        if match:
+            numeric_value = Decimal(match.group())
+            if data_type == 'int':
+                numeric_value = numeric_value.to_integral_value()
+            if abs(numeric_value) >= SPEC_NUMERIC_LIMIT:
+                numeric_value = None
+    elif data_type == 'bool':
+        if text in SPEC_TRUE_VALUES:
+            bool_value = True
+        elif text in SPEC_FALSE_VALUES:
+            bool_value = False
+    return numeric_value, bool_value, text[:255]
+
+
+def canonical_spec_key(numeric_value, bool_value, str_value):
+    """کلید یکتای مقدار مشخصه: عدد بدون صفرهای اضافه، true/false یا متن نرمال شده بدون فاصله بین عدد و واحد"""
+    if numeric_value is not None:
+        return format(Decimal(numeric_value).normalize(), 'f')
+    if bool_value is not None:
+        return 'true' if bool_value else 'false'
+    if str_value:
+        return re.sub(r'(?<=\d) (?=[^\d\s])', '', str_value)
+    return None
+
+
+class SpecificationValue(models.Model):
+    """
+    دیکشنری مقادیر هر مشخصه: یک ردیف برای هر مقدار یکتا (مثلاً «8GB»، «8 GB» و
+    «۸ گیگابایت» در مشخصه عددی یکی هستند). فیلترها و facetها با آیدی همین ردیف کار می‌کنند.
+    """
+    specification = models.ForeignKey(Specification, on_delete=models.CASCADE, related_name='value_choices', verbose_name='مشخصه')
+    key = models.CharField(max_length=255, verbose_name='کلید نرمال شده')
+    value = models.CharField(max_length=255, verbose_name='مقدار')
+    numeric_value = models.DecimalField(max_digits=20, decimal_places=4, null=True, blank=True, verbose_name='مقدار عددی')
+    bool_value = models.BooleanField(null=True, blank=True, verbose_name='مقدار بله/خیر')
+
+    class Meta:
+        verbose_name = 'مقدار یکتای مشخصه'
+        verbose_name_plural = 'مقادیر یکتای مشخصات'
+        constraints = [
+            models.UniqueConstraint(fields=['specification', 'key'], name='unique_specification_value_key'),
+        ]
+
+    def __str__(self):
+        return self.value
+
+    @classmethod
+    def assign(cls, items):
+        """
+        canonical_value نمونه‌های ProductSpecification (با مقادیر نوع‌دار پر شده) را
+        تعیین می‌کند و مقادیر جدید دیکشنری را گروهی می‌سازد.
+        """
+        wanted = {}
+        for item in items:
+            key = canonical_spec_key(item.numeric_value, item.bool_value, item.str_value)
+            item._canonical_key = key
+            if key is not None:
+                wanted.setdefault((item.specification_id, key), item)
+        ids = {}
+        if wanted:
+            spec_ids = {spec_id for spec_id, _ in wanted}
+            keys = {key for _, key in wanted}
+
+            def load():
+                for value_id, spec_id, key in cls.objects.filter(
+                    specification_id__in=spec_ids, key__in=keys,
+                ).values_list('id', 'specification_id', 'key'):
+                    if (spec_id, key) in wanted:
+                        ids[(spec_id, key)] = value_id
+
+            load()
+            missing = [pair for pair in wanted if pair not in ids]
+            if missing:
+                cls.objects.bulk_create([
+                    cls(
+                        specification_id=spec_id,
+                        key=key,
+                        value=(wanted[(spec_id, key)].specification_value or key).strip()[:255],
+                        numeric_value=wanted[(spec_id, key)].numeric_value,
+                        bool_value=wanted[(spec_id, key)].bool_value,
+                    )
+                    for spec_id, key in missing
+                ], ignore_conflicts=True)
+                load()
+                # bulk_create سیگنال ندارد؛ شمارنده ETag مقادیر دستی بالا می‌رود
+                schedule_bump_changes(cls, [ids[pair] for pair in missing if pair in ids])
+        for item in items:
+            item.canonical_value_id = ids.get((item.specification_id, item._canonical_key))
+        return items
+
+
 class ProductSpecification(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='spec_values', verbose_name='محصول')
     specification = models.ForeignKey(Specification, on_delete=models.CASCADE, related_name='values', verbose_name='مشخصه')
     specification_value = models.CharField(max_length=255, blank=True, null=True, verbose_name='مقدار  برای ویژگی ')
     is_main = models.BooleanField(default=False, verbose_name='مشخصه اصلی', help_text='مشخصه اصلی برای محصول است')
+    # مقادیر نوع‌دار که هنگام ذخیره از specification_value و data_type مشخصه پر می‌شوند
+    numeric_value = models.DecimalField(max_digits=20, decimal_places=4, null=True, blank=True, editable=False, verbose_name='مقدار عددی')
+    bool_value = models.BooleanField(null=True, blank=True, editable=False, verbose_name='مقدار بله/خیر')
+    str_value = models.CharField(max_length=255, null=True, blank=True, editable=False, verbose_name='مقدار متنی نرمال شده')
+    canonical_value = models.ForeignKey(
+        SpecificationValue, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name='product_values', verbose_name='مقدار یکتا',
+    )
+
+    TYPED_FIELDS = ['numeric_value', 'bool_value', 'str_value', 'canonical_value']
 
     class Meta:
         verbose_name = 'مقدار مشخصه محصول'
         verbose_name_plural = 'مقادیر مشخصات محصول'
         unique_together = ['product', 'specification']
+        indexes = [
+            models.Index(fields=['specification', 'numeric_value']),
+            models.Index(fields=['specification', 'bool_value']),
+            models.Index(fields=['specification', 'str_value']),
+        ]
 
     def value(self):
         return self.specification_value
 
+    def fill_typed_values(self, data_type=None):
+        if data_type is None:
+            data_type = self.specification.data_type
+        self.numeric_value, self.bool_value, self.str_value = parse_spec_value(data_type, self.specification_value)
+
+    @classmethod
+    def refresh_typed_values(cls, queryset=None, batch_size=1000):
+        """مقادیر نوع‌دار ردیف‌های موجود را گروهی دوباره محاسبه می‌کند (مثلاً بعد از تغییر data_type)."""
+        queryset = cls.objects.all() if queryset is None else queryset
+        batch = []
+        changed_ids, product_ids = [], set()
+        updated = 0
+        for item in queryset.select_related('specification').iterator(chunk_size=batch_size):
+            item.fill_typed_values()
+            batch.append(item)
+            if len(batch) >= batch_size:
+                updated += cls.objects.bulk_update(SpecificationValue.assign(batch), cls.TYPED_FIELDS)
+                changed_ids += [item.pk for item in batch]
+                product_ids.update(item.product_id for item in batch)
+                batch = []
+        if batch:
+            updated += cls.objects.bulk_update(SpecificationValue.assign(batch), cls.TYPED_FIELDS)
+            changed_ids += [item.pk for item in batch]
+            product_ids.update(item.product_id for item in batch)
+        # bulk_update سیگنال ندارد؛ شمارنده‌های ETag ردیف‌ها و محصولاتشان دستی بالا می‌روند
+        schedule_bump_changes(cls, changed_ids)
+        schedule_bump_changes(Product, product_ids)
+        return updated
+
+    def save(self, *args, **kwargs):
+        self.fill_typed_values()
+        SpecificationValue.assign([self])
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(self.TYPED_FIELDS)
+        super().save(*args, **kwargs)
+
+    # سازگاری با کدهای قدیمی که int_value / decimal_value را می‌خوانند یا مقدار می‌دهند
+    @property
+    def int_value(self):
+        return int(self.numeric_value) if self.numeric_value is not None else None
+
+    @int_value.setter
+    def int_value(self, value):
+        self.specification_value = None if value is None else str(int(value))
+        self.numeric_value = None if value is None else Decimal(int(value))
+
+    @property
+    def decimal_value(self):
+        return self.numeric_value
+
+    @decimal_value.setter
+    def decimal_value(self, value):
+        self.specification_value = None if value is None else str(value)
+        self.numeric_value = None if value is None else Decimal(str(value))
+
 #add  add provider for product-option foreignkey for faz 2 
 #product__________________________________________ ------product option------ _______________________________________
+def discount_active_q(now=None):
+    """شرط فعال بودن تخفیف در SQL؛ معادل ProductOption.is_discount_active"""
+    now = now or timezone.now()
+    return Q(is_active_discount=True, discount__gt=0) & (
+        Q(discount_start_date__isnull=True) |
+        Q(discount_end_date__isnull=True) |
+        Q(discount_start_date__lte=now, discount_end_date__gte=now)
+    )
+
+
+def final_price_expression(now=None):
+    """قیمت نهایی (بعد از تخفیف) در SQL؛ معادل ProductOption.get_final_price"""
+    return Case(
+        When(discount_active_q(now), then=F('option_price') - F('option_price') * F('discount') / 100),
+        default=F('option_price'),
+        output_field=models.PositiveIntegerField(),
+    )
+
+
+# annotationهای ProductOptionQuerySet.with_final_price
+ANNOTATED_PRICE_FIELDS = ('final_price', 'discount_is_active')
+
+
+class ProductOptionQuerySet(models.QuerySet):
+    def with_final_price(self, now=None):
+        """
+        final_price و discount_is_active را در SQL محاسبه می‌کند تا مرتب‌سازی و فیلتر
+        بر اساس قیمت نهایی ممکن باشد و get_final_price دوباره محاسبه نکند.
+        """
+        now = now or timezone.now()
+        return self.annotate(
+            final_price=final_price_expression(now),
+            discount_is_active=Case(
+                When(discount_active_q(now), then=Value(True)),
+                default=Value(False),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+    def stale_effective_price(self, now=None):
+        """ویژگی‌هایی که effective_price ذخیره شده آن‌ها با قیمت نهایی فعلی فرق دارد"""
+        return self.with_final_price(now).exclude(effective_price=F('final_price'))
+
+    def sync_effective_price(self, now=None):
+        return self.update(effective_price=final_price_expression(now))
+
+
 class ProductOption(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='options', verbose_name='محصول')
     color = models.ForeignKey('Color', on_delete=models.CASCADE, related_name='options', blank=True, null=True, verbose_name='رنگ')
@@ -202,6 +439,10 @@ class ProductOption(models.Model):
     discount = models.PositiveIntegerField(help_text="درصد تخفیف",validators=[MinValueValidator(0), MaxValueValidator(100)],blank=True,null=True,verbose_name='درصد تخفیف')
     discount_start_date = models.DateTimeField(null=True, blank=True, verbose_name='تاریخ شروع تخفیف')
     discount_end_date = models.DateTimeField(null=True, blank=True, verbose_name='تاریخ پایان تخفیف')
+    # قیمت نهایی ذخیره شده؛ در save و توسط دستور sweep_discount_windows بروز می‌شود
+    effective_price = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True, verbose_name='قیمت نهایی')
+
+    objects = ProductOptionQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'ویژگی محصول'
@@ -213,24 +454,41 @@ class ProductOption(models.Model):
             if self.discount_end_date <= self.discount_start_date:
                 raise ValidationError({'discount_end_date': "تاریخ پایان تخفیف باید بعد از تاریخ شروع باشد."})
 
+    def save(self, *args, **kwargs):
+        self.effective_price = self.get_final_price(timezone.now())
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'effective_price' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['effective_price']
+        super().save(*args, **kwargs)
+        # مقادیر with_final_price مربوط به قبل از تغییر هستند
+        for name in ANNOTATED_PRICE_FIELDS:
+            self.__dict__.pop(name, None)
+
     @property
     def is_discount_active(self):
+        # اگر queryset با with_final_price ساخته شده باشد، مقدار محاسبه شده در SQL استفاده می‌شود
+        if 'discount_is_active' in self.__dict__:
+            return self.discount_is_active
+        return self.is_discount_active_at(timezone.now())
+
+    def is_discount_active_at(self, now):
         if not self.is_active_discount or not self.discount:
             return False
-        now = timezone.now()
         if self.discount_start_date and self.discount_end_date:
             return self.discount_start_date <= now <= self.discount_end_date
         return True
 
-    def get_discount_amount(self):
-        if not self.is_discount_active:
+    def get_discount_amount(self, now=None):
+        active = self.is_discount_active if now is None else self.is_discount_active_at(now)
+        if not active:
             return 0
-        return int(self.option_price * (self.discount / 100))
+        # محاسبه عدد صحیح تا با final_price_expression در SQL یکسان باشد
+        return self.option_price * self.discount // 100
 
-    def get_final_price(self):
-        if not self.is_discount_active:
-            return self.option_price
-        return self.option_price - self.get_discount_amount()
+    def get_final_price(self, now=None):
+        if now is None and 'final_price' in self.__dict__:
+            return self.final_price
+        return self.option_price - self.get_discount_amount(now)
 
     def set_discount_by_amount(self, discount_amount):
         if discount_amount >= self.option_price:
@@ -266,11 +524,65 @@ class ProductOption(models.Model):
         return None
 
 
+#product__________________________________________ ------product summary------ _______________________________________
+
+class ProductSummary(models.Model):
+    """
+    خلاصه قیمت و موجودی هر محصول که از روی ProductOption های فعال نگهداری می‌شود
+    (store.product_summary) تا فیلتر و مرتب‌سازی بدون join انجام شود.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='summary', verbose_name='محصول')
+    min_final_price = models.PositiveIntegerField(null=True, blank=True, verbose_name='کمترین قیمت نهایی')
+    max_final_price = models.PositiveIntegerField(null=True, blank=True, verbose_name='بیشترین قیمت نهایی')
+    total_quantity = models.PositiveIntegerField(default=0, verbose_name='موجودی کل')
+    has_active_discount = models.BooleanField(default=False, verbose_name='تخفیف فعال دارد')
+    cheapest_option = models.ForeignKey(ProductOption, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name='ارزان‌ترین ویژگی')
+    refreshed_at = models.DateTimeField(default=timezone.now, verbose_name='زمان بروزرسانی')
+
+    class Meta:
+        verbose_name = 'خلاصه محصول'
+        verbose_name_plural = 'خلاصه محصولات'
+        indexes = [
+            models.Index(fields=['min_final_price']),
+            models.Index(fields=['total_quantity']),
+            models.Index(fields=['has_active_discount']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.min_final_price} - {self.max_final_price}"
+
+
+#product__________________________________________ ------search document------ _______________________________________
+
+class ProductSearchDocument(models.Model):
+    """
+    سند جستجوی پیش‌محاسبه شده هر محصول (متن نرمال شده فارسی + tsvector وزن‌دار).
+    توسط store.search نگهداری می‌شود.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='search_document', verbose_name='محصول')
+    title_text = models.TextField(blank=True, default='', verbose_name='عنوان نرمال شده')
+    keywords_text = models.TextField(blank=True, default='', verbose_name='کلمات کلیدی نرمال شده')
+    body_text = models.TextField(blank=True, default='', verbose_name='توضیحات نرمال شده')
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')
+
+    class Meta:
+        verbose_name = 'سند جستجوی محصول'
+        verbose_name_plural = 'اسناد جستجوی محصولات'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='store_search_vector_gin'),
+        ]
+
+    def __str__(self):
+        return self.title_text
+
+
 #product__________________________________________ ------Gallery------ _______________________________________
 
 class Gallery(models.Model, ArvanImageUploadMixin):
     product = models.ForeignKey(ProductOption, on_delete=models.CASCADE, related_name='gallery', verbose_name='ویژگی محصول')
     image = models.ImageField(upload_to='product_gallery/', verbose_name='تصویر')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='نسخه‌های کوچک و WebP تصویر')
     alt_text = models.CharField(max_length=255, blank=True, verbose_name='متن جایگزین')
 
     class Meta:
@@ -282,12 +594,83 @@ class Gallery(models.Model, ArvanImageUploadMixin):
         return f"عکس برای {self.product.product.title} - {color_name}"
 
     def save(self, *args, **kwargs):
+        # تصاویر یکسان گالری با یک نام مبتنی بر محتوا فقط یک بار ذخیره و آپلود می‌شوند
+        content_hash = self.assign_content_addressed_name(self.image)
         super().save(*args, **kwargs)
         if self.image:
-            self.upload_gallery_image_to_arvan()
+            self.upload_gallery_image_to_arvan(content_hash)
+
+    def upload_gallery_image_to_arvan(self, content_hash=None):
+        return self.upload_image_to_arvan(self.image, 'product_gallery', content_hash=content_hash)
+
+
+#product__________________________________________ ------similar product------ _______________________________________
 
-    def upload_gallery_image_to_arvan(self):
-        return self.upload_image_to_arvan(self.image, 'product_gallery')
+class SimilarProduct(models.Model):
+    """
+    نتایج پیش‌محاسبه شده محصولات مشابه (top-K) برای هر محصول.
+    توسط store.similar_products نگهداری می‌شود؛ ردیف با ``similar == product``
+    یعنی محصول محاسبه شده و مشابهی ندارد.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_entries', verbose_name='محصول')
+    similar = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name='محصول مشابه')
+    score = models.FloatField(default=0, verbose_name='امتیاز شباهت')
+    rank = models.PositiveSmallIntegerField(default=0, verbose_name='رتبه')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')
+
+    class Meta:
+        verbose_name = 'محصول مشابه'
+        verbose_name_plural = 'محصولات مشابه'
+        unique_together = ['product', 'similar']
+        ordering = ['product', 'rank']
+        indexes = [
+            models.Index(fields=['product', 'rank']),
+            models.Index(fields=['similar']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.similar_id} ({self.score:.2f})"
+
+
+#uploads__________________________________________ ------image upload------ _______________________________________
+
+class ImageUpload(models.Model):
+    """
+    وضعیت آپلود هر فیلد تصویر در فضای ابری آروان؛ آپلود در صف پس‌زمینه
+    (store.uploads) انجام می‌شود.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_UPLOADING = 'uploading'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'در صف'),
+        (STATUS_UPLOADING, 'در حال آپلود'),
+        (STATUS_DONE, 'آپلود شده'),
+        (STATUS_FAILED, 'ناموفق'),
+    ]
+
+    model_label = models.CharField(max_length=100, verbose_name='مدل')
+    object_id = models.PositiveBigIntegerField(verbose_name='آیدی شیء')
+    field_name = models.CharField(max_length=50, verbose_name='فیلد')
+    key = models.CharField(max_length=500, db_index=True, verbose_name='کلید در فضای ابری')
+    content_hash = models.CharField(max_length=64, blank=True, verbose_name='hash محتوا (sha256)')
+    source_name = models.CharField(max_length=500, blank=True, verbose_name='نام فایل آپلود شده')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True, verbose_name='وضعیت')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='تعداد تلاش')
+    last_error = models.TextField(blank=True, verbose_name='آخرین خطا')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')
+
+    class Meta:
+        verbose_name = 'آپلود تصویر'
+        verbose_name_plural = 'آپلود تصاویر'
+        constraints = [
+            models.UniqueConstraint(fields=['model_label', 'object_id', 'field_name'], name='unique_image_upload_field'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label}:{self.object_id}.{self.field_name} ({self.status})"
 
 
 #public__________________________________________ ------color------ _______________________________________
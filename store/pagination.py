@@ -0,0 +1,121 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """
+    صفحه‌بندی پیش‌فرض API با اندازه صفحه معقول و سقف مشخص.
+
+    با ``?count=false`` کوئری ``COUNT(*)`` اجرا نمی‌شود؛ در این حالت یک ردیف
+    اضافه خوانده می‌شود تا وجود صفحه بعد مشخص شود و ``count`` در خروجی ``null`` است.
+    """
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    def count_enabled(self, request):
+        value = request.query_params.get(self.count_query_param)
+        return value is None or value.lower() not in FALSE_VALUES
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.with_count = self.count_enabled(request)
+        if self.with_count:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param) or 1)
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        if self.page_number < 1:
+            raise NotFound(self.invalid_page_message)
+
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        if not rows and self.page_number > 1:
+            raise NotFound(self.invalid_page_message)
+        self.has_next_page = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if self.with_count:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': None,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if self.with_count:
+            return super().get_next_link()
+        if not self.has_next_page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.with_count:
+            return super().get_previous_link()
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+
+class CatalogCursorPagination(CursorPagination):
+    """
+    صفحه‌بندی keyset برای کاتالوگ؛ بدون OFFSET و بدون COUNT.
+
+    ترتیب از ``OrderingFilter`` ویو گرفته می‌شود و در نبود آن ``-id`` است. موقعیت
+    cursor از مقدار فیلد ترتیب روی خود شیء خوانده می‌شود، پس فقط ستون‌های همان مدل
+    (یا annotationهای queryset) که null و boolean نیستند مجازند؛ مسیرهای رابطه‌ای
+    (``summary__...``، ``options__...``) و فیلدهای nullable/boolean در ``?ordering=``
+    با خطای 400 رد و از ترتیب پیش‌فرض ویو حذف می‌شوند.
+    """
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
+    tiebreaker = '-id'
+
+    @staticmethod
+    def is_cursor_safe(queryset, field_name):
+        name = field_name.lstrip('-')
+        if name in ('id', 'pk'):
+            return True
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return not isinstance(annotation.output_field, models.BooleanField)
+        try:
+            field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return field.concrete and not field.is_relation and not field.null and not isinstance(field, models.BooleanField)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        unsafe = [field for field in ordering if not self.is_cursor_safe(queryset, field)]
+        if unsafe and request.query_params.get(api_settings.ORDERING_PARAM):
+            raise ValidationError({api_settings.ORDERING_PARAM: [
+                f'ترتیب {", ".join(unsafe)} در صفحه‌بندی cursor پشتیبانی نمی‌شود؛ از صفحه‌بندی عددی استفاده کنید.'
+            ]})
+        ordering = [field for field in ordering if field not in unsafe]
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append(self.tiebreaker)
+        return tuple(ordering)
@@ -0,0 +1,58 @@
+"""
+نگهداری ProductSummary: کمترین/بیشترین قیمت نهایی، موجودی کل، وجود تخفیف فعال
+و ارزان‌ترین ویژگی فعال هر محصول.
+
+با ذخیره/حذف ProductOption و با دستور ``sweep_discount_windows`` (برای شروع
+و پایان بازه‌های تخفیف) بروزرسانی می‌شود.
+"""
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .models import Product, ProductOption, ProductSummary
+
+SUMMARY_FIELDS = [
+    'min_final_price', 'max_final_price', 'total_quantity',
+    'has_active_discount', 'cheapest_option', 'refreshed_at',
+]
+
+
+def build_summary(product_id, options, now=None):
+    """ProductSummary (ذخیره نشده) برای گزینه‌های فعال یک محصول."""
+    now = now or timezone.now()
+    summary = ProductSummary(product_id=product_id, refreshed_at=now)
+    # options باید با ProductOption.objects.with_final_price(now) خوانده شده باشند
+    cheapest = None
+    for option in options:
+        final_price = option.get_final_price()
+        summary.total_quantity += option.quantity
+        summary.has_active_discount = summary.has_active_discount or option.is_discount_active
+        if summary.max_final_price is None or final_price > summary.max_final_price:
+            summary.max_final_price = final_price
+        if cheapest is None or (final_price, option.pk) < cheapest:
+            cheapest = (final_price, option.pk)
+    if cheapest is not None:
+        summary.min_final_price, summary.cheapest_option_id = cheapest
+    return summary
+
+
+def refresh_product_summaries(product_ids, now=None):
+    """خلاصه محصولات داده شده را با یک کوئری خواندن و یک upsert بازسازی می‌کند."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return 0
+    existing = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+    if not existing:
+        return 0
+    now = now or timezone.now()
+    options = defaultdict(list)
+    for option in ProductOption.objects.with_final_price(now).filter(product_id__in=existing, is_active=True):
+        options[option.product_id].append(option)
+    summaries = [build_summary(product_id, options[product_id], now) for product_id in existing]
+    ProductSummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=SUMMARY_FIELDS,
+    )
+    return len(summaries)
@@ -0,0 +1,106 @@
+"""
+رندر سریع JSON با orjson.
+
+orjson اختیاری است؛ اگر نصب نباشد (یا داده‌ای داشته باشیم که orjson پشتیبانی
+نمی‌کند، مثل عدد صحیح بزرگ‌تر از ۶۴ بیت) همان ``JSONRenderer`` پیش‌فرض DRF
+استفاده می‌شود. نوع‌هایی که orjson خودش می‌شناسد با خروجی DRF یکسان‌اند و بقیه
+(Decimal، datetime/date/time، رشته‌های lazy ترجمه، QuerySet و ...) به همان
+``JSONEncoder`` در DRF سپرده می‌شوند تا خروجی دو رندرر یکی باشد.
+
+لیست‌های بزرگ (``results``/``data`` پاسخ‌ها) با ``iter_render`` تکه‌تکه encode و
+ارسال می‌شوند تا بدنه JSON کامل به صورت یک bytes بزرگ (و کپی آن در
+``HttpResponse``) ساخته نشود. داده سریالایز شده (``response.data``) در این زمان
+کامل در حافظه است، پس فقط حافظه بدنه encode شده کم می‌شود نه خود داده‌ها. آستانه پیش‌فرض
+(``STORE_JSON_STREAM_THRESHOLD``) از ``max_page_size`` صفحه‌بندی (۱۰۰) کمتر است تا
+صفحه‌های بزرگ لیست‌های صفحه‌بندی شده هم تکه‌تکه ارسال شوند؛ صفحه پیش‌فرض (۲۴ آیتم)
+یک‌جا رندر و در کش پاسخ‌ها ذخیره می‌شود.
+"""
+import json
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - وابستگی اختیاری
+    orjson = None
+
+# کلیدهایی از پاسخ که لیست اصلی آن هستند (صفحه‌بندی DRF و پاسخ‌های بدون صفحه‌بندی)
+STREAM_KEYS = ('results', 'data')
+DEFAULT_STREAM_THRESHOLD = 50
+DEFAULT_CHUNK_SIZE = 50
+
+_encoder = encoders.JSONEncoder()
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def get_stream_threshold():
+    return getattr(settings, 'STORE_JSON_STREAM_THRESHOLD', DEFAULT_STREAM_THRESHOLD)
+
+
+def get_chunk_size():
+    return getattr(settings, 'STORE_JSON_STREAM_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def dumps(data):
+    """data به صورت bytes با فرمت فشرده DRF (بدون فاصله و بدون escape یونیکد)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(
+        data, cls=encoders.JSONEncoder, ensure_ascii=False, allow_nan=False, separators=(',', ':'),
+    ).encode()
+
+
+def stream_key(data):
+    """کلید لیست اصلی پاسخ (یا '' برای لیست سطح بالا) اگر آن‌قدر بزرگ باشد که تکه‌تکه رندر شود."""
+    threshold = get_stream_threshold()
+    if isinstance(data, list):
+        return '' if len(data) > threshold else None
+    if isinstance(data, dict):
+        for key in STREAM_KEYS:
+            if isinstance(data.get(key), list) and len(data[key]) > threshold:
+                return key
+    return None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer با orjson؛ خروجی با JSONRenderer پیش‌فرض یکسان است."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        # خروجی با فاصله‌گذاری (?indent / Accept: ...; indent=4) با رندرر پیش‌فرض
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+    def iter_render(self, data, chunk_size=None):
+        """
+        بدنه پاسخ به صورت تکه‌های bytes؛ لیست اصلی پاسخ در تکه‌های chunk_size تایی
+        رندر می‌شود و بقیه کلیدها قبل از آن می‌آیند. data خودش از قبل کامل ساخته
+        شده است؛ فقط خروجی encode شده تکه‌تکه تولید می‌شود.
+        """
+        chunk_size = chunk_size or get_chunk_size()
+        key = stream_key(data)
+        if key is None:
+            yield dumps(data)
+            return
+        if key == '':
+            items, prefix, suffix = data, b'[', b']'
+        else:
+            items = data[key]
+            rest = dumps({name: value for name, value in data.items() if name != key})
+            prefix = (b'{' if rest == b'{}' else rest[:-1] + b',') + dumps(key) + b':['
+            suffix = b']}'
+        yield prefix
+        for start in range(0, len(items), chunk_size):
+            chunk = dumps(items[start:start + chunk_size])[1:-1]
+            yield chunk if start == 0 else b',' + chunk
+        yield suffix
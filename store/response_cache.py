@@ -0,0 +1,84 @@
+"""
+کش پاسخ‌های GET کاربران ناشناس.
+
+پاسخ کاربران ناشناس برای همه یکسان است؛ بدنه رندر شده پاسخ با کلیدی ذخیره
+می‌شود که از ETag همان پاسخ (store.changes) ساخته شده است. ETag از آدرس و
+پارامترهای مرتب شده درخواست و نسخه برچسب‌های وابستگی آن (``changes:product``،
+``changes:product:12``، ``changes:brand``، ...) ساخته می‌شود، پس تغییر یک مدل فقط
+ورودی‌هایی را که به برچسب‌های آن وابسته‌اند بی‌اعتبار می‌کند و ورودی‌های قدیمی
+خودشان منقضی می‌شوند.
+
+درستی کلیدها به شمارنده‌های ETag بستگی دارد: تا وقتی کش نسخه‌ها (store.cache،
+``STORE_VERSION_CACHE``) بین پروسه‌ها مشترک نباشد تغییرات دستورات مدیریتی به
+شمارنده‌های سرور نمی‌رسد، پس در این حالت کش پاسخ‌ها غیرفعال است. خود پاسخ‌ها
+می‌توانند در کش هر پروسه (locmem) باشند چون ETag تکرار نمی‌شود.
+
+برای جلوگیری از هجوم درخواست‌ها (cache stampede) بعد از بی‌اعتبار شدن، فقط
+درخواستی که قفل ``cache.add`` را بگیرد پاسخ را می‌سازد و بقیه مدت کوتاهی منتظر
+ذخیره شدن آن می‌مانند.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import KEY_PREFIX, versions_are_shared
+
+DEFAULT_TIMEOUT = 5 * 60
+# حداکثر زمان ساخت پاسخ توسط درخواستی که قفل را گرفته
+LOCK_TIMEOUT = 30
+# مدت انتظار بقیه درخواست‌ها برای پاسخ در حال ساخت (ثانیه)
+DEFAULT_WAIT = 2.0
+POLL_INTERVAL = 0.05
+
+
+def is_enabled():
+    return getattr(settings, 'STORE_RESPONSE_CACHE', True) and versions_are_shared()
+
+
+def get_timeout():
+    return getattr(settings, 'STORE_RESPONSE_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def get_wait():
+    return getattr(settings, 'STORE_RESPONSE_CACHE_WAIT', DEFAULT_WAIT)
+
+
+def response_key(etag):
+    return f'{KEY_PREFIX}:response:{etag.strip(chr(34))}'
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def get_entry(key):
+    """``{'content', 'content_type'}`` ذخیره شده یا None"""
+    return cache.get(key)
+
+
+def set_entry(key, content, content_type):
+    cache.set(key, {'content': content, 'content_type': content_type}, get_timeout())
+    cache.delete(_lock_key(key))
+
+
+def acquire(key):
+    """True اگر این درخواست مسئول ساخت پاسخ باشد (single-flight)."""
+    return cache.add(_lock_key(key), 1, LOCK_TIMEOUT)
+
+
+def release(key):
+    cache.delete(_lock_key(key))
+
+
+def wait_for_entry(key, wait=None):
+    """تا ذخیره شدن پاسخ توسط درخواست دیگر یا آزاد شدن قفل صبر می‌کند."""
+    deadline = time.monotonic() + (get_wait() if wait is None else wait)
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if cache.get(_lock_key(key)) is None:
+            return cache.get(key)
+    return None
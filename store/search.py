@@ -0,0 +1,86 @@
+"""
+جستجوی متن کامل محصولات.
+
+برای هر محصول یک ProductSearchDocument با متن نرمال شده فارسی نگهداری می‌شود
+(عنوان‌ها با وزن A، برند/دسته‌بندی/تگ/مشخصات با وزن B و توضیحات بدون HTML با وزن D)
+و جستجو با tsvector روی همین جدول و یک join یک‌به‌یک انجام می‌شود؛ بدون join
+روی جدول‌های چندتایی و بدون distinct. نتایج بر اساس ``search_rank`` مرتب می‌شوند.
+
+در صورت نصب بودن pg_trgm، ایندکس trigram روی ستون‌های متنی، جستجوی زیررشته را هم
+سریع می‌کند (مایگریشن 0009).
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, Q
+
+from .models import Product, ProductSearchDocument
+from .text import normalize_persian, search_variants, strip_html, tokenize
+
+SEARCH_CONFIG = 'simple'
+DOCUMENT_FIELDS = ['title_text', 'keywords_text', 'body_text']
+
+
+def search_vector_expression():
+    return (
+        SearchVector('title_text', weight='A', config=SEARCH_CONFIG) +
+        SearchVector('keywords_text', weight='B', config=SEARCH_CONFIG) +
+        SearchVector('body_text', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def build_search_document(product):
+    """ProductSearchDocument (ذخیره نشده)؛ product باید با prefetch روابط خوانده شده باشد."""
+    keywords = [product.brand.name if product.brand else '']
+    keywords += [category.name for category in product.categories.all()]
+    keywords += [tag.name for tag in product.tags.all()]
+    for spec_value in product.spec_values.all():
+        keywords += [spec_value.specification.name, spec_value.specification_value or '']
+    return ProductSearchDocument(
+        product_id=product.pk,
+        title_text=search_variants(' '.join(filter(None, [product.title, product.title_farsi]))),
+        keywords_text=search_variants(' '.join(filter(None, keywords))),
+        body_text=normalize_persian(strip_html(product.description)),
+    )
+
+
+def refresh_search_documents(product_ids):
+    """اسناد جستجوی محصولات داده شده را بازسازی می‌کند."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return 0
+    products = Product.objects.filter(id__in=product_ids).select_related('brand').prefetch_related(
+        'categories', 'tags', 'spec_values__specification',
+    )
+    documents = [build_search_document(product) for product in products]
+    if not documents:
+        return 0
+    ProductSearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=DOCUMENT_FIELDS,
+    )
+    ProductSearchDocument.objects.filter(
+        product_id__in=[document.product_id for document in documents]
+    ).update(search_vector=search_vector_expression())
+    return len(documents)
+
+
+def build_search_query(text):
+    """tsquery پیشوندی (``token:*``) از کلمات نرمال شده؛ همه کلمات باید وجود داشته باشند."""
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    return SearchQuery(' & '.join(f'{token}:*' for token in tokens), search_type='raw', config=SEARCH_CONFIG)
+
+
+def search_products(queryset, text):
+    """محصولات مطابق با ``text`` با annotation ``search_rank``."""
+    query = build_search_query(text)
+    if query is None:
+        return queryset
+    normalized = normalize_persian(text)
+    return queryset.filter(
+        Q(search_document__search_vector=query) |
+        Q(search_document__title_text__contains=normalized) |
+        Q(search_document__keywords_text__contains=normalized)
+    ).annotate(search_rank=SearchRank(F('search_document__search_vector'), query))
@@ -1,28 +1,108 @@
+from django.db import models
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from .models import (
     Product, Category, ProductOption, Brand, Gallery,
     Specification, ProductSpecification , Color , Tag , Warranty,SpecificationGroup
 )
 from .filters import ProductFilter
 from .models import Product
+from django.conf import settings
 from django.utils import timezone
 from django.db.models import Q, Avg,Min
+from .similar_products import get_similar_products
+from .facets import get_category_facets, get_category_facet_values
+from .category_tree import category_products, get_category_product_counts
+from .derivatives import build_srcset
+from .media_urls import media_url
 import logging
 
 
 
-class GallerySerializer(serializers.ModelSerializer):
+def summary_min_price(product):
+    """کمترین قیمت نهایی محصول از ProductSummary (بدون aggregate جداگانه)"""
+    summary = getattr(product, 'summary', None)
+    return summary.min_final_price if summary is not None else None
+
+
+class MediaImageField(serializers.ImageField):
+    """ImageField با آدرس ساخته شده در store.media_urls (بدون فراخوانی storage.url برای هر تصویر)"""
+
+    def to_representation(self, value):
+        if not value or not getattr(self, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return super().to_representation(value)
+        url = media_url(value)
+        request = self.context.get('request', None)
+        if request is not None and not url.startswith(('http://', 'https://', '//')):
+            return request.build_absolute_uri(url)
+        return url
+
+
+class MediaURLModelSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = {**serializers.ModelSerializer.serializer_field_mapping, models.ImageField: MediaImageField}
+
+
+class ImageSrcsetField(serializers.Field):
+    """
+    نقشه srcset نسخه‌های کوچک و WebP فیلد تصویر (store.derivatives)؛ تا وقتی
+    نسخه‌ها ساخته نشده‌اند null است و کلاینت از تصویر اصلی استفاده می‌کند.
+    """
+
+    def __init__(self, image_field='image', **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.image_field = image_field
+
+    def to_representation(self, instance):
+        return build_srcset(instance, self.image_field)
+
+
+def parse_field_list(value):
+    """``"a, b,c"`` -> ``['a', 'b', 'c']``"""
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+class DynamicFieldsMixin:
+    """
+    فیلدهای قابل انتخاب با ``?fields=`` و ``?expand=``.
+
+    ``Meta.default_fields`` فیلدهایی است که بدون پارامتر رندر می‌شوند (پیش‌فرض همه
+    ``Meta.fields``)؛ ``?fields=`` همین لیست را جایگزین و ``?expand=`` فیلدهای سنگین
+    دیگر را اضافه می‌کند. ویو لیست نهایی را با آرگومان ``fields`` به سریالایزر می‌دهد
+    تا prefetch ها هم بر اساس همان لیست انتخاب شوند.
+    """
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            fields = getattr(self.Meta, 'default_fields', None)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def resolve_fields(cls, params):
+        available = list(cls.Meta.fields)
+        requested = parse_field_list(params.get('fields')) or getattr(cls.Meta, 'default_fields', available)
+        selected = set(requested) | set(parse_field_list(params.get('expand')))
+        return [name for name in available if name in selected]
+
+
+class GallerySerializer(MediaURLModelSerializer):
     product_title = serializers.CharField(source='product.product.title', read_only=True)
     color_name = serializers.CharField(source='product.color.name', read_only=True)
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Gallery
-        fields = ['id', 'product', 'product_title', 'color_name', 'image', 'alt_text']
+        fields = ['id', 'product', 'product_title', 'color_name', 'image', 'image_srcset', 'alt_text']
+
+class BrandSerializer(MediaURLModelSerializer):
+    logo_srcset = ImageSrcsetField('logo')
 
-class BrandSerializer(serializers.ModelSerializer):
     class Meta:
         model = Brand
-        fields = ['id', 'name', 'description', 'logo', 'slug']
+        fields = ['id', 'name', 'description', 'logo', 'logo_srcset', 'slug']
 
 class ColorSerializer(serializers.ModelSerializer):
     class Meta:
@@ -43,41 +123,82 @@ class SpecificationSerializer(serializers.ModelSerializer):
 class ProductSpecificationSerializer(serializers.ModelSerializer):
     specification = SpecificationSerializer(read_only=True)
     value = serializers.SerializerMethodField()
+    value_id = serializers.IntegerField(source='canonical_value_id', read_only=True)
 
     class Meta:
         model = ProductSpecification
-        fields = ['id', 'product', 'specification', 'value' , "is_main"]
+        fields = ['id', 'product', 'specification', 'value', 'value_id', "is_main"]
 
     def get_value(self, obj):
         return obj.value()
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(DynamicFieldsMixin, MediaURLModelSerializer):
+    """
+    محصولات دسته‌بندی فقط با ``?expand=products`` (و محدود به چند محصول) اضافه می‌شوند؛
+    لیست کامل و صفحه‌بندی شده از ``/categories/{id}/products/`` خوانده می‌شود.
+    """
     children = serializers.SerializerMethodField()
     brand = BrandSerializer(read_only=True,many=True)
     spec_definitions = SpecificationSerializer(many=True, read_only=True)
+    product_count = serializers.SerializerMethodField()
     products = serializers.SerializerMethodField()
     spec_value_choices = serializers.SerializerMethodField()
+    image_srcset = ImageSrcsetField()
+    icon_srcset = ImageSrcsetField('icon')
 
     class Meta:
         model = Category
-        fields = [
+        default_fields = [
             'id', 'name', 'description', 'parent', 'children', 'brand',
-            'spec_definitions', 'slug', 'image','icon', 'products', 'spec_value_choices'
+            'spec_definitions', 'slug', 'image','icon', 'image_srcset', 'icon_srcset',
+            'product_count', 'spec_value_choices'
         ]
+        fields = default_fields + ['products']
 
     def get_children(self, obj):
-        return CategorySerializer(obj.children.all(), many=True).data
+        # در حالت درختی (store.category_tree) فرزندان از قبل در حافظه هستند
+        children = obj.get_children() if hasattr(obj, '_cached_children') else obj.children.all()
+        return CategorySerializer(children, many=True, context=self.context, fields=list(self.fields)).data
+
+    def get_product_count(self, obj):
+        if 'category_product_counts' not in self.context:
+            self.context['category_product_counts'] = get_category_product_counts()
+        return self.context['category_product_counts'].get(obj.pk, 0)
 
     def get_products(self, obj):
-        from .models import Product
-        qs = Product.objects.filter(categories=obj)
-        return ProductSerializer(qs, many=True, context=self.context).data
+        limit = getattr(settings, 'STORE_CATEGORY_EMBEDDED_PRODUCTS', 12)
+        qs = category_products(Product.objects.all(), (obj.tree_id, obj.lft, obj.rght))
+        qs = qs.select_related('brand', 'summary').prefetch_related('categories')
+        return ProductListItemSerializer(qs.order_by('-id')[:limit], many=True, context=self.context).data
 
     def get_spec_value_choices(self, obj):
-        from .serializers import SpecificationWithValuesSerializer
-        specs = obj.spec_definitions.all()
-        serializer = SpecificationWithValuesSerializer(specs, many=True, context={'category': obj})
-        return serializer.data
+        return get_category_facets(obj)
+
+
+class CategoryTreeSerializer(MediaURLModelSerializer):
+    """
+    نمایش سبک و تو در توی دسته‌بندی‌ها برای منو؛ فرزندان باید با
+    store.category_tree.load_category_tree در حافظه ساخته شده باشند.
+    """
+    has_children = serializers.SerializerMethodField()
+    children = serializers.SerializerMethodField()
+    image_srcset = ImageSrcsetField()
+    icon_srcset = ImageSrcsetField('icon')
+
+    class Meta:
+        model = Category
+        fields = [
+            'id', 'name', 'slug', 'parent', 'level', 'image', 'icon', 'image_srcset', 'icon_srcset',
+            'has_children', 'children',
+        ]
+
+    def get_has_children(self, obj):
+        # بدون کوئری: نود برگ در MPTT دارای rght = lft + 1 است
+        return obj.rght - obj.lft > 1
+
+    def get_children(self, obj):
+        return CategoryTreeSerializer(getattr(obj, '_cached_children', []), many=True, context=self.context).data
+
 
 class ProductOptionSerializer(serializers.ModelSerializer):
     color = ColorSerializer(read_only=True)
@@ -94,10 +215,14 @@ class ProductOptionSerializer(serializers.ModelSerializer):
         ]
 
     def get_final_price(self, obj):
+        # در لیست‌ها و prefetch محصولات از annotation با with_final_price خوانده می‌شود
+        if 'final_price' in obj.__dict__:
+            return obj.final_price
         return obj.get_final_price()
 
     def get_gallery(self, obj):
-        return [{'id': img.id, 'image': img.image.url if img.image else None, 'alt_text': img.alt_text}
+        return [{'id': img.id, 'image': media_url(img.image),
+                 'image_srcset': build_srcset(img, 'image'), 'alt_text': img.alt_text}
                 for img in obj.gallery.all()]
 
     def get_tags(self, obj):
@@ -131,14 +256,30 @@ class SpecificationGroupSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'specifications']
     
     def get_specifications(self, obj):
-        product = self.context.get('product')
-        spec_values = ProductSpecification.objects.filter(
-            product=product,
-            specification__group=obj
-        ).select_related('specification')
+        grouped = self.context.get('spec_values_by_group')
+        if grouped is not None:
+            spec_values = grouped.get(obj.id, [])
+        else:
+            spec_values = ProductSpecification.objects.filter(
+                product=self.context.get('product'),
+                specification__group=obj
+            ).select_related('specification').prefetch_related('specification__categories')
         return ProductSpecificationSerializer(spec_values, many=True).data
 
 
+def group_spec_values(spec_values):
+    """
+    مقادیر مشخصات (prefetch شده با specification__group) را در یک پیمایش گروه‌بندی می‌کند:
+    ``{group_id: [spec_value, ...]}`` به ترتیب آیدی گروه؛ مقادیر بدون گروه کنار گذاشته می‌شوند.
+    """
+    grouped = {}
+    for spec_value in spec_values:
+        group_id = spec_value.specification.group_id
+        if group_id is not None:
+            grouped.setdefault(group_id, []).append(spec_value)
+    return dict(sorted(grouped.items()))
+
+
 
 class SimilarProductSerializer(serializers.ModelSerializer):
     """
@@ -146,7 +287,7 @@ class SimilarProductSerializer(serializers.ModelSerializer):
     """
     brand = serializers.StringRelatedField()
     min_price = serializers.SerializerMethodField()
-    image = serializers.ImageField()
+    image = MediaImageField()
     options = ProductOptionSerializer(many=True, read_only=True)
 
     class Meta:
@@ -154,52 +295,91 @@ class SimilarProductSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'slug', 'brand', 'min_price', 'image', 'options']
 
     def get_min_price(self, obj):
-        return obj.options.aggregate(min=Min('option_price'))['min']
+        return summary_min_price(obj)
 
 
+class ProductListSerializer(serializers.ListSerializer):
+    """
+    محصولات مشابه را یک بار برای کل صفحه محاسبه و در context قرار می‌دهد
+    تا get_similar_products برای هر محصول کوئری جداگانه نزند.
+    """
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        if 'similar_products' in self.child.fields:
+            self.context.setdefault('similar_products', {}).update(get_similar_products(items))
+        return super().to_representation(items)
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, MediaURLModelSerializer):
     categories = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
     brand = serializers.StringRelatedField()
     options = ProductOptionSerializer(many=True, read_only=True)
     spec_values = ProductSpecificationSerializer(many=True, read_only=True)
     spec_groups = serializers.SerializerMethodField()
     similar_products = serializers.SerializerMethodField()  
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Product
         fields = [
             'id', 'title','title_farsi', 'slug', 'categories', 'description',
-            'image', 'brand', 'options', 'spec_values',
+            'image', 'image_srcset', 'brand', 'options', 'spec_values',
             'is_active', 'tags', 'spec_groups', "similar_products",  
         ]
+        list_serializer_class = ProductListSerializer
 
     def get_spec_groups(self, obj):
-        serializer = SpecificationGroupSerializer(many=True, context={'product': obj})
+        grouped = group_spec_values(obj.spec_values.all())
+        groups = [spec_values[0].specification.group for spec_values in grouped.values()]
+        serializer = SpecificationGroupSerializer(
+            groups, many=True, context={'product': obj, 'spec_values_by_group': grouped},
+        )
         return serializer.data
 
     def get_similar_products(self, obj):
-        categories = obj.categories.all()
-        min_price = obj.options.aggregate(min=Min('option_price'))['min']
-        if min_price is None:
-            return []
-        price_range = (int(min_price * 0.7), int(min_price * 1.3))
-        similar_products = Product.objects.filter(
-            is_active=True,
-            categories__in=categories
-        ).exclude(id=obj.id).distinct()
-        similar_products = similar_products.filter(
-            options__option_price__gte=price_range[0],
-            options__option_price__lte=price_range[1]
-        ).distinct()
-        serializer = SimilarProductSerializer(similar_products, many=True)
+        similar_map = self.context.get('similar_products')
+        if similar_map is None or obj.pk not in similar_map:
+            similar_map = get_similar_products([obj])
+        serializer = SimilarProductSerializer(similar_map.get(obj.pk, []), many=True, context=self.context)
         return serializer.data
 
+class ProductListItemSerializer(ProductSerializer):
+    """
+    نمایش سبک محصول در لیست‌ها؛ فیلدهای سنگین (ویژگی‌ها، مشخصات، محصولات مشابه و ...)
+    فقط با ``?expand=`` اضافه می‌شوند.
+    """
+    min_price = serializers.SerializerMethodField()
+    max_price = serializers.SerializerMethodField()
+    in_stock = serializers.SerializerMethodField()
+    has_discount = serializers.SerializerMethodField()
+
+    class Meta(ProductSerializer.Meta):
+        default_fields = [
+            'id', 'title', 'title_farsi', 'slug', 'image', 'image_srcset', 'brand', 'categories', 'is_active',
+            'min_price', 'max_price', 'in_stock', 'has_discount',
+        ]
+        fields = default_fields + ['description', 'options', 'spec_values', 'tags', 'spec_groups', 'similar_products']
+
+    def get_min_price(self, obj):
+        return summary_min_price(obj)
+
+    def get_max_price(self, obj):
+        summary = getattr(obj, 'summary', None)
+        return summary.max_final_price if summary is not None else None
+
+    def get_in_stock(self, obj):
+        summary = getattr(obj, 'summary', None)
+        return bool(summary and summary.total_quantity)
+
+    def get_has_discount(self, obj):
+        summary = getattr(obj, 'summary', None)
+        return bool(summary and summary.has_active_discount)
+
+
 class ProductCompactSerializer(serializers.ModelSerializer):
     brand = serializers.StringRelatedField()
     min_price = serializers.SerializerMethodField()
-    image = serializers.ImageField()
+    image = MediaImageField()
     options = ProductOptionSerializer(many=True, read_only=True)
 
     class Meta:
@@ -207,7 +387,7 @@ class ProductCompactSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'slug', 'brand', 'min_price', 'image', 'options']
 
     def get_min_price(self, obj):
-        return obj.options.aggregate(min=Min('option_price'))['min']
+        return summary_min_price(obj)
 
 
     tags = TagSerializer(many=True , read_only=True)
@@ -232,16 +412,8 @@ class SpecificationWithValuesSerializer(serializers.ModelSerializer):
         category = self.context.get('category')
         if not category:
             return []
-        from .models import ProductSpecification
-        qs = ProductSpecification.objects.filter(
-            specification=obj,
-            product__categories=category
-        )
-        # اگر می‌خواهید value لیست دیکشنری باشد:
-        return [
-            {"id": ps.id, "value": ps.specification_value}
-            for ps in qs.distinct('specification_value')
-        ]
+        # مقادیر از ایندکس facet کش شده دسته‌بندی خوانده می‌شوند
+        return get_category_facet_values(category).get(obj.id, [])
 
 
 class CategorySpecificationWithValuesSerializer(serializers.ModelSerializer):
@@ -252,8 +424,7 @@ class CategorySpecificationWithValuesSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'specifications']
 
     def get_specifications(self, obj):
-        specs = obj.spec_definitions.all()
-        return SpecificationWithValuesSerializer(specs, many=True, context={'category': obj}).data
+        return get_category_facets(obj)
 
 
 
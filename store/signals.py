@@ -0,0 +1,286 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    Brand, Category, Color, Gallery, Product, ProductOption, ProductSpecification, Specification,
+    SpecificationGroup, SpecificationValue, Tag, Warranty,
+)
+from . import similar_products
+from .facets import invalidate_category_facets
+from .product_summary import refresh_product_summaries
+from .search import refresh_search_documents
+from .suggest import invalidate_suggest_index
+from .category_tree import invalidate_category_product_counts
+from .category_closure import invalidate_category_closure
+from .changes import schedule_bump_changes
+from .derivatives import derivatives_generated
+from .lookups import invalidate_slugs
+
+
+def _schedule_similar_refresh(product_id):
+    if not similar_products.is_precomputed() or product_id is None:
+        return
+    transaction.on_commit(lambda: similar_products.refresh_similar_products_for_change(product_id))
+
+
+def _schedule_summary_refresh(product_id):
+    # بعد از commit اجرا می‌شود تا حذف cascade محصول با upsert خلاصه تداخل نکند
+    transaction.on_commit(lambda: refresh_product_summaries([product_id]))
+
+
+def _schedule_search_refresh(product_ids):
+    product_ids = list(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: refresh_search_documents(product_ids))
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    if created:
+        _schedule_summary_refresh(instance.pk)
+    _schedule_similar_refresh(instance.pk)
+    _schedule_search_refresh([instance.pk])
+
+
+@receiver(post_save, sender=ProductOption)
+@receiver(post_delete, sender=ProductOption)
+def product_option_changed(sender, instance, **kwargs):
+    _schedule_summary_refresh(instance.product_id)
+    _schedule_similar_refresh(instance.product_id)
+
+
+def _through_column(through, model):
+    """ستون جدول واسط many-to-many که به model اشاره می‌کند (مثل product_id یا category_id)"""
+    for field in through._meta.concrete_fields:
+        if field.is_relation and field.related_model is model:
+            return field.attname
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+@receiver(m2m_changed, sender=Product.tags.through)
+def product_relations_clearing(sender, instance, action, model, **kwargs):
+    # در post_clear مقدار pk_set برابر None است؛ آیدی‌های طرف دیگر رابطه قبل از حذف نگه داشته می‌شوند
+    if action != 'pre_clear':
+        return
+    cleared = getattr(instance, '_cleared_relation_pks', {})
+    cleared[sender] = set(
+        sender.objects.filter(**{_through_column(sender, type(instance)): instance.pk})
+        .values_list(_through_column(sender, model), flat=True)
+    )
+    instance._cleared_relation_pks = cleared
+
+
+def _changed_pks(sender, instance, action, pk_set):
+    """آیدی‌های طرف دیگر رابطه که در این تغییر m2m اضافه، حذف یا پاک شده‌اند"""
+    if action == 'post_clear':
+        return getattr(instance, '_cleared_relation_pks', {}).get(sender, set())
+    return pk_set or ()
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def product_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    invalidate_category_facets()
+    transaction.on_commit(invalidate_category_product_counts)
+    if reverse:
+        product_ids = _changed_pks(sender, instance, action, pk_set)
+        for product_id in product_ids:
+            _schedule_similar_refresh(product_id)
+        _schedule_search_refresh(product_ids)
+    else:
+        _schedule_similar_refresh(instance.pk)
+        _schedule_search_refresh([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+@receiver(post_save, sender=Specification)
+@receiver(post_delete, sender=Specification)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalog_facets_changed(sender, **kwargs):
+    invalidate_category_facets()
+
+
+@receiver(m2m_changed, sender=Specification.categories.through)
+def specification_categories_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_category_facets()
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def product_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    _schedule_search_refresh(_changed_pks(sender, instance, action, pk_set) if reverse else [instance.pk])
+
+
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+def product_specification_changed(sender, instance, **kwargs):
+    _schedule_search_refresh([instance.product_id])
+
+
+@receiver(post_save, sender=Brand)
+def brand_saved(sender, instance, created, **kwargs):
+    if not created:
+        _schedule_search_refresh(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    if not created:
+        _schedule_search_refresh(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        _schedule_search_refresh(instance.products.values_list('id', flat=True))
+
+
+@receiver(pre_save, sender=Specification)
+def specification_saving(sender, instance, raw=False, **kwargs):
+    # data_type ذخیره شده قبلی؛ مقادیر فقط با تغییر آن دوباره پارس می‌شوند
+    instance._stored_data_type = None
+    if instance.pk is not None and not raw:
+        instance._stored_data_type = (
+            Specification.objects.filter(pk=instance.pk).values_list('data_type', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Specification)
+def specification_saved(sender, instance, created, **kwargs):
+    if not created:
+        _schedule_search_refresh(instance.values.values_list('product_id', flat=True))
+        stored_data_type = getattr(instance, '_stored_data_type', None)
+        if stored_data_type is not None and stored_data_type != instance.data_type:
+            transaction.on_commit(lambda: _refresh_typed_values(instance))
+
+
+def _refresh_typed_values(specification):
+    ProductSpecification.refresh_typed_values(specification.values.all())
+    # facetهایی که بین تغییر data_type و پارس دوباره با مقادیر قدیمی ساخته شده‌اند کنار گذاشته می‌شوند
+    invalidate_category_facets()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def suggest_entries_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_suggest_index)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_product_counts_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_category_product_counts)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_closure_changed(sender, **kwargs):
+    # جابجایی در درخت MPTT بازه بقیه نودها را هم تغییر می‌دهد؛ یک بار فوراً برای
+    # همین تراکنش و یک بار بعد از commit برای پروسه‌هایی که در این فاصله نقشه را ساخته‌اند
+    invalidate_category_closure()
+    transaction.on_commit(invalidate_category_closure)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def slug_map_changed(sender, **kwargs):
+    # مثل نقشه دسته‌بندی‌ها: فوراً و دوباره بعد از commit
+    invalidate_slugs(sender)
+    transaction.on_commit(lambda: invalidate_slugs(sender))
+
+
+# --- شمارنده‌های تغییر برای ETag (store.changes) ---
+
+def _gallery_product_id(gallery):
+    return ProductOption.objects.filter(pk=gallery.product_id).values_list('product_id', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Color)
+@receiver(post_delete, sender=Color)
+@receiver(post_save, sender=Warranty)
+@receiver(post_delete, sender=Warranty)
+@receiver(post_save, sender=Specification)
+@receiver(post_delete, sender=Specification)
+@receiver(post_save, sender=SpecificationGroup)
+@receiver(post_delete, sender=SpecificationGroup)
+@receiver(post_save, sender=SpecificationValue)
+@receiver(post_delete, sender=SpecificationValue)
+def catalog_object_changed(sender, instance, **kwargs):
+    schedule_bump_changes(sender, [instance.pk])
+
+
+@receiver(post_save, sender=ProductOption)
+@receiver(post_delete, sender=ProductOption)
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+def product_part_changed(sender, instance, **kwargs):
+    schedule_bump_changes(sender, [instance.pk])
+    schedule_bump_changes(Product, [instance.product_id])
+
+
+@receiver(post_save, sender=Gallery)
+@receiver(post_delete, sender=Gallery)
+def gallery_changed(sender, instance, **kwargs):
+    schedule_bump_changes(Gallery, [instance.pk])
+    schedule_bump_changes(ProductOption, [instance.product_id])
+    schedule_bump_changes(Product, [_gallery_product_id(instance)])
+
+
+@receiver(derivatives_generated)
+def image_derivatives_generated(sender, instance, **kwargs):
+    # نسخه‌ها با update() ثبت می‌شوند و post_save ارسال نمی‌شود
+    if sender is Gallery:
+        gallery_changed(sender, instance)
+    else:
+        catalog_object_changed(sender, instance)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+@receiver(m2m_changed, sender=Product.tags.through)
+def product_relations_changed_for_etag(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    pks = _changed_pks(sender, instance, action, pk_set)
+    if reverse:
+        schedule_bump_changes(Product, pks)
+        schedule_bump_changes(instance._meta.model, [instance.pk])
+    else:
+        schedule_bump_changes(Product, [instance.pk])
+        schedule_bump_changes(model, pks)
+
+
+@receiver(m2m_changed, sender=Specification.categories.through)
+def specification_categories_changed_for_etag(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        schedule_bump_changes(Specification, [])
+        schedule_bump_changes(Category, [])
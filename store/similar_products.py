@@ -0,0 +1,192 @@
+"""
+موتور محصولات مشابه.
+
+برای یک صفحه کامل از محصولات، کاندیدها با چند کوئری مجموعه‌ای محاسبه می‌شوند
+(به جای یک aggregate و یک کوئری distinct برای هر محصول)، بر اساس اشتراک دسته‌بندی
+و فاصله قیمت رتبه‌بندی شده و به top-K محدود می‌شوند.
+
+اگر ``STORE_SIMILAR_PRODUCTS_PRECOMPUTED`` فعال باشد، نتایج از جدول
+``SimilarProduct`` خوانده می‌شوند که با سیگنال‌ها بروزرسانی می‌شود. برای محصولی
+که مشابهی ندارد یک ردیف نشانه (``similar_id == product_id``) ذخیره می‌شود تا
+نتیجه خالی در هر درخواست دوباره محاسبه نشود.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, Q
+
+from .changes import schedule_bump_changes
+from .models import Product, ProductOption, ProductSummary, SimilarProduct
+
+DEFAULT_LIMIT = 8
+# محدوده قیمت مجاز نسبت به کمترین قیمت نهایی محصول مبدا (±۳۰٪)
+PRICE_TOLERANCE = 0.3
+CATEGORY_WEIGHT = 0.7
+PRICE_WEIGHT = 0.3
+
+
+def get_limit():
+    return getattr(settings, 'STORE_SIMILAR_PRODUCTS_LIMIT', DEFAULT_LIMIT)
+
+
+def is_precomputed():
+    return getattr(settings, 'STORE_SIMILAR_PRODUCTS_PRECOMPUTED', False)
+
+
+def compute_similar_product_ids(product_ids, limit=None):
+    """
+    محصولات مشابه را برای مجموعه‌ای از محصولات محاسبه می‌کند.
+    خروجی: ``{product_id: [(similar_id, score), ...]}`` مرتب بر اساس امتیاز.
+    """
+    limit = limit or get_limit()
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    through = Product.categories.through
+
+    source_categories = defaultdict(set)
+    for product_id, category_id in through.objects.filter(
+        product_id__in=product_ids
+    ).values_list('product_id', 'category_id'):
+        source_categories[product_id].add(category_id)
+
+    source_prices = dict(
+        ProductSummary.objects.filter(product_id__in=product_ids)
+        .values_list('product_id', 'min_final_price')
+    )
+    sources = {
+        product_id: price for product_id, price in source_prices.items()
+        if price is not None and source_categories.get(product_id)
+    }
+    if not sources:
+        return {product_id: [] for product_id in product_ids}
+
+    # هر محصول مبدا فقط دسته‌بندی‌ها و بازه قیمت خودش را می‌خواند (نه اجتماع بازه‌های
+    # همه محصولات صفحه که برای یک محصول ارزان و یک محصول گران تقریباً کل دسته‌بندی است)
+    windows = Q()
+    for product_id, price in sources.items():
+        windows |= Q(
+            category_id__in=source_categories[product_id],
+            product__summary__min_final_price__gte=int(price * (1 - PRICE_TOLERANCE)),
+            product__summary__min_final_price__lte=int(price * (1 + PRICE_TOLERANCE)),
+        )
+
+    candidate_categories = defaultdict(set)
+    candidate_prices = {}
+    rows = (
+        through.objects.filter(windows, product__is_active=True)
+        .values_list('product_id', 'category_id', 'product__summary__min_final_price')
+    )
+    for candidate_id, category_id, price in rows:
+        candidate_categories[candidate_id].add(category_id)
+        candidate_prices[candidate_id] = price
+
+    result = {}
+    for product_id in product_ids:
+        price = sources.get(product_id)
+        if price is None:
+            result[product_id] = []
+            continue
+        categories = source_categories[product_id]
+        window = price * PRICE_TOLERANCE or 1
+        scored = []
+        for candidate_id, shared in candidate_categories.items():
+            if candidate_id == product_id:
+                continue
+            overlap = len(shared & categories)
+            if not overlap:
+                continue
+            distance = abs(candidate_prices[candidate_id] - price)
+            if distance > window:
+                continue
+            score = CATEGORY_WEIGHT * overlap / len(categories) + PRICE_WEIGHT * (1 - distance / window)
+            scored.append((candidate_id, round(score, 4)))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        result[product_id] = scored[:limit]
+    return result
+
+
+def _read_precomputed(product_ids):
+    result = defaultdict(list)
+    for product_id, similar_id, score in SimilarProduct.objects.filter(
+        product_id__in=product_ids
+    ).order_by('product_id', 'rank').values_list('product_id', 'similar_id', 'score'):
+        items = result[product_id]
+        if similar_id != product_id:
+            items.append((similar_id, score))
+    return result
+
+
+def get_similar_products(products, limit=None):
+    """
+    ``{product_id: [Product, ...]}`` برای یک صفحه از محصولات.
+    محصولات مشابه با یک کوئری (و prefetch گزینه‌ها) بارگذاری می‌شوند.
+    """
+    product_ids = [product.pk for product in products]
+    if not product_ids:
+        return {}
+    ranked = {}
+    if is_precomputed():
+        ranked = _read_precomputed(product_ids)
+    missing = [product_id for product_id in product_ids if product_id not in ranked]
+    if missing:
+        ranked.update(compute_similar_product_ids(missing, limit))
+
+    similar_ids = {similar_id for items in ranked.values() for similar_id, _ in items}
+    similar_products = {}
+    if similar_ids:
+        similar_products = Product.objects.filter(id__in=similar_ids, is_active=True).select_related(
+            'brand', 'summary'
+        ).prefetch_related(
+            Prefetch('options', queryset=ProductOption.objects.with_final_price().select_related('color')),
+            'options__gallery',
+        ).in_bulk()
+
+    return {
+        product_id: [
+            similar_products[similar_id]
+            for similar_id, _ in ranked.get(product_id, [])
+            if similar_id in similar_products
+        ]
+        for product_id in product_ids
+    }
+
+
+def refresh_similar_products(product_ids, limit=None):
+    """جدول SimilarProduct را برای محصولات داده شده بازسازی می‌کند."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return 0
+    ranked = compute_similar_product_ids(product_ids, limit)
+    entries = [
+        SimilarProduct(product_id=product_id, similar_id=similar_id, score=score, rank=rank)
+        for product_id, items in ranked.items()
+        for rank, (similar_id, score) in enumerate(items)
+    ]
+    # ردیف نشانه برای محصولات بدون مشابه
+    entries += [
+        SimilarProduct(product_id=product_id, similar_id=product_id, score=0, rank=0)
+        for product_id, items in ranked.items() if not items
+    ]
+    with transaction.atomic():
+        SimilarProduct.objects.filter(product_id__in=product_ids).delete()
+        SimilarProduct.objects.bulk_create(entries)
+        schedule_bump_changes(SimilarProduct, product_ids)
+    return sum(entry.similar_id != entry.product_id for entry in entries)
+
+
+def refresh_similar_products_for_change(product_id):
+    """
+    بعد از تغییر یک محصول، لیست خود آن و لیست محصولاتی که آن را به عنوان
+    مشابه دارند بازسازی می‌شود.
+    """
+    affected = set(
+        SimilarProduct.objects.filter(similar_id=product_id).values_list('product_id', flat=True)
+    )
+    affected.add(product_id)
+    # محصولاتی که اکنون مشابه این محصول هستند هم احتمالاً باید آن را در لیست خود داشته باشند
+    affected.update(
+        similar_id for similar_id, _ in compute_similar_product_ids([product_id]).get(product_id, [])
+    )
+    return refresh_similar_products(affected)
@@ -0,0 +1,122 @@
+"""
+ایندکس پیشوندی در حافظه برای autocomplete جعبه جستجو.
+
+عنوان محصولات فعال (title و title_farsi)، برندها، دسته‌بندی‌ها و تگ‌ها به صورت
+یک آرایه مرتب از کلیدهای نرمال شده نگهداری می‌شوند و جستجو با bisect انجام می‌شود.
+هر عبارت از ابتدای هر کلمه‌اش هم ایندکس می‌شود تا «گلکسی» عنوان «گوشی سامسونگ
+گلکسی» را پیدا کند.
+
+ایندکس در اولین درخواست هر پروسه ساخته می‌شود و با بالا رفتن نسخه ``suggest``
+در کش (سیگنال‌های تغییر) دوباره ساخته می‌شود.
+"""
+import threading
+from bisect import bisect_left
+
+from .cache import bump_version, get_version
+from .models import Brand, Category, Product, Tag
+from .text import ZWNJ, normalize_persian
+
+SUGGEST_NAMESPACE = 'suggest'
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 20
+# حداکثر تعداد کلیدهای بررسی شده برای پیشوندهای خیلی کوتاه
+MAX_SCAN = 5000
+# ترتیب نمایش انواع نتایج
+KIND_PRIORITY = {'category': 0, 'brand': 1, 'product': 2, 'tag': 3}
+
+
+class PrefixIndex:
+    def __init__(self, entries):
+        """entries: لیست دیکشنری‌های ``{'type', 'id', 'title', 'slug'}``"""
+        self.entries = entries
+        pairs = set()
+        for position, entry in enumerate(entries):
+            for phrase in self._phrases(entry['title']):
+                words = phrase.split()
+                for start in range(len(words)):
+                    pairs.add((' '.join(words[start:]), start > 0, position))
+        pairs = sorted(pairs)
+        self.keys = [key for key, _, _ in pairs]
+        self.refs = [(mid_word, position) for _, mid_word, position in pairs]
+
+    @staticmethod
+    def _phrases(title):
+        phrases = [normalize_persian(title)]
+        # شکل چسبیده کلمات نیم‌فاصله‌دار، مثل search_variants
+        if ZWNJ in (title or ''):
+            phrases.append(normalize_persian(title, zwnj=''))
+        return phrases
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, text, limit=DEFAULT_LIMIT):
+        prefix = normalize_persian(text)
+        if not prefix:
+            return []
+        matches = {}
+        index = bisect_left(self.keys, prefix)
+        end = min(len(self.keys), index + MAX_SCAN)
+        while index < end and self.keys[index].startswith(prefix):
+            mid_word, position = self.refs[index]
+            # تطبیق از ابتدای عنوان به تطبیق از وسط عنوان ترجیح دارد
+            if position not in matches or not mid_word:
+                matches[position] = mid_word
+            index += 1
+        ranked = sorted(
+            matches.items(),
+            key=lambda item: (
+                KIND_PRIORITY[self.entries[item[0]]['type']],
+                item[1],
+                len(self.entries[item[0]]['title']),
+                item[0],
+            ),
+        )
+        # محصولی که هر دو عنوانش (title و title_farsi) تطبیق دارد یک بار و با بهترین رتبه می‌آید
+        results, seen = [], set()
+        for position, _ in ranked:
+            entry = self.entries[position]
+            if (entry['type'], entry['id']) in seen:
+                continue
+            seen.add((entry['type'], entry['id']))
+            results.append(entry)
+            if len(results) >= limit:
+                break
+        return results
+
+
+def build_entries():
+    entries = []
+    for category in Category.objects.values('id', 'name', 'slug'):
+        entries.append({'type': 'category', 'id': category['id'], 'title': category['name'], 'slug': category['slug']})
+    for brand in Brand.objects.values('id', 'name', 'slug'):
+        entries.append({'type': 'brand', 'id': brand['id'], 'title': brand['name'], 'slug': brand['slug']})
+    for product in Product.objects.filter(is_active=True).values('id', 'title', 'title_farsi', 'slug'):
+        for title in {product['title'], product['title_farsi']} - {None, ''}:
+            entries.append({'type': 'product', 'id': product['id'], 'title': title, 'slug': product['slug']})
+    for tag in Tag.objects.values('id', 'name', 'slug'):
+        entries.append({'type': 'tag', 'id': tag['id'], 'title': tag['name'], 'slug': tag['slug']})
+    return entries
+
+
+_lock = threading.Lock()
+_state = {'version': None, 'index': None}
+
+
+def get_index():
+    version = get_version(SUGGEST_NAMESPACE)
+    if _state['version'] != version:
+        with _lock:
+            if _state['version'] != version:
+                _state['index'] = PrefixIndex(build_entries())
+                _state['version'] = version
+    return _state['index']
+
+
+def invalidate_suggest_index():
+    bump_version(SUGGEST_NAMESPACE)
+
+
+def suggest(text, limit=DEFAULT_LIMIT):
+    limit = max(1, min(limit, MAX_LIMIT))
+    return get_index().search(text, limit)
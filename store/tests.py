@@ -20,7 +20,7 @@ class CategorySpecValueFilterTest(APITestCase):
         self.ps = ProductSpecification.objects.create(product=self.product, specification=self.spec, int_value=8)
 
     def test_category_filter_by_spec_value(self):
-        url = reverse('category-list') + f'?spec_value={self.spec.id}:{self.ps.id}'
+        url = reverse('category-list') + f'?spec_value={self.spec.id}:{self.ps.canonical_value_id}'
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         # باید دسته‌بندی ما در خروجی باشد
@@ -29,6 +29,16 @@ class CategorySpecValueFilterTest(APITestCase):
 
 
 class ProductImageS3Test(APITestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
     def test_product_image_upload_and_s3_url(self):
         # ساخت یک عکس تستی
         image = SimpleUploadedFile("test.jpg", b"file_content", content_type="image/jpeg")
@@ -39,3 +49,1358 @@ class ProductImageS3Test(APITestCase):
         # همچنین می‌توان بررسی کرد که مسیر شامل نام باکت باشد
         from django.conf import settings
         self.assertIn(settings.ARVAN_BUCKET, product.image.url)
+
+
+class CatalogPaginationTest(APITestCase):
+    def setUp(self):
+        self.products = [Product.objects.create(title=f"محصول {i}") for i in range(5)]
+
+    def test_page_size_is_capped(self):
+        response = self.client.get(reverse('product-list') + '?page_size=1000000')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 5)
+        from store.pagination import StandardResultsSetPagination
+        self.assertEqual(StandardResultsSetPagination.max_page_size, 100)
+
+    def test_page_without_count(self):
+        response = self.client.get(reverse('product-list') + '?page_size=2&count=false')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['count'])
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        last = self.client.get(reverse('product-list') + '?page_size=2&count=false&page=3')
+        self.assertEqual(len(last.data['results']), 1)
+        self.assertIsNone(last.data['next'])
+
+    def test_cursor_pagination_walks_all_products_once(self):
+        url = reverse('product-list') + '?pagination=cursor&page_size=2'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, sorted((p.id for p in self.products), reverse=True))
+
+    def _walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_cursor_pagination_with_explicit_ordering(self):
+        seen = self._walk(reverse('product-list') + '?pagination=cursor&page_size=2&ordering=id')
+        self.assertEqual(seen, sorted(p.id for p in self.products))
+
+    def test_cursor_pagination_rejects_orderings_without_a_cursor_position(self):
+        for ordering in ('summary__has_active_discount', 'summary__min_final_price', 'is_active'):
+            response = self.client.get(reverse('product-list'), {'pagination': 'cursor', 'ordering': ordering})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(ordering, str(response.data['ordering']))
+            self.assertNotIn('attribute', str(response.data))
+        # صفحه‌بندی عددی همچنان همه ترتیب‌ها را می‌پذیرد
+        response = self.client.get(reverse('product-list'), {'ordering': 'summary__min_final_price'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_option_cursor_pages_skip_boolean_default_ordering(self):
+        from store.models import ProductOption
+        prices = [3000, 1000, 1000, 2000, 1000, 1000, 5000]
+        options = [ProductOption.objects.create(product=self.products[0], option_price=price) for price in prices]
+        seen = self._walk(reverse('productoption-list') + '?pagination=cursor&page_size=2')
+        self.assertEqual(sorted(seen), sorted(o.id for o in options))
+        by_id = {o.id: o.option_price for o in options}
+        self.assertEqual([by_id[pk] for pk in seen], sorted(prices))
+
+        seen = self._walk(reverse('productoption-list') + '?pagination=cursor&page_size=3&ordering=-final_price')
+        self.assertEqual([by_id[pk] for pk in seen], sorted(prices, reverse=True))
+        self.assertEqual(len(set(seen)), len(options))
+
+
+class SimilarProductsTest(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="موبایل")
+        self.other_category = Category.objects.create(name="لپ تاپ")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.base = self._product("پایه", 1000, [self.category, self.other_category])
+            self.close = self._product("نزدیک", 1050, [self.category, self.other_category])
+            self.far = self._product("دورتر", 1250, [self.category])
+            self.expensive = self._product("گران", 5000, [self.category])
+            self.unrelated = self._product("بی‌ربط", 1000, [])
+
+    def _product(self, title, price, categories):
+        from store.models import ProductOption
+        product = Product.objects.create(title=title)
+        product.categories.set(categories)
+        ProductOption.objects.create(product=product, option_price=price)
+        return product
+
+    def test_ranked_by_category_overlap_and_price(self):
+        from store.similar_products import compute_similar_product_ids
+        ranked = compute_similar_product_ids([self.base.id, self.expensive.id])
+        self.assertEqual([pid for pid, _ in ranked[self.base.id]], [self.close.id, self.far.id])
+        self.assertEqual(ranked[self.expensive.id], [])
+        limited = compute_similar_product_ids([self.base.id], limit=1)
+        self.assertEqual([pid for pid, _ in limited[self.base.id]], [self.close.id])
+
+    def test_candidates_are_read_per_source_window(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from store.similar_products import compute_similar_product_ids
+        with self.captureOnCommitCallbacks(execute=True):
+            between = self._product("میانه", 3000, [self.category])
+        with CaptureQueriesContext(connection) as queries:
+            compute_similar_product_ids([self.base.id, self.expensive.id])
+        with connection.cursor() as cursor:
+            cursor.execute(queries.captured_queries[-1]['sql'])
+            loaded = {row[0] for row in cursor.fetchall()}
+        self.assertIn(self.close.id, loaded)
+        self.assertNotIn(between.id, loaded)
+
+    def test_precomputed_table_is_used(self):
+        from django.test import override_settings
+        from store.models import SimilarProduct
+        from store.similar_products import refresh_similar_products, get_similar_products
+        refresh_similar_products([self.base.id])
+        self.assertEqual(
+            list(SimilarProduct.objects.filter(product=self.base).values_list('similar_id', flat=True)),
+            [self.close.id, self.far.id],
+        )
+        with override_settings(STORE_SIMILAR_PRODUCTS_PRECOMPUTED=True):
+            similar = get_similar_products([self.base])
+        self.assertEqual([p.id for p in similar[self.base.id]], [self.close.id, self.far.id])
+
+    def test_precomputed_empty_result_is_not_recomputed(self):
+        from unittest import mock
+        from django.test import override_settings
+        from store import similar_products
+        self.assertEqual(similar_products.refresh_similar_products([self.expensive.id]), 0)
+        with override_settings(STORE_SIMILAR_PRODUCTS_PRECOMPUTED=True), mock.patch.object(
+            similar_products, 'compute_similar_product_ids', side_effect=AssertionError('recomputed'),
+        ):
+            self.assertEqual(similar_products.get_similar_products([self.expensive]), {self.expensive.id: []})
+
+    def test_product_list_embeds_similar_products(self):
+        response = self.client.get(reverse('product-detail', args=[self.base.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['similar_products']], [self.close.id, self.far.id])
+        self.assertEqual(response.data['similar_products'][0]['min_price'], 1050)
+
+
+class ProductSummaryTest(APITestCase):
+    def setUp(self):
+        from store.models import ProductOption
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(title="گوشی")
+            self.cheap = ProductOption.objects.create(
+                product=self.product, option_price=1000, quantity=2,
+                is_active_discount=True, discount=10,
+            )
+            self.expensive = ProductOption.objects.create(product=self.product, option_price=3000, quantity=0)
+            self.empty = Product.objects.create(title="بدون موجودی")
+
+    def test_summary_is_maintained_on_option_changes(self):
+        summary = Product.objects.get(pk=self.product.pk).summary
+        self.assertEqual(summary.min_final_price, 900)
+        self.assertEqual(summary.max_final_price, 3000)
+        self.assertEqual(summary.total_quantity, 2)
+        self.assertTrue(summary.has_active_discount)
+        self.assertEqual(summary.cheapest_option_id, self.cheap.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cheap.delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.min_final_price, 3000)
+        self.assertEqual(summary.total_quantity, 0)
+        self.assertFalse(summary.has_active_discount)
+        self.assertEqual(summary.cheapest_option_id, self.expensive.id)
+
+    def test_filters_use_summary(self):
+        url = reverse('product-list')
+        ids = [item['id'] for item in self.client.get(url + '?in_stock=true').data['results']]
+        self.assertEqual(ids, [self.product.id])
+        ids = [item['id'] for item in self.client.get(url + '?in_stock=false').data['results']]
+        self.assertEqual(ids, [self.empty.id])
+        ids = [item['id'] for item in self.client.get(url + '?has_discount=true').data['results']]
+        self.assertEqual(ids, [self.product.id])
+        ids = [item['id'] for item in self.client.get(url + '?price_range_min=500&price_range_max=950').data['results']]
+        self.assertEqual(ids, [self.product.id])
+
+    def test_ordering_uses_summary_fields(self):
+        url = reverse('product-list')
+        ids = [item['id'] for item in self.client.get(url, {'ordering': '-summary__has_active_discount'}).data['results']]
+        self.assertEqual(ids, [self.product.id, self.empty.id])
+        # ترتیب روی options پذیرفته نمی‌شود و محصول دو ویژگی‌ای تکرار نمی‌شود
+        ids = [item['id'] for item in self.client.get(url, {'ordering': 'options__option_price'}).data['results']]
+        self.assertEqual(sorted(ids), sorted([self.product.id, self.empty.id]))
+
+    def test_sweep_refreshes_expired_discount_windows(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from store.models import ProductOption, ProductSummary
+        now = timezone.now()
+        ProductOption.objects.filter(pk=self.cheap.pk).update(
+            discount_start_date=now - timedelta(days=2), discount_end_date=now - timedelta(minutes=1),
+        )
+        ProductSummary.objects.filter(pk=self.product.pk).update(refreshed_at=now - timedelta(days=1))
+        call_command('sweep_discount_windows', stdout=StringIO())
+        summary = ProductSummary.objects.get(pk=self.product.pk)
+        self.assertFalse(summary.has_active_discount)
+        self.assertEqual(summary.min_final_price, 1000)
+
+
+class DiscountMaterializationTest(APITestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from store.models import ProductOption
+        now = timezone.now()
+        self.product = Product.objects.create(title="تخفیف")
+        self.running = ProductOption.objects.create(
+            product=self.product, option_price=2900, is_active_discount=True, discount=29,
+        )
+        self.expired = ProductOption.objects.create(
+            product=self.product, option_price=1000, is_active_discount=True, discount=50,
+            discount_start_date=now - timedelta(days=2), discount_end_date=now - timedelta(days=1),
+        )
+        self.plain = ProductOption.objects.create(product=self.product, option_price=2500)
+
+    def test_sql_final_price_matches_python(self):
+        from store.models import ProductOption
+        for option in ProductOption.objects.with_final_price():
+            fresh = ProductOption.objects.get(pk=option.pk)
+            self.assertEqual(option.final_price, fresh.get_final_price())
+            self.assertEqual(option.discount_is_active, fresh.is_discount_active)
+            self.assertEqual(option.effective_price, option.final_price)
+
+    def test_options_can_be_ordered_by_final_price(self):
+        response = self.client.get(reverse('productoption-list') + '?ordering=final_price')
+        ids = [item['id'] for item in response.data['results']]
+        self.assertEqual(ids, [self.expired.id, self.running.id, self.plain.id])
+        self.assertEqual(response.data['results'][1]['final_price'], 2059)
+
+    def test_product_options_read_the_sql_final_price(self):
+        from unittest import mock
+        from store.models import ProductOption
+        with mock.patch.object(ProductOption, 'get_final_price', side_effect=AssertionError('computed in python')):
+            response = self.client.get(reverse('product-detail', args=[self.product.id]))
+        self.assertEqual(response.status_code, 200)
+        prices = {item['id']: item['final_price'] for item in response.data['options']}
+        self.assertEqual(prices, {self.running.id: 2059, self.expired.id: 1000, self.plain.id: 2500})
+
+    def test_patch_response_uses_the_new_price(self):
+        url = reverse('productoption-detail', args=[self.plain.id])
+        response = self.client.patch(url, {'option_price': 5000}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['option_price'], response.data['final_price']), (5000, 5000))
+        response = self.client.patch(reverse('productoption-detail', args=[self.running.id]), {'discount': 10}, format='json')
+        self.assertEqual(response.data['final_price'], 2610)
+
+    def test_sweep_flips_effective_price_when_window_ends(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from store.models import ProductOption
+        now = timezone.now()
+        ProductOption.objects.filter(pk=self.running.pk).update(
+            discount_start_date=now - timedelta(days=3), discount_end_date=now - timedelta(seconds=1),
+        )
+        self.assertEqual(list(ProductOption.objects.stale_effective_price().values_list('id', flat=True)), [self.running.id])
+        call_command('sweep_discount_windows', stdout=StringIO())
+        self.running.refresh_from_db()
+        self.assertEqual(self.running.effective_price, 2900)
+        self.assertFalse(ProductOption.objects.stale_effective_price().exists())
+
+
+class CategoryFacetIndexTest(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.root = Category.objects.create(name="کامپیوتر")
+        self.child = Category.objects.create(name="لپ تاپ", parent=self.root)
+        self.spec = Specification.objects.create(name="RAM", data_type="int")
+        self.spec.categories.add(self.root)
+        for title, value, category in [("الف", "8GB", self.root), ("ب", "8GB", self.child), ("ج", "16GB", self.child)]:
+            product = Product.objects.create(title=title)
+            product.categories.add(category)
+            ProductSpecification.objects.create(product=product, specification=self.spec, specification_value=value)
+
+    def test_facets_cover_descendants_with_counts(self):
+        from store.facets import get_category_facets
+        facets = get_category_facets(self.root)
+        self.assertEqual(len(facets), 1)
+        self.assertEqual(facets[0]['id'], self.spec.id)
+        self.assertEqual(
+            [(v['value'], v['count']) for v in facets[0]['value']],
+            [("16GB", 1), ("8GB", 2)],
+        )
+
+    def test_cached_until_specification_values_change(self):
+        from store.facets import get_category_facets
+        get_category_facets(self.root.id)
+        with self.assertNumQueries(0):
+            get_category_facets(self.root.id)
+        product = Product.objects.create(title="د")
+        product.categories.add(self.child)
+        ProductSpecification.objects.create(product=product, specification=self.spec, specification_value="32GB")
+        values = [v['value'] for v in get_category_facets(self.root.id)[0]['value']]
+        self.assertIn("32GB", values)
+
+    def test_inactive_products_are_not_counted(self):
+        from store.facets import get_category_facets
+        get_category_facets(self.root.id)
+        product = Product.objects.get(title="ج")
+        product.is_active = False
+        product.save()
+        facets = get_category_facets(self.root.id)
+        self.assertEqual([(v['value'], v['count']) for v in facets[0]['value']], [("8GB", 2)])
+
+    def test_specifications_endpoint(self):
+        response = self.client.get(reverse('category-specifications', args=[self.root.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['specifications'][0]['value']), 2)
+        response = self.client.get(reverse('category-filter-metadata', args=[self.root.id]))
+        self.assertEqual(response.data['spec_value_choices'][0]['name'], "RAM")
+
+
+class ProductFacetedSearchTest(APITestCase):
+    def setUp(self):
+        from store.models import Brand, Color, ProductOption
+        self.apple = Brand.objects.create(name="اپل")
+        self.samsung = Brand.objects.create(name="سامسونگ")
+        self.black = Color.objects.create(name="مشکی", hex_code="#000000")
+        self.white = Color.objects.create(name="سفید", hex_code="#FFFFFF")
+        with self.captureOnCommitCallbacks(execute=True):
+            for title, brand, color, price in [
+                ("آیفون", self.apple, self.black, 40_000_000),
+                ("آیپد", self.apple, self.white, 30_000_000),
+                ("گلکسی", self.samsung, self.black, 8_000_000),
+            ]:
+                product = Product.objects.create(title=title, brand=brand)
+                ProductOption.objects.create(product=product, color=color, option_price=price)
+
+    def _facet(self, data, name):
+        return {item['label']: item['count'] for item in data['facets'][name]}
+
+    def test_disjunctive_counts(self):
+        url = reverse('product-faceted-search')
+        response = self.client.get(url + f'?brands={self.apple.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        # facet برند فیلتر برند را نادیده می‌گیرد
+        self.assertEqual(self._facet(response.data, 'brand'), {"اپل": 2, "سامسونگ": 1})
+        # سایر facetها به فیلتر برند محدود می‌شوند
+        self.assertEqual(self._facet(response.data, 'color'), {"مشکی": 1, "سفید": 1})
+        self.assertEqual(self._facet(response.data, 'price'), {"20000000-50000000": 2})
+
+    def test_spec_counts_are_disjunctive_per_specification(self):
+        from store.models import SpecificationValue
+        ram = Specification.objects.create(name="RAM", data_type="int")
+        storage = Specification.objects.create(name="حافظه", data_type="int")
+        for title, ram_value, storage_value in [("آیفون", "8", "128"), ("آیپد", "8", "256"), ("گلکسی", "16", "256")]:
+            product = Product.objects.get(title=title)
+            ProductSpecification.objects.create(product=product, specification=ram, specification_value=ram_value)
+            ProductSpecification.objects.create(product=product, specification=storage, specification_value=storage_value)
+        eight = SpecificationValue.objects.get(specification=ram, key="8")
+        url = reverse('product-faceted-search')
+
+        def spec_counts(query):
+            response = self.client.get(url + query)
+            self.assertEqual(response.status_code, 200)
+            return {
+                (item['specification'], item['label']): item['count'] for item in response.data['facets']['spec']
+            }
+
+        expected = {(ram.id, "8"): 2, (ram.id, "16"): 1, (storage.id, "128"): 1, (storage.id, "256"): 1}
+        # مقادیر RAM انتخاب خودشان را نادیده می‌گیرند ولی حافظه به RAM=8 محدود می‌شود
+        self.assertEqual(spec_counts(f'?spec_value_ids={eight.id}'), expected)
+        self.assertEqual(spec_counts(f'?spec_by_id={ram.id}:{eight.id}'), expected)
+        self.assertEqual(spec_counts('?specification=RAM:8'), expected)
+        # با انتخاب هر دو مشخصه، هر کدام فقط با فیلتر دیگری شمرده می‌شود
+        big = SpecificationValue.objects.get(specification=storage, key="256")
+        self.assertEqual(spec_counts(f'?spec_value_ids={eight.id},{big.id}'), {
+            (ram.id, "8"): 1, (ram.id, "16"): 1, (storage.id, "128"): 1, (storage.id, "256"): 1,
+        })
+
+    def test_facets_use_single_query(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from store.facets import compute_product_facets
+        from store.filters import ProductFilter
+        from django.http import QueryDict
+        with CaptureQueriesContext(connection) as ctx:
+            compute_product_facets(ProductFilter, QueryDict(f'colors={self.black.id}'), Product.objects.all())
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class ProductSearchTest(APITestCase):
+    def setUp(self):
+        from store.models import Brand
+        with self.captureOnCommitCallbacks(execute=True):
+            brand = Brand.objects.create(name="سامسونگ")
+            self.phone = Product.objects.create(title="گوشی گلکسي ۱۴", brand=brand)
+            self.laptop = Product.objects.create(
+                title="لپ‌تاپ گیمینگ", description="<p>مناسب برای <b>گوشی</b> و بازی</p>",
+            )
+            self.other = Product.objects.create(title="کیبورد")
+
+    def _search(self, text):
+        response = self.client.get(reverse('product-list'), {'search': text})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_persian_normalization(self):
+        from store.text import normalize_persian
+        self.assertEqual(normalize_persian("كيف  ۱۲ مي‌خواهم"), "کیف 12 می خواهم")
+        self.assertEqual(self._search("گلکسی 14"), [self.phone.id])
+        self.assertEqual(self._search("لپتاپ"), [self.laptop.id])
+        self.assertEqual(self._search("لپ تاپ"), [self.laptop.id])
+        self.assertEqual(self._search("سامسو"), [self.phone.id])
+
+    def test_ranked_by_relevance_and_html_stripped(self):
+        self.assertEqual(self._search("گوشی"), [self.phone.id, self.laptop.id])
+        self.assertEqual(self._search("<b>"), [])
+
+    def test_document_updated_on_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.title = "ماوس بی‌سیم"
+            self.other.save()
+        self.assertEqual(self._search("ماوس"), [self.other.id])
+        self.assertEqual(self._search("کیبورد"), [])
+
+
+class ProductSuggestTest(APITestCase):
+    def setUp(self):
+        from store.models import Brand, Tag
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brand = Brand.objects.create(name="سامسونگ")
+            self.category = Category.objects.create(name="گوشی موبایل")
+            self.phone = Product.objects.create(title="گوشی سامسونگ گلکسي", title_farsi="Galaxy S24", brand=self.brand)
+            self.tag = Tag.objects.create(name="گیمینگ")
+
+    def _suggest(self, text, **params):
+        response = self.client.get(reverse('product-suggest'), {'q': text, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(item['type'], item['id']) for item in response.data['results']]
+
+    def test_prefix_matches_every_word_and_kind(self):
+        self.assertEqual(self._suggest("گوش"), [('category', self.category.id), ('product', self.phone.id)])
+        self.assertEqual(self._suggest("سامس"), [('brand', self.brand.id), ('product', self.phone.id)])
+        self.assertEqual(self._suggest("گلکسی"), [('product', self.phone.id)])
+        self.assertEqual(self._suggest("galaxy s2"), [('product', self.phone.id)])
+        self.assertEqual(self._suggest("گیم"), [('tag', self.tag.id)])
+        self.assertEqual(self._suggest("گوش", limit=1), [('category', self.category.id)])
+        self.assertEqual(self._suggest(""), [])
+
+    def test_product_matching_both_titles_is_listed_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            watch = Product.objects.create(title="Galaxy Watch 6", title_farsi="گلکسی واچ 6 Galaxy")
+        self.assertEqual(self._suggest("galaxy"), [('product', self.phone.id), ('product', watch.id)])
+        self.assertEqual(self._suggest("galaxy", limit=2), [('product', self.phone.id), ('product', watch.id)])
+
+    def test_index_rebuilt_after_change(self):
+        self.assertEqual(self._suggest("ماوس"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            mouse = Product.objects.create(title="ماوس بی‌سیم")
+        self.assertEqual(self._suggest("ماوس بیس"), [('product', mouse.id)])
+        with self.captureOnCommitCallbacks(execute=True):
+            mouse.delete()
+        self.assertEqual(self._suggest("ماوس"), [])
+
+
+class ProductSparseFieldsetTest(APITestCase):
+    def setUp(self):
+        from store.models import ProductOption
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(title="محصول", slug="mahsool")
+            ProductOption.objects.create(product=self.product, option_price=1000, quantity=3)
+
+    def test_list_is_lightweight_and_expandable(self):
+        url = reverse('product-list')
+        item = self.client.get(url).data['results'][0]
+        self.assertNotIn('options', item)
+        self.assertNotIn('spec_values', item)
+        self.assertEqual(item['min_price'], 1000)
+        self.assertTrue(item['in_stock'])
+
+        item = self.client.get(url, {'expand': 'options'}).data['results'][0]
+        self.assertEqual(item['options'][0]['option_price'], 1000)
+
+        item = self.client.get(url, {'fields': 'id,slug,unknown'}).data['results'][0]
+        self.assertEqual(set(item), {'id', 'slug'})
+
+    def test_detail_is_full_and_prefetch_follows_fields(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse('product-detail', args=[self.product.id])
+        self.assertIn('spec_groups', self.client.get(url).data)
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(url, {'fields': 'id,title'}).data
+        self.assertEqual(set(data), {'id', 'title'})
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class ProductSpecGroupsQueryCountTest(APITestCase):
+    def setUp(self):
+        from store.models import ProductOption, SpecificationGroup
+        self.category = Category.objects.create(name="لپ‌تاپ")
+        specs = []
+        for group_name in ["پردازنده", "حافظه"]:
+            group = SpecificationGroup.objects.create(name=group_name)
+            for spec_name in ["مدل", "ظرفیت"]:
+                spec = Specification.objects.create(name=f"{group_name} {spec_name}", group=group)
+                spec.categories.add(self.category)
+                specs.append(spec)
+        ungrouped = Specification.objects.create(name="وزن")
+        self.products = []
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(3):
+                product = Product.objects.create(title=f"لپ‌تاپ {index}")
+                product.categories.add(self.category)
+                ProductOption.objects.create(product=product, option_price=1000 + index, quantity=1)
+                for spec in specs + [ungrouped]:
+                    ProductSpecification.objects.create(product=product, specification=spec, specification_value=str(index))
+                self.products.append(product)
+
+    def test_spec_groups_built_from_prefetched_values(self):
+        response = self.client.get(reverse('product-detail', args=[self.products[0].id]))
+        groups = response.data['spec_groups']
+        self.assertEqual([group['name'] for group in groups], ["پردازنده", "حافظه"])
+        self.assertEqual(len(groups[0]['specifications']), 2)
+        self.assertEqual(groups[0]['specifications'][0]['specification']['categories'][0]['id'], self.category.id)
+
+    def test_detail_query_count(self):
+        url = reverse('product-detail', args=[self.products[0].id])
+        # محصول، دسته‌بندی‌ها، تگ‌ها، ویژگی‌ها (با رنگ)، گالری، مقادیر مشخصات (با مشخصه و گروه)،
+        # دسته‌بندی مشخصات و ۵ کوئری محصولات مشابه؛ مستقل از تعداد گروه‌ها و مشخصات
+        with self.assertNumQueries(13):
+            self.client.get(url)
+
+    def test_list_query_count(self):
+        url = reverse('product-list')
+        params = {'expand': 'options,spec_values,spec_groups'}
+        # count، صفحه، دسته‌بندی‌ها، ویژگی‌ها، گالری، مقادیر مشخصات و دسته‌بندی مشخصات؛ مستقل از تعداد محصولات
+        with self.assertNumQueries(7):
+            response = self.client.get(url, params)
+        self.assertEqual(len(response.data['results']), 3)
+
+
+class CategoryTreeTest(APITestCase):
+    def setUp(self):
+        self.digital = Category.objects.create(name="کالای دیجیتال", slug="digital")
+        self.mobile = Category.objects.create(name="موبایل", parent=self.digital)
+        self.laptop = Category.objects.create(name="لپ‌تاپ", parent=self.digital)
+        self.phone = Category.objects.create(name="گوشی", parent=self.mobile)
+        self.home = Category.objects.create(name="خانه")
+
+    def test_whole_tree_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('category-tree'))
+        data = response.data['data']
+        self.assertEqual([node['name'] for node in data], ["کالای دیجیتال", "خانه"])
+        digital = data[0]
+        self.assertEqual([node['name'] for node in digital['children']], ["لپ‌تاپ", "موبایل"])
+        self.assertEqual(digital['children'][1]['children'][0]['id'], self.phone.id)
+
+    def test_depth_and_root(self):
+        data = self.client.get(reverse('category-tree'), {'depth': 1}).data['data']
+        self.assertEqual(data[0]['children'], [])
+        self.assertTrue(data[0]['has_children'])
+        self.assertFalse(data[1]['has_children'])
+        data = self.client.get(reverse('category-tree'), {'root': 'digital', 'depth': 2}).data['data']
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]['children'][1]['children'], [])
+        self.assertEqual(self.client.get(reverse('category-tree'), {'root': 'missing'}).status_code, 404)
+
+
+class CategoryProductsTest(APITestCase):
+    def setUp(self):
+        from store.models import Brand
+        self.digital = Category.objects.create(name="دیجیتال", slug="digital")
+        self.mobile = Category.objects.create(name="موبایل", parent=self.digital)
+        self.samsung = Brand.objects.create(name="سامسونگ")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phone = Product.objects.create(title="گوشی", brand=self.samsung)
+            self.phone.categories.add(self.mobile)
+            self.tablet = Product.objects.create(title="تبلت")
+            self.tablet.categories.add(self.digital, self.mobile)
+            self.inactive = Product.objects.create(title="قدیمی", is_active=False)
+            self.inactive.categories.add(self.mobile)
+
+    def test_categories_carry_counts_not_products(self):
+        response = self.client.get(reverse('category-detail', args=[self.digital.id]))
+        self.assertNotIn('products', response.data)
+        self.assertEqual(response.data['product_count'], 2)
+        self.assertEqual(response.data['children'][0]['product_count'], 2)
+        self.assertNotIn('products', response.data['children'][0])
+
+        # همان قاعده product_count: محصولات فعال زیردرخت
+        response = self.client.get(reverse('category-detail', args=[self.digital.id]), {'expand': 'products'})
+        self.assertEqual(sorted(item['id'] for item in response.data['products']), sorted([self.phone.id, self.tablet.id]))
+        response = self.client.get(reverse('category-detail', args=[self.mobile.id]), {'expand': 'products'})
+        self.assertEqual(len(response.data['products']), response.data['product_count'])
+
+    def test_counts_invalidated_on_change(self):
+        self.client.get(reverse('category-detail', args=[self.digital.id]))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tablet.categories.remove(self.digital, self.mobile)
+        response = self.client.get(reverse('category-detail', args=[self.digital.id]))
+        self.assertEqual(response.data['product_count'], 1)
+
+    def test_products_sub_resource_uses_product_filters(self):
+        url = reverse('category-products', args=['digital'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(item['id'] for item in response.data['results']), sorted([self.phone.id, self.tablet.id]))
+        response = self.client.get(url, {'brands': self.samsung.id})
+        self.assertEqual([item['id'] for item in response.data['results']], [self.phone.id])
+        self.assertEqual(self.client.get(reverse('category-products', args=[999])).status_code, 404)
+
+
+class CategoryClosureFilterTest(APITestCase):
+    def setUp(self):
+        self.digital = Category.objects.create(name="دیجیتال", slug="digital")
+        self.mobile = Category.objects.create(name="موبایل", slug="mobile", parent=self.digital)
+        self.home = Category.objects.create(name="خانه", slug="home")
+        self.phone = Product.objects.create(title="گوشی")
+        self.phone.categories.add(self.digital, self.mobile)
+        self.lamp = Product.objects.create(title="چراغ")
+        self.lamp.categories.add(self.home)
+        self.spec = Specification.objects.create(name="RAM")
+        self.spec.categories.add(self.mobile)
+
+    def _ids(self, **params):
+        response = self.client.get(reverse('product-list'), params)
+        return [item['id'] for item in response.data['results']]
+
+    def test_descendants_without_duplicates(self):
+        self.assertEqual(self._ids(categories=self.digital.id), [self.phone.id])
+        self.assertEqual(self._ids(categories=f'{self.mobile.id},{self.home.id}'), [self.lamp.id, self.phone.id])
+        self.assertEqual(self._ids(category_title='digital'), [self.phone.id])
+        self.assertEqual(self._ids(category_title='missing'), [])
+
+    def test_ranges_resolved_from_cached_map(self):
+        from store.category_closure import resolve_category_ranges
+        resolve_category_ranges([self.digital.id])
+        with self.assertNumQueries(0):
+            ranges = resolve_category_ranges([self.digital.id, self.mobile.id], ['home'])
+        self.assertEqual(len(ranges), 2)
+
+    def test_map_invalidated_on_tree_change(self):
+        self.assertEqual(self._ids(categories=self.home.id), [self.lamp.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mobile.parent = self.home
+            self.mobile.save()
+        self.assertEqual(self._ids(categories=self.home.id), [self.lamp.id, self.phone.id])
+
+    def test_specification_filter_includes_descendants(self):
+        response = self.client.get(reverse('specification-list'), {'categories': self.digital.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['results']], [self.spec.id])
+
+
+class TypedSpecValueTest(APITestCase):
+    def setUp(self):
+        self.ram = Specification.objects.create(name="RAM", data_type="int")
+        self.screen = Specification.objects.create(name="Screen", data_type="decimal")
+        self.nfc = Specification.objects.create(name="NFC", data_type="bool")
+        self.small = Product.objects.create(title="کوچک")
+        self.big = Product.objects.create(title="بزرگ")
+        ProductSpecification.objects.create(product=self.small, specification=self.ram, specification_value="۸ گیگابایت")
+        ProductSpecification.objects.create(product=self.big, specification=self.ram, int_value=32)
+        ProductSpecification.objects.create(product=self.small, specification=self.screen, specification_value="6.5 inch")
+        ProductSpecification.objects.create(product=self.big, specification=self.nfc, specification_value="دارد")
+
+    def _ids(self, specification):
+        response = self.client.get(reverse('product-list'), {'specification': specification})
+        return [item['id'] for item in response.data['results']]
+
+    def test_values_parsed_on_save(self):
+        from decimal import Decimal
+        ram = ProductSpecification.objects.get(product=self.small, specification=self.ram)
+        self.assertEqual(ram.numeric_value, 8)
+        self.assertEqual(ram.int_value, 8)
+        self.assertEqual(ram.str_value, "8 گیگابایت")
+        self.assertEqual(ProductSpecification.objects.get(specification=self.screen).decimal_value, Decimal('6.5'))
+        self.assertTrue(ProductSpecification.objects.get(specification=self.nfc).bool_value)
+
+    def test_filters_use_typed_columns(self):
+        self.assertEqual(self._ids("RAM:8:32"), [self.big.id, self.small.id])
+        self.assertEqual(self._ids("RAM:16:"), [self.big.id])
+        self.assertEqual(self._ids("RAM:8"), [self.small.id])
+        self.assertEqual(self._ids("Screen:6:7"), [self.small.id])
+        self.assertEqual(self._ids("NFC:true"), [self.big.id])
+        self.assertEqual(self._ids("RAM:گیگ"), [self.small.id])
+
+    def test_data_type_change_refreshes_values(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.nfc.data_type = "str"
+            self.nfc.save()
+        self.assertIsNone(ProductSpecification.objects.get(specification=self.nfc).bool_value)
+
+    def test_facets_built_before_the_reparse_are_dropped(self):
+        from store.facets import get_category_facet_values
+        category = Category.objects.create(name="موبایل")
+        self.nfc.categories.add(category)
+        self.big.categories.add(category)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.nfc.data_type = "str"
+            self.nfc.save()
+            # درخواستی بین ذخیره و پارس دوباره facetها را با مقادیر قدیمی می‌سازد
+            get_category_facet_values(category)
+        value = ProductSpecification.objects.get(specification=self.nfc).canonical_value
+        self.assertEqual([item['id'] for item in get_category_facet_values(category)[self.nfc.id]], [value.id])
+
+    def test_other_changes_do_not_reparse_values(self):
+        from unittest import mock
+        with mock.patch.object(ProductSpecification, 'refresh_typed_values') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.ram.unit = "GB"
+                self.ram.save()
+            refresh.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.ram.data_type = "str"
+                self.ram.save()
+            refresh.assert_called_once()
+
+    def test_import_reports_rows_created_by_another_process(self):
+        from excel_file_handling.services import ExcelImportService
+        from store.models import SpecificationValue
+        # ردیف small/screen بعد از بررسی ردیف‌های موجود توسط پروسه دیگری ساخته شده است
+        rows = [
+            ProductSpecification(product=self.small, specification=self.screen, specification_value="7 inch"),
+            ProductSpecification(product=self.big, specification=self.screen, specification_value="6.1 inch"),
+        ]
+        for row in rows:
+            row.fill_typed_values(self.screen.data_type)
+        SpecificationValue.assign(rows)
+        self.assertEqual(ExcelImportService._create_product_specifications(rows), [False, True])
+        self.assertEqual(
+            ProductSpecification.objects.get(product=self.small, specification=self.screen).specification_value,
+            "6.5 inch",
+        )
+        self.assertEqual(ProductSpecification.objects.get(product=self.big, specification=self.screen).specification_value, "6.1 inch")
+
+    def test_import_reports_only_the_bad_rows(self):
+        import pandas as pd
+        from django.db import DataError
+        from excel_file_handling.models import ExcelFile
+        from excel_file_handling.services import ExcelImportService
+        excel_file = ExcelFile.objects.create(
+            title="مشخصات", file='excel_files/specs.xlsx', file_type='product_specifications',
+        )
+        service = ExcelImportService(excel_file.id)
+        df = pd.DataFrame([
+            {'product': self.big.title, 'specification': "Screen", 'specification_value': "x" * 300},
+            {'product': self.small.title, 'specification': "NFC", 'specification_value': "ندارد"},
+        ])
+        self.assertEqual(service.import_product_specifications(df), (1, 1))
+        self.assertFalse(ProductSpecification.objects.get(product=self.small, specification=self.nfc).bool_value)
+        self.assertFalse(ProductSpecification.objects.filter(product=self.big, specification=self.screen).exists())
+
+        # خطای دیتابیس یک ردیف در ذخیره گروهی فقط همان ردیف را خراب می‌کند
+        rows = [
+            ProductSpecification(product=self.big, specification=self.screen, specification_value="x" * 300),
+            ProductSpecification(product=self.small, specification=self.screen, specification_value="6.5 inch"),
+            ProductSpecification(product=self.small, specification=Specification.objects.create(name="Weight", data_type="int"), specification_value="180"),
+        ]
+        results = ExcelImportService._create_product_specifications(rows)
+        self.assertIsInstance(results[0], DataError)
+        self.assertEqual(results[1:], [False, True])
+        self.assertIsNone(rows[0].pk)
+        self.assertIsNotNone(rows[2].pk)
+
+
+class SpecificationValueDictionaryTest(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="موبایل")
+        self.ram = Specification.objects.create(name="RAM", data_type="int")
+        self.ram.categories.add(self.category)
+        self.color = Specification.objects.create(name="رنگ بدنه", data_type="str")
+        self.products = []
+        for title, ram, color in [("الف", "8GB", "Dark Blue"), ("ب", "۸ گیگابایت", "dark  blue"), ("ج", "16 GB", "سفيد")]:
+            product = Product.objects.create(title=title)
+            product.categories.add(self.category)
+            ProductSpecification.objects.create(product=product, specification=self.ram, specification_value=ram)
+            ProductSpecification.objects.create(product=product, specification=self.color, specification_value=color)
+            self.products.append(product)
+
+    def test_equivalent_values_share_one_id(self):
+        from store.models import SpecificationValue
+        self.assertEqual(SpecificationValue.objects.filter(specification=self.ram).count(), 2)
+        self.assertEqual(SpecificationValue.objects.filter(specification=self.color).count(), 2)
+        eight = SpecificationValue.objects.get(specification=self.ram, key="8")
+        self.assertEqual(eight.value, "8GB")
+        self.assertEqual(eight.product_values.count(), 2)
+
+    def test_filters_and_facets_use_value_ids(self):
+        from store.facets import get_category_facet_values
+        from store.models import SpecificationValue
+        eight = SpecificationValue.objects.get(specification=self.ram, key="8")
+        response = self.client.get(reverse('product-list'), {'spec_value_ids': eight.id})
+        self.assertEqual(sorted(item['id'] for item in response.data['results']), [self.products[0].id, self.products[1].id])
+        response = self.client.get(reverse('product-list'), {'spec_by_id': f'{self.ram.id}:{eight.id}'})
+        self.assertEqual(len(response.data['results']), 2)
+
+        values = get_category_facet_values(self.category)[self.ram.id]
+        self.assertEqual([(v['id'], v['count']) for v in values if v['value'] == "8GB"], [(eight.id, 2)])
+
+        response = self.client.get(reverse('product-faceted-search'))
+        spec_facet = {item['key']: item for item in response.data['facets']['spec']}
+        self.assertEqual(spec_facet[str(eight.id)]['count'], 2)
+        self.assertEqual(spec_facet[str(eight.id)]['specification'], self.ram.id)
+
+
+class ConditionalGetTest(APITestCase):
+    def setUp(self):
+        from store.models import ProductOption
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(title="محصول", slug="etag-product")
+            self.other = Product.objects.create(title="محصول دیگر", slug="etag-other")
+            self.option = ProductOption.objects.create(product=self.product, option_price=1000, quantity=3)
+
+    def test_if_none_match_returns_304_without_queries(self):
+        url = reverse('product-detail', args=[self.product.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        # پارامترهای متفاوت ETag متفاوت دارند
+        self.assertNotEqual(self.client.get(url, {'expand': 'tags'})['ETag'], etag)
+
+    def test_etag_changes_after_related_change(self):
+        detail_url = reverse('product-detail', args=[self.product.id])
+        list_url = reverse('product-list')
+        detail_etag = self.client.get(detail_url)['ETag']
+        list_etag = self.client.get(list_url)['ETag']
+        other_url = reverse('product-detail', args=[self.other.id])
+        # بدون محصولات مشابه، نمایش محصول فقط به شمارنده خودش وابسته است
+        other_params = {'fields': 'id,title,options'}
+        other_etag = self.client.get(other_url, other_params)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.option.quantity = 0
+            self.option.save()
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code, 200)
+        self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+        # تغییر یک محصول ETag نمایش محصولات دیگر را باطل نمی‌کند
+        other_response = self.client.get(other_url, other_params, HTTP_IF_NONE_MATCH=other_etag)
+        self.assertEqual(other_response.status_code, 304)
+
+    def test_spec_import_changes_etags(self):
+        import pandas as pd
+        from excel_file_handling.models import ExcelFile
+        from excel_file_handling.services import ExcelImportService
+        Specification.objects.create(name="RAM", data_type="int")
+        url = reverse('product-detail', args=[self.product.id])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        excel_file = ExcelFile.objects.create(
+            title="مشخصات", file='excel_files/specs.xlsx', file_type='product_specifications',
+        )
+        df = pd.DataFrame([{'product': self.product.title, 'specification': "RAM", 'specification_value': "8GB"}])
+        with self.captureOnCommitCallbacks(execute=True):
+            processed, errors = ExcelImportService(excel_file.id).import_product_specifications(df)
+        self.assertEqual((processed, errors), (1, 0))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_reverse_clear_changes_product_etags_and_search(self):
+        from store.models import ProductSearchDocument, Tag
+        category = Category.objects.create(name="لوازم")
+        tag = Tag.objects.create(name="ویژه")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.categories.add(category)
+            self.product.tags.add(tag)
+        self.assertIn("ویژه", ProductSearchDocument.objects.get(product=self.product).keywords_text)
+        url = reverse('product-detail', args=[self.product.id])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            category.products.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.products.clear()
+        self.assertNotIn("ویژه", ProductSearchDocument.objects.get(product=self.product).keywords_text)
+
+    def test_evicted_counters_do_not_repeat_old_versions(self):
+        from store.cache import _version_key, version_cache
+        url = reverse('product-detail', args=[self.product.id])
+        seen = {self.client.get(url)['ETag']}
+        for _ in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product.save()
+            seen.add(self.client.get(url)['ETag'])
+            # شمارنده‌ها از کش بیرون رانده می‌شوند (cull)
+            version_cache().delete_many([_version_key('changes:product'), _version_key(f'changes:product:{self.product.id}')])
+            etag = self.client.get(url)['ETag']
+            self.assertNotIn(etag, seen)
+            seen.add(etag)
+
+    def test_counters_require_a_shared_cache(self):
+        from django.test import override_settings
+        from store.cache import versions_are_shared
+        from store.checks import check_version_cache
+        self.assertTrue(versions_are_shared())
+        self.assertEqual(check_version_cache(None), [])
+        locmem = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        with override_settings(CACHES={'default': locmem, 'store-versions': locmem}):
+            self.assertFalse(versions_are_shared())
+            self.assertEqual([warning.id for warning in check_version_cache(None)], ['store.W001'])
+        # بدون کش مشترک، ETag با DummyCache هیچ‌وقت تکرار نمی‌شود
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        with override_settings(CACHES={'default': dummy, 'store-versions': dummy}, STORE_RESPONSE_CACHE=False):
+            url = reverse('product-detail', args=[self.product.id])
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since(self):
+        url = reverse('product-list')
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2001 00:00:00 GMT').status_code, 200,
+        )
+
+
+class ResponseCacheTest(APITestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(title="محصول کش", slug="cached-product")
+
+    def test_anonymous_hit_is_served_without_queries(self):
+        url = reverse('product-list')
+        first = self.client.get(url, {'page_size': 5, 'ordering': '-id'})
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {'ordering': '-id', 'page_size': 5})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second['Content-Type'], first['Content-Type'])
+
+    def test_write_purges_dependent_entries(self):
+        url = reverse('product-detail', args=[self.product.id])
+        self.assertEqual(self.client.get(url).json()['title'], "محصول کش")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.title = "عنوان جدید"
+            self.product.save()
+        self.assertEqual(self.client.get(url).json()['title'], "عنوان جدید")
+
+    def test_disabled_when_versions_are_process_local(self):
+        from django.db import connection
+        from django.test import override_settings
+        from django.test.utils import CaptureQueriesContext
+        from store import response_cache
+        self.assertTrue(response_cache.is_enabled())
+        locmem = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        with override_settings(CACHES={'default': locmem, 'store-versions': locmem}):
+            self.assertFalse(response_cache.is_enabled())
+            url = reverse('product-list')
+            first = self.client.get(url)
+            with CaptureQueriesContext(connection) as ctx:
+                second = self.client.get(url)
+            self.assertEqual(second.content, first.content)
+            self.assertGreater(len(ctx.captured_queries), 0)
+
+    def test_authenticated_requests_bypass_cache(self):
+        from django.contrib.auth import get_user_model
+        user = get_user_model().objects.create_user(username='cache-user', full_name='کاربر تست', password='x')
+        url = reverse('brand-list')
+        self.client.get(url)
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_single_flight_waits_for_builder(self):
+        from django.core.cache import cache
+        from django.test import override_settings
+        from store import response_cache
+        url = reverse('brand-list')
+        etag = self.client.get(url)['ETag']
+        key = response_cache.response_key(etag)
+        cache.delete(key)
+        # درخواست دیگری قفل ساخت پاسخ را گرفته و هنوز پاسخ را ذخیره نکرده است
+        self.assertTrue(response_cache.acquire(key))
+        with override_settings(STORE_RESPONSE_CACHE_WAIT=0.1):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        # پاسخ بدون کش داده شد و قفل سازنده اصلی دست نخورده است
+        self.assertIsNone(response_cache.get_entry(key))
+        self.assertFalse(response_cache.acquire(key))
+        response_cache.release(key)
+        # بعد از آزاد شدن قفل درخواست بعدی پاسخ را ذخیره می‌کند
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertIsNotNone(response_cache.get_entry(key))
+
+    def test_browsable_api_is_not_cached(self):
+        from store import response_cache
+        url = reverse('brand-list')
+        response = self.client.get(url, {'format': 'api'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response_cache.get_entry(response_cache.response_key(response['ETag'])))
+
+
+class FastJSONRendererTest(APITestCase):
+    def test_output_matches_default_renderer(self):
+        import datetime
+        import json
+        from decimal import Decimal
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+        from store.renderers import FastJSONRenderer
+        data = {
+            'price': Decimal('1250.50'),
+            'created_at': datetime.datetime(2024, 3, 1, 10, 30, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2024, 3, 1),
+            'label': gettext_lazy("قیمت"),
+            'groups': {3: ['رم'], 1: []},
+            'huge': 2 ** 70,
+        }
+        fast = FastJSONRenderer().render(data)
+        self.assertEqual(json.loads(fast), json.loads(JSONRenderer().render(data)))
+        self.assertIn('"2024-03-01T10:30:00Z"', fast.decode())
+        self.assertIn('قیمت', fast.decode())
+
+    def test_large_lists_are_streamed(self):
+        import json
+        from django.test import override_settings
+        from store.renderers import FastJSONRenderer
+        for index in range(5):
+            Product.objects.create(title=f"محصول {index}")
+        url = reverse('product-list')
+        expected = json.loads(self.client.get(url, {'page_size': 5, 'fields': 'id,title'}).content)
+        with override_settings(STORE_JSON_STREAM_THRESHOLD=2, STORE_JSON_STREAM_CHUNK_SIZE=2, STORE_RESPONSE_CACHE=False):
+            response = self.client.get(url, {'page_size': 5, 'fields': 'id,title'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), expected)
+        with override_settings(STORE_JSON_STREAM_THRESHOLD=2):
+            chunks = list(FastJSONRenderer().iter_render(list(range(7)), chunk_size=3))
+        self.assertEqual(json.loads(b''.join(chunks)), list(range(7)))
+
+    def test_default_threshold_streams_large_pages(self):
+        from store.pagination import StandardResultsSetPagination
+        from store.renderers import get_stream_threshold, stream_key
+        threshold = get_stream_threshold()
+        self.assertLess(threshold, StandardResultsSetPagination.max_page_size)
+        self.assertGreaterEqual(threshold, StandardResultsSetPagination.page_size)
+        self.assertEqual(stream_key({'results': list(range(StandardResultsSetPagination.max_page_size))}), 'results')
+        self.assertIsNone(stream_key({'results': list(range(StandardResultsSetPagination.page_size))}))
+
+
+class ObjectLookupTest(APITestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(title="گوشی", slug="گوشی-سامسونگ")
+            self.numeric = Product.objects.create(title="عددی", slug="2024")
+
+    def _get(self, lookup):
+        return self.client.get(reverse('product-detail', args=[lookup]), {'fields': 'id,slug,options'})
+
+    def test_slug_resolved_with_single_prefetch_cycle(self):
+        from django.test import override_settings
+        with override_settings(STORE_RESPONSE_CACHE=False):
+            self.assertEqual(self._get(self.product.slug).data['id'], self.product.id)
+            # pk از کش خوانده می‌شود: یک کوئری محصول و یک کوئری prefetch گزینه‌ها
+            with self.assertNumQueries(2):
+                self.assertEqual(self._get(self.product.slug).data['id'], self.product.id)
+            with self.assertNumQueries(2):
+                self.assertEqual(self._get(self.product.id).data['id'], self.product.id)
+            self.assertEqual(self._get('2024').data['id'], self.numeric.id)
+            self.assertEqual(self._get('missing-slug').status_code, 404)
+            with self.assertNumQueries(0):
+                self.assertEqual(self._get('missing-slug').status_code, 404)
+
+    def test_slug_change_invalidates_map(self):
+        from django.test import override_settings
+        with override_settings(STORE_RESPONSE_CACHE=False):
+            self.assertEqual(self._get(self.product.slug).status_code, 200)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product.slug = "گوشی-جدید"
+                self.product.save()
+            self.assertEqual(self._get("گوشی-سامسونگ").status_code, 404)
+            self.assertEqual(self._get("گوشی-جدید").data['id'], self.product.id)
+
+
+class FilterSchemaTest(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="موبایل")
+
+    def test_list_filters_block_from_cached_schema(self):
+        from store.filters import CategoryFilter
+        from store.filter_schema import get_static_schema
+        response = self.client.get(reverse('category-list'), {'category': self.category.id})
+        self.assertEqual(response.status_code, 200)
+        filters = response.data['filters']
+        self.assertEqual(filters['spec_names']['label'], 'مشخصات فنی (نام)')
+        self.assertEqual(filters['name']['help_text'], '')
+        self.assertEqual(filters['spec_value_choices'], [])
+        self.assertEqual(set(filters) - {'spec_value_choices'}, set(CategoryFilter.base_filters))
+        # بخش ثابت فقط یک بار در هر پروسه ساخته می‌شود
+        self.assertIs(get_static_schema(CategoryFilter), get_static_schema(CategoryFilter))
+
+    def test_filters_block_can_be_omitted(self):
+        response = self.client.get(reverse('product-list'), {'filters': 'false'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('filters', response.data)
+        self.assertEqual(response.data['status'], 'success')
+        self.assertIn('filters', self.client.get(reverse('product-list')).data)
+
+
+class ProductFilterExistsTest(APITestCase):
+    def setUp(self):
+        from store.models import Color, ProductOption, Tag, Warranty
+        self.red = Color.objects.create(name="قرمز", hex_code="#FF0000")
+        self.warranty = Warranty.objects.create(name="گارانتی", duration=18)
+        self.tags = [Tag.objects.create(name=f"تگ {i}", slug=f"exists-tag-{i}") for i in range(2)]
+        self.phone = Product.objects.create(title="گوشی")
+        self.phone.tags.set(self.tags)
+        for _ in range(2):
+            ProductOption.objects.create(product=self.phone, color=self.red, warranty=self.warranty, option_price=1000)
+        self.case = Product.objects.create(title="قاب")
+        ProductOption.objects.create(product=self.case, color=self.red, option_price=100)
+
+    def test_combined_filters_use_exists_without_duplicates(self):
+        from django.http import QueryDict
+        from store.filters import ProductFilter
+        params = QueryDict(mutable=True)
+        params.update({
+            'colors': str(self.red.id),
+            'warranties': str(self.warranty.id),
+            'tags': ','.join(str(tag.id) for tag in self.tags),
+            'has_warranty': 'true',
+        })
+        qs = ProductFilter(params, queryset=Product.objects.all()).qs
+        self.assertEqual(list(qs.values_list('id', flat=True)), [self.phone.id])
+        sql = str(qs.query).upper()
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+        no_warranty = ProductFilter({'has_warranty': 'false', 'colors': str(self.red.id)}, queryset=Product.objects.all()).qs
+        self.assertEqual(list(no_warranty.values_list('id', flat=True)), [self.case.id])
+
+
+class LocalS3:
+    """S3 محلی در حافظه برای تست صف آپلود (STORE_S3_CLIENT_FACTORY)"""
+    objects = {}
+    failures = 0
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):
+        if LocalS3.failures:
+            LocalS3.failures -= 1
+            raise ConnectionError('connection reset')
+        LocalS3.objects[(bucket, key)] = fileobj.read()
+
+
+def local_s3_client():
+    return LocalS3()
+
+
+class LocalS3TestMixin:
+    """MEDIA_ROOT موقت، آپلود هم‌زمان و LocalS3 به جای فضای ابری"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from unittest import mock
+        from django.test import override_settings
+        from store import uploads
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, STORE_UPLOAD_ASYNC=False, ARVAN_BUCKET='bucket',
+            STORE_S3_CLIENT_FACTORY='store.tests.local_s3_client',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        retry_delay = mock.patch.object(uploads, 'RETRY_DELAY', 0)
+        retry_delay.start()
+        self.addCleanup(retry_delay.stop)
+        uploads.reset()
+        self.addCleanup(uploads.reset)
+        LocalS3.objects, LocalS3.failures = {}, 0
+
+
+class ImageUploadQueueTest(LocalS3TestMixin, APITestCase):
+    def _create_product(self):
+        image = SimpleUploadedFile("phone.jpg", b"image-bytes", content_type="image/jpeg")
+        return Product.objects.create(title="محصول با عکس", image=image)
+
+    def test_upload_runs_after_commit_and_records_status(self):
+        from store.models import ImageUpload
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            product = self._create_product()
+        upload = ImageUpload.objects.get(model_label='store.product', object_id=product.pk, field_name='image')
+        self.assertEqual(upload.status, ImageUpload.STATUS_PENDING)
+        self.assertEqual(LocalS3.objects, {})
+        for callback in callbacks:
+            callback()
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, ImageUpload.STATUS_DONE)
+        self.assertEqual(upload.attempts, 1)
+        self.assertEqual(LocalS3.objects, {('bucket', upload.key): b"image-bytes"})
+        self.assertTrue(upload.key.startswith('products/'))
+
+    def test_failed_uploads_are_retried(self):
+        from django.test import override_settings
+        from store.models import ImageUpload
+        LocalS3.failures = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self._create_product()
+        upload = ImageUpload.objects.get(object_id=product.pk, model_label='store.product')
+        self.assertEqual((upload.status, upload.attempts), (ImageUpload.STATUS_DONE, 2))
+
+        LocalS3.failures = 5
+        with override_settings(STORE_UPLOAD_MAX_ATTEMPTS=2), self.captureOnCommitCallbacks(execute=True):
+            product = self._create_product()
+        upload = ImageUpload.objects.get(object_id=product.pk, model_label='store.product')
+        self.assertEqual((upload.status, upload.attempts), (ImageUpload.STATUS_FAILED, 2))
+        self.assertIn('connection reset', upload.last_error)
+
+    def test_saving_without_changing_the_image_does_not_upload_again(self):
+        from store.models import ImageUpload
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self._create_product()
+        LocalS3.objects = {}
+        with self.captureOnCommitCallbacks(execute=True):
+            product.is_active = not product.is_active
+            product.save()
+            Product.objects.get(pk=product.pk).save()
+        self.assertEqual(LocalS3.objects, {})
+        upload = ImageUpload.objects.get(object_id=product.pk, model_label='store.product')
+        self.assertEqual((upload.status, upload.attempts), (ImageUpload.STATUS_DONE, 1))
+        self.assertEqual(len(upload.content_hash), 64)
+
+    def test_identical_gallery_images_are_stored_once(self):
+        from store.models import Gallery, ImageUpload, ProductOption
+        option = ProductOption.objects.create(product=self._create_product(), option_price=1000)
+        LocalS3.objects = {}
+        galleries = []
+        for name in ("front.JPG", "copy.jpg"):
+            with self.captureOnCommitCallbacks(execute=True):
+                galleries.append(Gallery.objects.create(
+                    product=option, image=SimpleUploadedFile(name, b"gallery-bytes", content_type="image/jpeg"),
+                ))
+        first, second = galleries
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^product_gallery/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(LocalS3.objects, {('bucket', first.image.name): b"gallery-bytes"})
+        uploads = ImageUpload.objects.filter(model_label='store.gallery').order_by('object_id')
+        self.assertEqual([u.status for u in uploads], [ImageUpload.STATUS_DONE] * 2)
+        self.assertEqual([u.attempts for u in uploads], [1, 0])
+
+
+def make_image(name, size=(800, 600), mode='RGB', image_format='JPEG'):
+    import io
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 255)[:len(mode)]).save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{image_format.lower()}')
+
+
+class ImageDerivativesTest(LocalS3TestMixin, APITestCase):
+    def test_derivatives_are_generated_after_upload_and_exposed_as_srcset(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(title="محصول", slug="derivative-product", image=make_image("phone.jpg"))
+        product.refresh_from_db()
+        variants = product.image_variants['image']
+        self.assertEqual(variants['source'], product.image.name)
+        self.assertEqual(sorted(variants['webp'], key=int), ['160', '320', '640', '800'])
+        self.assertEqual(variants['fallback']['800'], product.image.name)
+        self.assertEqual(variants['fallback']['320'], 'products/derivatives/phone.jpg-320.jpg')
+        self.assertIn(('bucket', 'products/derivatives/phone.jpg-160.webp'), LocalS3.objects)
+
+        response = self.client.get(f'/api/products/{product.pk}/', {'fields': 'id,image,image_srcset'})
+        srcset = response.json()['image_srcset']
+        self.assertEqual(list(srcset['webp']), ['160w', '320w', '640w', '800w'])
+        self.assertTrue(srcset['webp']['320w'].endswith('products/derivatives/phone.jpg-320.webp'))
+        self.assertTrue(srcset['fallback']['800w'].endswith(product.image.name))
+
+        # تصویر جدید تا ساخته شدن نسخه‌هایش srcset ندارد
+        with self.captureOnCommitCallbacks(execute=False):
+            product.image = make_image("new.png", mode='RGBA', image_format='PNG')
+            product.save()
+        response = self.client.get(f'/api/products/{product.pk}/', {'fields': 'id,image_srcset'})
+        self.assertIsNone(response.json()['image_srcset'])
+
+    def test_sources_with_the_same_stem_do_not_share_derivatives(self):
+        from store.derivatives import derivative_name
+        self.assertNotEqual(derivative_name('products/a.jpg', 160, 'webp'), derivative_name('products/a.png', 160, 'webp'))
+        with self.captureOnCommitCallbacks(execute=True):
+            jpg = Product.objects.create(title="jpg", slug="stem-jpg", image=make_image("a.jpg"))
+            png = Product.objects.create(title="png", slug="stem-png", image=make_image("a.png", image_format='PNG'))
+        jpg.refresh_from_db()
+        png.refresh_from_db()
+        self.assertNotEqual(jpg.image_variants['image']['webp']['160'], png.image_variants['image']['webp']['160'])
+
+    def test_backfill_command_generates_missing_derivatives(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from store.models import Brand, Category
+        with self.captureOnCommitCallbacks(execute=False):
+            brand = Brand.objects.create(name="برند", slug="brand-logo", logo=make_image("logo.png", (120, 60), 'RGBA', 'PNG'))
+            category = Category.objects.create(name="دسته", slug="derivative-category", image=make_image("cat.jpg"))
+        out = StringIO()
+        call_command(
+            'backfill_image_derivatives', '--model', 'store.brand', '--model', 'store.category', '--workers', '1',
+            stdout=out,
+        )
+        self.assertIn('Generated derivatives for 2 of 2 images', out.getvalue())
+        brand.refresh_from_db()
+        category.refresh_from_db()
+        # لوگوی کوچک‌تر از همه عرض‌ها فقط یک WebP هم‌اندازه دارد و fallback آن PNG اصلی است
+        self.assertEqual(brand.image_variants['logo']['webp'], {'120': 'brands/derivatives/logo.png-120.webp'})
+        self.assertEqual(brand.image_variants['logo']['fallback'], {'120': brand.logo.name})
+        self.assertEqual(category.image_variants['image']['fallback']['640'], 'categories/derivatives/cat.jpg-640.jpg')
+
+        call_command('backfill_image_derivatives', '--model', 'store.brand', '--workers', '1', stdout=out)
+        self.assertIn('Generated derivatives for 0 of 0 images', out.getvalue())
+
+
+class MediaURLTest(TestCase):
+    def setUp(self):
+        from store import media_urls
+        media_urls.reset()
+        self.addCleanup(media_urls.reset)
+
+    def test_urls_match_storage_without_calling_it(self):
+        from unittest import mock
+        from django.core.files.storage import FileSystemStorage
+        from storages.backends.s3 import S3Storage
+        from store.media_urls import build_url
+        storages = [
+            FileSystemStorage(base_url='https://cdn.example.com/bucket/'),
+            S3Storage(bucket_name='bucket', custom_domain='cdn.example.com/bucket', location='media'),
+        ]
+        names = ['products/phone.jpg', 'product_gallery/عکس محصول (1).webp']
+        for storage in storages:
+            for name in names:
+                self.assertEqual(build_url(name, storage), storage.url(name))
+            with mock.patch.object(type(storage), 'url', side_effect=AssertionError):
+                self.assertEqual(build_url(names[0], storage), build_url(names[0], storage))
+                self.assertTrue(build_url('brands/new-logo.png', storage).endswith('/brands/new-logo.png'))
+
+    def test_signed_s3_urls_are_not_memoized(self):
+        from unittest import mock
+        from storages.backends.s3 import S3Storage
+        from store.media_urls import build_url
+        storage = S3Storage(bucket_name='bucket', custom_domain=None)
+        with mock.patch.object(S3Storage, 'url', side_effect=['https://signed/1', 'https://signed/2']):
+            self.assertEqual([build_url('a.jpg', storage), build_url('a.jpg', storage)], ['https://signed/1', 'https://signed/2'])
+
+    def test_media_url_setting_changes_reset_the_cache(self):
+        from django.core.files.storage import default_storage
+        from django.test import override_settings
+        from store.media_urls import build_url
+        with override_settings(MEDIA_URL='https://one.example.com/'):
+            self.assertEqual(build_url('a.jpg', default_storage), 'https://one.example.com/a.jpg')
+        with override_settings(MEDIA_URL='https://two.example.com/'):
+            self.assertEqual(build_url('a.jpg', default_storage), 'https://two.example.com/a.jpg')
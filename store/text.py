@@ -0,0 +1,66 @@
+"""
+نرمال‌سازی متن فارسی برای جستجو و ایندکس‌ها.
+
+- یکسان‌سازی ی/ك عربی با ی/ک فارسی (و چند حرف مشابه)
+- تبدیل ارقام فارسی و عربی به لاتین
+- حذف اعراب و کشیده، تبدیل نیم‌فاصله (ZWNJ) به فاصله
+- حذف تگ‌های HTML متن‌های CKEditor
+"""
+import re
+from html import unescape
+
+from django.utils.html import strip_tags
+
+ZWNJ = '\u200c'
+
+_CHAR_MAP = {
+    'ي': 'ی', 'ى': 'ی', 'ئ': 'ی',
+    'ك': 'ک',
+    'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا', 'آ': 'ا',
+    'ؤ': 'و',
+    '\u0640': '',  # کشیده
+    '\u200e': '', '\u200f': '', '\ufeff': '',
+    '\xa0': ' ',
+}
+_CHAR_MAP.update({chr(0x06F0 + i): str(i) for i in range(10)})  # ارقام فارسی
+_CHAR_MAP.update({chr(0x0660 + i): str(i) for i in range(10)})  # ارقام عربی
+_TRANSLATION = str.maketrans(_CHAR_MAP)
+
+_DIACRITICS = re.compile('[\u064b-\u065f\u0670]')
+_WHITESPACE = re.compile(r'\s+')
+_TOKEN = re.compile(r'\w+')
+
+
+def normalize_persian(text, zwnj=' '):
+    """متن نرمال شده با حروف کوچک؛ نیم‌فاصله با ``zwnj`` جایگزین می‌شود."""
+    if not text:
+        return ''
+    text = _DIACRITICS.sub('', str(text).translate(_TRANSLATION))
+    text = text.replace(ZWNJ, zwnj).lower()
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def strip_html(text):
+    if not text:
+        return ''
+    return unescape(strip_tags(str(text)))
+
+
+def tokenize(text):
+    return _TOKEN.findall(normalize_persian(text))
+
+
+def search_variants(text):
+    """
+    متن نرمال شده به همراه شکل چسبیده کلماتی که نیم‌فاصله دارند
+    (تا «می‌خواهم»، «می خواهم» و «میخواهم» هر سه پیدا شوند).
+    """
+    normalized = normalize_persian(text)
+    if ZWNJ not in str(text or ''):
+        return normalized
+    joined = {
+        word for word in normalize_persian(text, zwnj=ZWNJ).split()
+        if ZWNJ in word
+    }
+    return ' '.join([normalized] + sorted(word.replace(ZWNJ, '') for word in joined))
@@ -0,0 +1,254 @@
+"""
+صف آپلود تصاویر در فضای ابری آروان (S3).
+
+``save()`` مدل‌های دارای ArvanImageUploadMixin دیگر منتظر آپلود نمی‌ماند؛ برای هر
+فیلد تصویر یک ردیف ImageUpload (وضعیت و تعداد تلاش) ثبت و بعد از commit تراکنش
+در ThreadPoolExecutor مشترک پروسه اجرا می‌شود. همه workerها از یک کلاینت boto3
+مشترک استفاده می‌کنند (کلاینت‌های boto3 thread-safe هستند و استخر اتصال
+botocore به اندازه تعداد workerها تنظیم می‌شود).
+
+تنظیمات:
+- ``STORE_UPLOAD_WORKERS``: تعداد workerها (پیش‌فرض ۴)
+- ``STORE_UPLOAD_MAX_ATTEMPTS``: حداکثر تلاش برای هر آپلود (پیش‌فرض ۳)
+- ``STORE_UPLOAD_ASYNC``: با False آپلود بعد از commit در همان thread اجرا می‌شود
+- ``STORE_S3_CLIENT_FACTORY``: مسیر تابعی که کلاینت S3 می‌سازد (مثلاً یک S3
+  محلی برای تست‌ها)
+
+فایلی که تغییر نکرده دوباره آپلود نمی‌شود: اگر نام فایل فیلد با آخرین آپلود یکی
+باشد بدون خواندن فایل رد می‌شود و در غیر این صورت hash محتوا (sha256) با آپلودهای
+قبلی مقایسه می‌شود. تصاویر گالری با نام مبتنی بر محتوا ذخیره می‌شوند
+(``assign_content_addressed_name``) تا تصویر تکراری فقط یک بار ذخیره و آپلود شود.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+from .models import ImageUpload
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_ATTEMPTS = 3
+# تاخیر قبل از تلاش دوباره (ثانیه)، در هر تلاش دو برابر می‌شود
+RETRY_DELAY = 0.5
+
+_lock = threading.Lock()
+_state = {'client': None, 'executor': None}
+
+
+def get_workers():
+    return getattr(settings, 'STORE_UPLOAD_WORKERS', DEFAULT_WORKERS)
+
+
+def get_max_attempts():
+    return getattr(settings, 'STORE_UPLOAD_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+
+
+def is_async():
+    return getattr(settings, 'STORE_UPLOAD_ASYNC', True)
+
+
+def get_bucket():
+    return getattr(settings, 'ARVAN_BUCKET', None) or os.getenv('ARVAN_BUCKET')
+
+
+def get_endpoint():
+    return getattr(settings, 'ARVAN_ENDPOINT', None) or os.getenv('ARVAN_ENDPOINT')
+
+
+def default_client_factory():
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        's3',
+        endpoint_url=get_endpoint(),
+        aws_access_key_id=getattr(settings, 'ARVAN_ACCESS_KEY', None) or os.getenv('ARVAN_ACCESS_KEY'),
+        aws_secret_access_key=getattr(settings, 'ARVAN_SECRET_KEY', None) or os.getenv('ARVAN_SECRET_KEY'),
+        config=Config(max_pool_connections=max(10, get_workers())),
+    )
+
+
+def get_client():
+    """کلاینت S3 مشترک پروسه"""
+    if _state['client'] is None:
+        with _lock:
+            if _state['client'] is None:
+                factory_path = getattr(settings, 'STORE_S3_CLIENT_FACTORY', None)
+                factory = import_string(factory_path) if factory_path else default_client_factory
+                _state['client'] = factory()
+    return _state['client']
+
+
+def get_executor():
+    if _state['executor'] is None:
+        with _lock:
+            if _state['executor'] is None:
+                _state['executor'] = ThreadPoolExecutor(max_workers=get_workers(), thread_name_prefix='image-upload')
+    return _state['executor']
+
+
+def reset():
+    """کلاینت و workerها را دور می‌اندازد (بعد از تغییر تنظیمات، مثلاً در تست‌ها)."""
+    with _lock:
+        executor, _state['executor'], _state['client'] = _state['executor'], None, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def build_key(name, folder=''):
+    basename = os.path.basename(name)
+    return f'{folder}/{basename}' if folder else basename
+
+
+def object_url(key):
+    return f'{get_endpoint()}/{get_bucket()}/{key}'
+
+
+def hash_file(file):
+    """sha256 محتوای فایل (File جنگو یا فایل باز شده)"""
+    digest = hashlib.sha256()
+    if hasattr(file, 'chunks'):
+        chunks = file.chunks()
+    else:
+        chunks = iter(lambda: file.read(64 * 1024), b'')
+    for chunk in chunks:
+        digest.update(chunk)
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return digest.hexdigest()
+
+
+def hash_field_file(field_file):
+    with field_file.storage.open(field_file.name, 'rb') as source:
+        return hash_file(source)
+
+
+def assign_content_addressed_name(field_file):
+    """
+    نام فایل تازه انتخاب شده را به ``<upload_to>/<sha256><ext>`` تغییر می‌دهد؛ اگر
+    همین محتوا قبلاً ذخیره شده باشد فایل دوباره نوشته نمی‌شود. باید قبل از
+    ``save()`` مدل صدا زده شود و hash محتوا را برمی‌گرداند (None اگر فایل جدیدی نباشد).
+    """
+    if not field_file or field_file._committed:
+        return None
+    content = field_file.file
+    content_hash = hash_file(content)
+    filename = f'{content_hash}{os.path.splitext(field_file.name)[1].lower()}'
+    name = field_file.field.generate_filename(field_file.instance, filename)
+    if field_file.storage.exists(name):
+        field_file.name = name
+        field_file._committed = True
+    else:
+        field_file.save(filename, content, save=False)
+    return content_hash
+
+
+def enqueue_image_upload(instance, field_name, folder='', content_hash=None):
+    """
+    آپلود فیلد تصویر instance را بعد از commit تراکنش جاری در صف می‌گذارد و
+    ردیف ImageUpload آن را برمی‌گرداند؛ اگر همین محتوا با همین کلید قبلاً آپلود
+    شده باشد آپلودی انجام نمی‌شود.
+    """
+    field_file = getattr(instance, field_name)
+    key = build_key(field_file.name, folder)
+    lookup = {'model_label': instance._meta.label_lower, 'object_id': instance.pk, 'field_name': field_name}
+    upload = ImageUpload.objects.filter(**lookup).first()
+    # فایل فیلد عوض نشده (مثلاً فقط عنوان یا is_active تغییر کرده)
+    if (
+        upload is not None
+        and upload.source_name == field_file.name
+        and upload.key == key
+        and upload.status != ImageUpload.STATUS_FAILED
+    ):
+        return upload
+
+    content_hash = content_hash or hash_field_file(field_file)
+    uploaded = ImageUpload.objects.filter(key=key, content_hash=content_hash, status=ImageUpload.STATUS_DONE)
+    defaults = {
+        'key': key, 'content_hash': content_hash, 'source_name': field_file.name, 'attempts': 0, 'last_error': '',
+    }
+    if uploaded.exists():
+        upload, _ = ImageUpload.objects.update_or_create(
+            **lookup, defaults={**defaults, 'status': ImageUpload.STATUS_DONE},
+        )
+        return upload
+    upload, _ = ImageUpload.objects.update_or_create(
+        **lookup, defaults={**defaults, 'status': ImageUpload.STATUS_PENDING},
+    )
+    transaction.on_commit(lambda: submit(upload.pk))
+    return upload
+
+
+def run_in_background(func, *args):
+    """func را در worker مشترک (یا همین‌جا اگر STORE_UPLOAD_ASYNC=False) اجرا می‌کند؛ future یا نتیجه"""
+    if is_async():
+        return get_executor().submit(_run_in_worker, func, *args)
+    return func(*args)
+
+
+def submit(upload_id):
+    """اجرای آپلود در worker؛ future یا ImageUpload"""
+    return run_in_background(process_upload, upload_id)
+
+
+def _run_in_worker(func, *args):
+    close_old_connections()
+    try:
+        return func(*args)
+    except Exception:
+        logger.exception('Background image task %s%r crashed', func.__name__, args)
+        raise
+    finally:
+        close_old_connections()
+
+
+def _source_file(upload):
+    model = apps.get_model(upload.model_label)
+    instance = model._default_manager.filter(pk=upload.object_id).first()
+    field_file = getattr(instance, upload.field_name, None) if instance is not None else None
+    return field_file or None
+
+
+def _mark(upload, **fields):
+    """وضعیت ردیف را به‌روز می‌کند، مگر اینکه در این فاصله آپلود جدیدی برای همین فیلد ثبت شده باشد."""
+    for name, value in fields.items():
+        setattr(upload, name, value)
+    return ImageUpload.objects.filter(pk=upload.pk, key=upload.key).update(**fields)
+
+
+def process_upload(upload_id, max_attempts=None):
+    """آپلود با تلاش دوباره و backoff؛ ردیف ImageUpload با وضعیت نهایی را برمی‌گرداند."""
+    upload = ImageUpload.objects.filter(pk=upload_id).first()
+    if upload is None or upload.status == ImageUpload.STATUS_DONE:
+        return upload
+    field_file = _source_file(upload)
+    if field_file is None:
+        _mark(upload, status=ImageUpload.STATUS_FAILED, last_error='object or image no longer exists')
+        return upload
+    max_attempts = max_attempts or get_max_attempts()
+    while True:
+        if not _mark(upload, status=ImageUpload.STATUS_UPLOADING, attempts=upload.attempts + 1):
+            return upload
+        try:
+            with field_file.storage.open(field_file.name, 'rb') as source:
+                get_client().upload_fileobj(source, get_bucket(), upload.key, ExtraArgs={'ACL': 'public-read'})
+        except Exception as exc:
+            error = f'{type(exc).__name__}: {exc}'
+            if upload.attempts >= max_attempts:
+                _mark(upload, status=ImageUpload.STATUS_FAILED, last_error=error)
+                logger.warning('Image upload %s failed after %s attempts: %s', upload.pk, upload.attempts, error)
+                return upload
+            _mark(upload, status=ImageUpload.STATUS_PENDING, last_error=error)
+            time.sleep(RETRY_DELAY * 2 ** (upload.attempts - 1))
+            continue
+        _mark(upload, status=ImageUpload.STATUS_DONE, last_error='')
+        return upload
@@ -1,35 +1,28 @@
-import boto3
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class ArvanImageUploadMixin:
-    def upload_image_to_arvan(self, image_field, folder=''):
-        endpoint_url = os.getenv('ARVAN_ENDPOINT')
-        access_key = os.getenv('ARVAN_ACCESS_KEY')
-        secret_key = os.getenv('ARVAN_SECRET_KEY')
-        bucket = os.getenv('ARVAN_BUCKET')
+    def upload_image_to_arvan(self, image_field, folder='', content_hash=None):
+        """
+        آپلود تصویر در فضای ابری آروان را در صف پس‌زمینه (store.uploads) قرار
+        می‌دهد و آدرس نهایی تصویر را برمی‌گرداند؛ وضعیت آپلود در ImageUpload ثبت می‌شود
+        و فایلی که از آخرین آپلود تغییر نکرده دوباره آپلود نمی‌شود. نسخه‌های کوچک و
+        WebP مدل‌های دارای ``image_variants`` هم در همان صف ساخته می‌شوند (store.derivatives).
+        """
+        # store.uploads مدل‌ها را import می‌کند و این ماژول توسط store.models استفاده می‌شود
+        from .derivatives import enqueue_derivatives
+        from .uploads import enqueue_image_upload, object_url
 
         if not image_field:
             return None
 
-        s3 = boto3.client(
-            's3',
-            endpoint_url=endpoint_url,
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key
-        )
+        upload = enqueue_image_upload(self, image_field.field.name, folder, content_hash=content_hash)
+        enqueue_derivatives(self, image_field.field.name)
+        return object_url(upload.key)
 
-        image_field.open('rb')
-        key = f"{folder}/{os.path.basename(image_field.name)}" if folder else os.path.basename(image_field.name)
-        s3.upload_fileobj(
-            image_field,
-            bucket,
-            key,
-            ExtraArgs={'ACL': 'public-read'}
-        )
-        image_field.close()
+    def assign_content_addressed_name(self, image_field):
+        from .uploads import assign_content_addressed_name
 
-        url = f"{endpoint_url}/{bucket}/{key}"
-        return url 
\ No newline at end of file
+        return assign_content_addressed_name(image_field)
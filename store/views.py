@@ -1,6 +1,5 @@
 from django.shortcuts import render
 from rest_framework import viewsets, filters, status
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import *
@@ -8,153 +7,411 @@ from .serializers import *
 from .filters import *
 # from loan_calculator.models import LoanCondition, PrePaymentInstallment
 # from loan_calculator.serializers import LoanConditionSerializer, PrePaymentInstallmentSerializer
-from django.http import Http404, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
-from django.db.models import Min,Count, Q
+from django.db.models import Min,Count, Q, Prefetch
 from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.exceptions import APIException
 
 from mptt.models import MPTTModel
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 1000000  # عدد خیلی بزرگ
-    page_size_query_param = 'page_size'
-    max_page_size = 1000000
+from .pagination import StandardResultsSetPagination, CatalogCursorPagination
+from .facets import get_category_facets, compute_product_facets
+from . import suggest as suggest_index
+from .category_tree import category_products, load_category_tree
+from .changes import change_namespace, get_validators, model_label
+from . import response_cache
+from .renderers import FastJSONRenderer, stream_key
+from .lookups import resolve_slug
+from .category_closure import get_category_map
+from .filter_schema import get_filter_schema, get_static_schema
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+    default_detail = ''
+
+
+class CachedResponseHit(Exception):
+    """پاسخ از کش پاسخ‌ها پیدا شد؛ اجرای ویو متوقف و همین پاسخ برگردانده می‌شود."""
+
+    def __init__(self, entry):
+        super().__init__()
+        self.entry = entry
+
 
 class BaseModelViewSet(ModelViewSet):
     pagination_class = StandardResultsSetPagination
+    # ویوهایی که صفحه‌بندی keyset دارند این را مقداردهی می‌کنند (?cursor=... یا ?pagination=cursor)
+    cursor_pagination_class = None
+    # مدل‌هایی که پاسخ این ویو به آن‌ها وابسته است (شمارنده‌های store.changes)؛
+    # پیش‌فرض فقط مدل خود ویو
+    change_dependencies = None
+    # وابستگی‌هایی که در نمایش یک شیء با شمارنده همان شیء جایگزین می‌شوند
+    # (سیگنال‌ها تغییر این مدل‌ها را روی شمارنده شیء اصلی هم ثبت می‌کنند)
+    object_change_dependencies = None
+    # پاسخ GET کاربران ناشناس در کش پاسخ‌ها (store.response_cache) ذخیره شود
+    cache_anonymous_responses = True
+
+    def get_change_dependencies(self):
+        return list(self.change_dependencies or [model_label(self.queryset.model)])
+
+    def get_change_namespaces(self):
+        dependencies = self.get_change_dependencies()
+        pk = self.get_lookup_pk() if self.action == 'retrieve' else None
+        if pk is not None:
+            own = model_label(self.queryset.model)
+            replaced = set(self.object_change_dependencies or [own])
+            return [change_namespace(own, pk)] + [
+                change_namespace(label) for label in dependencies if label not in replaced
+            ]
+        return [change_namespace(label) for label in dependencies]
+
+    def get_validators(self, request):
+        """``(etag, last_modified)`` پاسخ؛ به آدرس، پارامترها و فرمت خروجی هم وابسته است."""
+        query = '&'.join(
+            f'{key}={value}' for key in sorted(request.query_params) for value in request.query_params.getlist(key)
+        )
+        fingerprint = f'{request.get_host()}{request.path}?{query}|{request.accepted_renderer.format}'
+        return get_validators(self.get_change_namespaces(), fingerprint)
+
+    @staticmethod
+    def is_not_modified(request, etag, last_modified):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+        return since is not None and last_modified is not None and int(last_modified) <= since
+
+    def should_cache_response(self, request):
+        return (
+            self.cache_anonymous_responses
+            and response_cache.is_enabled()
+            and request.method == 'GET'
+            and not request.user.is_authenticated
+            # HTML مرورگر API شامل توکن CSRF اولین بازدیدکننده است
+            and getattr(getattr(request, 'accepted_renderer', None), 'format', None) == 'json'
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # درخواست شرطی و کش پاسخ قبل از اجرای کوئری‌ها و سریالایزر بررسی می‌شوند
+        self._validators = None
+        self._response_cache_key = None
+        if request.method in ('GET', 'HEAD'):
+            self._validators = self.get_validators(request)
+            if self.is_not_modified(request, *self._validators):
+                raise NotModified()
+        if self._validators and self.should_cache_response(request):
+            key = response_cache.response_key(self._validators[0])
+            entry = response_cache.get_entry(key)
+            acquired = entry is None and response_cache.acquire(key)
+            if entry is None and not acquired:
+                # درخواست دیگری در حال ساخت همین پاسخ است
+                entry = response_cache.wait_for_entry(key)
+                # بعد از پایان انتظار فقط اگر قفل آزاد شده باشد این درخواست پاسخ را ذخیره می‌کند؛
+                # در غیر این صورت پاسخ بدون کش ساخته می‌شود تا قفل سازنده اصلی حذف نشود
+                acquired = entry is None and response_cache.acquire(key)
+            if entry is not None:
+                raise CachedResponseHit(entry)
+            if acquired:
+                self._response_cache_key = key
+
+    def release_response_cache(self):
+        key = getattr(self, '_response_cache_key', None)
+        if key is not None:
+            response_cache.release(key)
+            self._response_cache_key = None
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        if isinstance(exc, CachedResponseHit):
+            return HttpResponse(exc.entry['content'], content_type=exc.entry['content_type'])
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            self.release_response_cache()
+            raise
+
+    def stream_large_response(self, response):
+        """
+        لیست‌های بزرگ با FastJSONRenderer تکه‌تکه encode و ارسال می‌شوند تا بدنه JSON
+        کامل یک‌جا ساخته نشود؛ response.data پیش از این مرحله کامل سریالایز شده و
+        حافظه آن کم نمی‌شود (این پاسخ‌ها در کش پاسخ‌ها ذخیره نمی‌شوند).
+        """
+        renderer = getattr(response, 'accepted_renderer', None)
+        if (
+            not isinstance(response, Response)
+            or response.status_code != status.HTTP_200_OK
+            or not isinstance(renderer, FastJSONRenderer)
+            or renderer.get_indent(response.accepted_media_type, self.get_renderer_context())
+            or stream_key(response.data) is None
+        ):
+            return response
+        streaming = StreamingHttpResponse(renderer.iter_render(response.data), content_type=renderer.media_type)
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                streaming[header] = value
+        return streaming
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = self.stream_large_response(super().finalize_response(request, response, *args, **kwargs))
+        key = getattr(self, '_response_cache_key', None)
+        if key is not None:
+            if response.status_code == status.HTTP_200_OK and isinstance(response, Response):
+                response.add_post_render_callback(
+                    lambda rendered: response_cache.set_entry(key, rendered.content, rendered['Content-Type'])
+                )
+            else:
+                self.release_response_cache()
+        validators = getattr(self, '_validators', None)
+        if validators and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            etag, last_modified = validators
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.cursor_pagination_class is not None:
+            request = getattr(self, 'request', None)
+            params = request.query_params if request is not None else {}
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = self.cursor_pagination_class()
+        return super().paginator
+
+    def get_rendered_fields(self):
+        """فیلدهای نهایی سریالایزر بر اساس ?fields= و ?expand= (برای سریالایزرهای DynamicFieldsMixin)"""
+        if not hasattr(self, '_rendered_fields'):
+            serializer_class = self.get_serializer_class()
+            request = getattr(self, 'request', None)
+            params = request.query_params if request is not None else {}
+            self._rendered_fields = (
+                serializer_class.resolve_fields(params) if hasattr(serializer_class, 'resolve_fields') else None
+            )
+        return self._rendered_fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_rendered_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_lookup(self):
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return None if lookup is None else str(lookup)
+
+    def get_lookup_pk(self):
+        """
+        pk شیء آدرس: آیدی عددی مستقیم و slug از نقشه کش شده slug به pk
+        (store.lookups)؛ None اگر slug پیدا نشود.
+        """
+        if not hasattr(self, '_lookup_pk'):
+            lookup = self.get_lookup()
+            if lookup is None:
+                self._lookup_pk = None
+            elif lookup.isdigit():
+                self._lookup_pk = int(lookup)
+            elif hasattr(self.queryset.model, 'slug'):
+                self._lookup_pk = resolve_slug(self.queryset.model, lookup)
+            else:
+                self._lookup_pk = None
+        return self._lookup_pk
+
+    def get_object_by_pk(self, pk):
+        # کوئری اصلی (با فیلترها و prefetchها) فقط با pk مشخص اجرا می‌شود
+        if pk is None:
+            return None
+        return next(iter(self.filter_queryset(self.get_queryset()).filter(pk=pk)), None)
 
     def get_object(self):
-        queryset = self.filter_queryset(self.get_queryset())
-        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
-        lookup = self.kwargs[lookup_url_kwarg]
-
-        if lookup.isdigit():
-            try:
-                obj = queryset.get(id=lookup)
-                self.check_object_permissions(self.request, obj)
-                return obj
-            except self.queryset.model.DoesNotExist:
-                pass
-
-        if hasattr(self.queryset.model, 'slug'):
-            try:
-                obj = queryset.get(slug=lookup)
-                self.check_object_permissions(self.request, obj)
-                return obj
-            except self.queryset.model.DoesNotExist:
-                pass
-
-        raise Http404
+        obj = self.get_object_by_pk(self.get_lookup_pk())
+        lookup = self.get_lookup()
+        # slugهایی که فقط از رقم تشکیل شده‌اند
+        if obj is None and lookup.isdigit() and hasattr(self.queryset.model, 'slug'):
+            obj = self.get_object_by_pk(resolve_slug(self.queryset.model, lookup))
+        if obj is None:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def get_filters_data(self, request):
+        """بلوک filters پاسخ لیست از schema کش شده کلاس فیلتر (store.filter_schema)"""
+        filterset_class = getattr(self, 'filterset_class', None) or CategoryFilter
+        return get_filter_schema(filterset_class, request)
+
+    def include_filters_data(self, request):
+        # ?filters=false بلوک متادیتای فیلترها را حذف می‌کند
+        return request.query_params.get('filters', '').lower() not in ('0', 'false', 'no')
 
     def list(self, request, *args, **kwargs):
         try:
+            parent_data = None
             parent_id = request.GET.get('parent')
             if parent_id:
                 # اگر پارامتر parent وجود داشت، خود parent را هم به عنوان اولین عضو لیست برگردان
                 try:
-                    parent_obj = Category.objects.prefetch_related('products', 'spec_definitions').select_related('parent').get(id=parent_id)
+                    parent_obj = Category.objects.prefetch_related('spec_definitions').select_related('parent').get(id=parent_id)
                     parent_data = self.get_serializer(parent_obj).data
                 except Category.DoesNotExist:
-                    parent_data = None
-                queryset = self.filter_queryset(self.get_queryset())
-                page = self.paginate_queryset(queryset)
-                
-                # استفاده از فیلتر مناسب برای هر viewset
-                if hasattr(self, 'filterset_class'):
-                    filter_instance = self.filterset_class(request.GET, queryset=self.get_queryset(), request=request)
-                else:
-                    filter_instance = CategoryFilter(request.GET, queryset=Category.objects.all(), request=request)
-                
-                filters_data = {}
-                for name, f in filter_instance.filters.items():
-                    filters_data[name] = {
-                        'label': getattr(f, 'label', name),
-                        'help_text': getattr(f, 'help_text', ''),
-                        'choices': getattr(f, 'choices', None),
-                    }
-                
-                # اضافه کردن spec_value_choices فقط برای CategoryFilter
-                if hasattr(filter_instance, 'spec_value_choices'):
-                    filters_data['spec_value_choices'] = filter_instance.spec_value_choices
-                if page is not None:
-                    serializer = self.get_serializer(page, many=True)
-                    data = list(serializer.data)
-                    if parent_data:
-                        data.insert(0, parent_data)
-                    response = self.get_paginated_response(data)
-                    response.data['status'] = 'success'
-                    response.data['filters'] = filters_data
-                    return response
-                serializer = self.get_serializer(queryset, many=True)
-                data = list(serializer.data)
-                if parent_data:
-                    data.insert(0, parent_data)
-                return Response({
-                    'status': 'success',
-                    'data': data,
-                    'filters': filters_data
-                })
-            # حالت عادی (بدون parent)
+                    pass
             queryset = self.filter_queryset(self.get_queryset())
             page = self.paginate_queryset(queryset)
-            
-            # استفاده از فیلتر مناسب برای هر viewset
-            if hasattr(self, 'filterset_class'):
-                filter_instance = self.filterset_class(request.GET, queryset=self.get_queryset(), request=request)
-            else:
-                filter_instance = CategoryFilter(request.GET, queryset=Category.objects.all(), request=request)
-            
-            filters_data = {}
-            for name, f in filter_instance.filters.items():
-                filters_data[name] = {
-                    'label': getattr(f, 'label', name),
-                    'help_text': getattr(f, 'help_text', ''),
-                    'choices': getattr(f, 'choices', None),
-                }
-            
-            # اضافه کردن spec_value_choices فقط برای CategoryFilter
-            if hasattr(filter_instance, 'spec_value_choices'):
-                filters_data['spec_value_choices'] = filter_instance.spec_value_choices
+            data = self.get_serializer(queryset if page is None else page, many=True).data
+            if parent_data:
+                data = [parent_data] + list(data)
+            extra = {'status': 'success'}
+            if self.include_filters_data(request):
+                extra['filters'] = self.get_filters_data(request)
             if page is not None:
-                serializer = self.get_serializer(page, many=True)
-                response = self.get_paginated_response(serializer.data)
-                response.data['status'] = 'success'
-                response.data['filters'] = filters_data
+                response = self.get_paginated_response(data)
+                response.data.update(extra)
                 return response
-            serializer = self.get_serializer(queryset, many=True)
-            return Response({
-                'status': 'success',
-                'data': serializer.data,
-                'filters': filters_data
-            })
+            return Response({'status': 'success', 'data': data, **extra})
+        except APIException:
+            # خطاهای DRF (مثل ترتیب نامعتبر در صفحه‌بندی cursor) با وضعیت و پیام خودشان برگردانده می‌شوند
+            raise
         except Exception as e:
             return Response({
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
 
+def options_prefetch():
+    """
+    ویژگی‌ها با قیمت نهایی محاسبه شده در SQL (annotation)؛ تابع است چون with_final_price
+    زمان فعلی را در کوئری ثابت می‌کند و باید برای هر درخواست از نو ساخته شود.
+    """
+    return Prefetch('options', queryset=ProductOption.objects.with_final_price().select_related('color'))
+
+
+SPEC_VALUES_PREFETCH = Prefetch(
+    'spec_values', queryset=ProductSpecification.objects.select_related('specification__group'),
+)
+# همه مدل‌هایی که در خروجی محصول (با همه expandها) دیده می‌شوند
+PRODUCT_CHANGE_DEPENDENCIES = [
+    'product', 'productoption', 'productspecification', 'gallery', 'category', 'brand', 'tag', 'color',
+    'specification', 'specificationgroup', 'specificationvalue',
+]
+
+
 class ProductViewSet(BaseModelViewSet):
-    queryset = Product.objects.select_related('brand').prefetch_related(
-        'categories', 'tags', 'options', 'options__color','options__warranty',
-        'spec_values', 'spec_values__specification','spec_values__specification__group',
-        ).all()
-    
+    queryset = Product.objects.select_related('brand', 'summary').all()
     serializer_class = ProductSerializer
+    # لیست‌ها نمایش سبک دارند؛ فیلدهای سنگین با ?expand= اضافه می‌شوند
+    list_item_serializer_class = ProductListItemSerializer
+    # فیلد سریالایزر -> روابطی که فقط در صورت رندر شدن آن فیلد prefetch می‌شوند
+    # (مشخصه و گروه آن با همان کوئری مقادیر مشخصات خوانده می‌شوند؛ تابع‌ها برای هر درخواست صدا زده می‌شوند)
+    field_prefetches = {
+        'categories': ['categories'],
+        'tags': ['tags'],
+        'options': [options_prefetch, 'options__gallery'],
+        'spec_values': [SPEC_VALUES_PREFETCH, 'spec_values__specification__categories'],
+        'spec_groups': [SPEC_VALUES_PREFETCH, 'spec_values__specification__categories'],
+    }
     filterset_class = ProductFilter
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    ordering_fields = ['options__option_price','options__quantity', "created_at" , "updated_at" , "is_active" , "options__is_active_discount"]
-    search_fields = ['title', 'description','options__color__name','options__option_price', 'spec_values__specification__name']
-    
-   
+    cursor_pagination_class = CatalogCursorPagination
+    # پارامتر search توسط ProductFilter (جستجوی متن کامل) پردازش می‌شود
+    filter_backends = [DjangoFilterBackend, StableOrderingFilter]
+    # ترتیب فقط روی ستون‌های یک به یک (summary)؛ ترتیب روی options هر محصول را به ازای هر ویژگی تکرار می‌کرد
+    ordering_fields = [
+        'id', 'summary__min_final_price', 'summary__max_final_price', 'summary__total_quantity',
+        'summary__has_active_discount', "created_at" , "updated_at" , "is_active",
+    ]
+    ordering = ['-id']
+    change_dependencies = PRODUCT_CHANGE_DEPENDENCIES
+    object_change_dependencies = ['product', 'productoption', 'productspecification', 'gallery']
+
+    def get_change_dependencies(self):
+        if self.action == 'suggest':
+            return ['product', 'brand', 'category', 'tag']
+        return super().get_change_dependencies()
+
+    def get_change_namespaces(self):
+        namespaces = super().get_change_namespaces()
+        # محصولات مشابه به لیست محاسبه شده و داده محصولات دیگر هم وابسته‌اند
+        if 'similar_products' in (self.get_rendered_fields() or ()):
+            namespaces += [change_namespace(label) for label in ('similarproduct', 'product', 'productoption')]
+        return namespaces
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'faceted_search'):
+            return self.list_item_serializer_class
+        return self.serializer_class
+
+    def get_queryset(self):
+        lookups = []
+        for name in self.get_rendered_fields() or ():
+            lookups += [
+                lookup() if callable(lookup) else lookup for lookup in self.field_prefetches.get(name, [])
+            ]
+        return super().get_queryset().prefetch_related(*dict.fromkeys(lookups))
+
+    @action(detail=False, methods=['get'], url_path='faceted-search')
+    def faceted_search(self, request):
+        """
+        جستجوی facet دار: محصولات صفحه‌بندی شده به همراه شمارش زنده هر facet
+        (برند، رنگ، گارانتی، تگ، مقادیر مشخصات، بازه قیمت) برای فیلترهای فعلی
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        facets = compute_product_facets(self.filterset_class, request.query_params, Product.objects.all(), request)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+            response.data['status'] = 'success'
+            response.data['facets'] = facets
+            return response
+        serializer = self.get_serializer(queryset, many=True)
+        return Response({
+            'status': 'success',
+            'data': serializer.data,
+            'facets': facets,
+        })
+
+    @action(detail=False, methods=['get'], url_path='suggest', filter_backends=[], pagination_class=None)
+    def suggest(self, request):
+        """
+        پیشنهادهای autocomplete برای ?q= از ایندکس پیشوندی در حافظه
+        (عنوان محصولات، برندها، دسته‌بندی‌ها و تگ‌ها)؛ ?limit= حداکثر تعداد نتایج
+        """
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', suggest_index.DEFAULT_LIMIT))
+        except ValueError:
+            limit = suggest_index.DEFAULT_LIMIT
+        return Response({
+            'status': 'success',
+            'query': query,
+            'results': suggest_index.suggest(query, limit),
+        })
+
 
 class CategoryViewSet(BaseModelViewSet):
-    queryset = Category.objects.prefetch_related('products', 'spec_definitions', 'spec_definitions__group', 'brand').select_related('parent').all()
+    queryset = Category.objects.prefetch_related(
+        'spec_definitions', 'spec_definitions__group', 'spec_definitions__categories', 'brand',
+    ).select_related('parent').all()
     serializer_class = CategorySerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = CategoryFilter
     search_fields = ['name', 'description', 'brand__name', 'spec_definitions__name']
     ordering_fields = ['name',]
     ordering = ['name']
+    change_dependencies = [
+        'category', 'brand', 'specification', 'specificationgroup',
+        'product', 'productspecification', 'specificationvalue',
+    ]
+
+    def get_change_dependencies(self):
+        if self.action == 'tree':
+            return ['category']
+        if self.action == 'products':
+            return PRODUCT_CHANGE_DEPENDENCIES + ['similarproduct']
+        return super().get_change_dependencies()
 
     @action(detail=True, methods=['get'], url_path='specifications')
     def specifications(self, request, pk=None):
@@ -172,19 +429,58 @@ class CategoryViewSet(BaseModelViewSet):
         متادیتا و لیست فیلترهای قابل استفاده برای این دسته‌بندی (شامل choices داینامیک مشخصات فنی)
         """
         category = self.get_object()
-        # فیلتر را با context مناسب بساز
-        filter_instance = CategoryFilter(request.GET, queryset=Category.objects.all(), request=request)
-        filters_data = {}
-        for name, f in filter_instance.filters.items():
-            filters_data[name] = {
-                'label': getattr(f, 'label', name),
-                'help_text': getattr(f, 'help_text', ''),
-                'choices': getattr(f, 'choices', None),
-            }
-        # اضافه کردن choices داینامیک برای spec_value
-        filters_data['spec_value_choices'] = filter_instance.spec_value_choices
+        filters_data = dict(get_static_schema(CategoryFilter))
+        # اضافه کردن choices داینامیک برای spec_value (از ایندکس facet کش شده همین دسته‌بندی)
+        filters_data['spec_value_choices'] = get_category_facets(category)
         return Response(filters_data)
 
+    @action(detail=True, methods=['get'], url_path='products')
+    def products(self, request, pk=None):
+        """
+        محصولات فعال این دسته‌بندی و زیرمجموعه‌هایش، صفحه‌بندی شده و با همه فیلترها،
+        مرتب‌سازی و ?fields=/?expand= لیست محصولات
+        """
+        # بازه MPTT دسته‌بندی از نقشه کش شده (بدون کوئری)
+        category_map = get_category_map()
+        category_id = int(pk) if pk.isdigit() and int(pk) in category_map['ids'] else category_map['slugs'].get(pk)
+        if category_id is None:
+            raise Http404
+        product_view = ProductViewSet(
+            request=request, args=(), kwargs={}, action='list', format_kwarg=self.format_kwarg,
+        )
+        queryset = product_view.filter_queryset(
+            category_products(product_view.get_queryset(), category_map['ids'][category_id])
+        )
+        page = product_view.paginate_queryset(queryset)
+        if page is not None:
+            serializer = product_view.get_serializer(page, many=True)
+            response = product_view.get_paginated_response(serializer.data)
+            response.data['status'] = 'success'
+            return response
+        serializer = product_view.get_serializer(queryset, many=True)
+        return Response({'status': 'success', 'data': serializer.data})
+
+    @action(detail=False, methods=['get'], url_path='tree', pagination_class=None)
+    def tree(self, request):
+        """
+        درخت دسته‌بندی‌ها برای منو با یک کوئری بازه‌ای MPTT
+        ?root= آیدی یا slug ریشه زیردرخت، ?depth= حداکثر تعداد سطوح
+        """
+        try:
+            depth = int(request.query_params['depth']) if request.query_params.get('depth') else None
+        except ValueError:
+            return Response({'status': 'error', 'message': 'depth must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        root = None
+        root_lookup = request.query_params.get('root')
+        if root_lookup:
+            lookup = {'id': root_lookup} if root_lookup.isdigit() else {'slug': root_lookup}
+            root = Category.objects.filter(**lookup).only('id', 'tree_id', 'lft', 'rght', 'level').first()
+            if root is None:
+                raise Http404
+        nodes = load_category_tree(root=root, max_depth=depth)
+        serializer = CategoryTreeSerializer(nodes, many=True, context=self.get_serializer_context())
+        return Response({'status': 'success', 'data': serializer.data})
+
 class BrandViewSet(BaseModelViewSet):
     queryset = Brand.objects.all()
     serializer_class = BrandSerializer
@@ -194,14 +490,17 @@ class BrandViewSet(BaseModelViewSet):
 class ProductOptionViewSet(BaseModelViewSet):
     queryset = ProductOption.objects.select_related('product', 'color', 'warranty').all()
     serializer_class = ProductOptionSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    cursor_pagination_class = CatalogCursorPagination
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, StableOrderingFilter]
     filterset_class = ProductOptionFilter
     search_fields = ['product__title', 'color__name', 'warranty__name']
-    ordering_fields = ['option_price', 'quantity', 'discount' ]
+    change_dependencies = ['productoption', 'color', 'gallery']
+    object_change_dependencies = ['productoption', 'gallery']
+    ordering_fields = ['id', 'option_price', 'final_price', 'effective_price', 'quantity', 'discount' ]
     ordering = ['-is_active', 'option_price']
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().with_final_price()
         if self.action == 'list':
             # فقط محصولات فعال در لیست نمایش داده شوند
             return queryset.filter(is_active=True)
@@ -218,6 +517,7 @@ class GalleryViewSet(BaseModelViewSet):
     serializer_class = GallerySerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['product']
+    change_dependencies = ['gallery', 'productoption', 'product', 'color']
 
 # class LoanConditionViewSet(BaseModelViewSet):
 #     queryset = LoanCondition.objects.all()
@@ -240,6 +540,7 @@ class SpecificationViewSet(BaseModelViewSet):
     search_fields = ['name', 'slug', 'categories__name', 'group__name']
     ordering_fields = ['name', 'data_type', 'group__name']
     ordering = ['group__name', 'name']
+    change_dependencies = ['specification', 'category', 'specificationgroup']
 
 class SpecificationGroupViewSet(BaseModelViewSet):
     queryset = SpecificationGroup.objects.prefetch_related('specifications').all()
@@ -247,6 +548,7 @@ class SpecificationGroupViewSet(BaseModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = SpecificationGroupFilter
     search_fields = ['name', 'specifications__name']
+    change_dependencies = ['specificationgroup', 'specification', 'productspecification', 'specificationvalue']
     ordering_fields = ['name']
     ordering = ['name']
 
@@ -257,6 +559,7 @@ class ProductSpecificationViewSet(BaseModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['product', 'specification']
     search_fields = ['specification__name', 'product__title']
+    change_dependencies = ['productspecification', 'specification', 'specificationvalue', 'category']
 
 class WarrantyViewSet(BaseModelViewSet):
     queryset = Warranty.objects.prefetch_related('product_options').all()
@@ -264,6 +567,7 @@ class WarrantyViewSet(BaseModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = WarrantyFilter
     search_fields = ['name', 'company', 'description']
+    change_dependencies = ['warranty', 'productoption', 'color', 'gallery']
     ordering_fields = ['name', 'duration', 'is_active']
     ordering = ['-is_active', 'name']
 